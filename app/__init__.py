@@ -1,16 +1,59 @@
-from collections.abc import Callable
+from collections.abc import AsyncGenerator, Callable
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
+from .analytics import mixpanel_queue
+from .cache import resource_cache, result_cache
+from .clients import http_clients
 from .config import DOCS_URL, HDX_URL, LOGGING_CONF_FILE, OPENAPI_URL, PREFIX, REDOC_URL
+from .copies import working_copies
 from .docs import app_description
+from .engine import engine, start_engine
+from .features import feature_readers
+from .index import metadata_index
+from .jobs import job_store
+from .middleware.metrics import metrics_tracking
 from .middleware.mixpanel import mixpanel_tracking
-from .routers import health, vector
+from .middleware.tracing import tracing
+from .routers import health, jobs, stats, vector
+from .threads import loop_monitor
+from .tiles import tile_cache
+from .tracing import tracer
+from .workspaces import workspaces
+
+routers = [vector, jobs, health, stats]
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncGenerator[None]:
+    """Prepare shared state before serving requests."""
+    resource_cache.load()
+    result_cache.load()
+    metadata_index.load()
+    working_copies.load()
+    tile_cache.load()
+    job_store.clear()
+    workspaces.sweep()
+    http_clients.start()
+    mixpanel_queue.start()
+    tracer.start()
+    loop_monitor.start()
+    start_engine()
+    feature_readers.start()
+    yield
+    await feature_readers.stop()
+    await loop_monitor.stop()
+    engine.stop()
+    await http_clients.stop()
+    mixpanel_queue.stop()
+    tracer.stop()
+    metadata_index.close()
 
-routers = [vector, health]
 
 app = FastAPI(
+    lifespan=lifespan,
     description=app_description,
     docs_url=DOCS_URL,
     openapi_url=OPENAPI_URL,
@@ -35,5 +78,17 @@ async def mixpanel_tracking_init(request: Request, call_next: Callable) -> Calla
     return await mixpanel_tracking(request, call_next)
 
 
+@app.middleware("http")
+async def metrics_tracking_init(request: Request, call_next: Callable) -> Callable:
+    """Label the request and time its response for the metrics."""
+    return await metrics_tracking(request, call_next)
+
+
+@app.middleware("http")
+async def tracing_init(request: Request, call_next: Callable) -> Callable:
+    """Trace the request and the stages it goes through."""
+    return await tracing(request, call_next)
+
+
 for router in routers:
     app.include_router(router.router, prefix=PREFIX)
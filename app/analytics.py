@@ -0,0 +1,138 @@
+import logging
+from queue import Empty, Full, Queue
+from threading import Thread
+from time import monotonic, sleep
+
+from mixpanel import Consumer, Mixpanel, MixpanelException
+from pydantic import BaseModel
+
+from .config import (
+    MIXPANEL_BATCH_SIZE,
+    MIXPANEL_FLUSH_INTERVAL,
+    MIXPANEL_QUEUE_SIZE,
+    MIXPANEL_RETRIES,
+    MIXPANEL_TOKEN,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_SIZE = 50  # Limit of a Mixpanel batch request
+
+Message = tuple[str, str]
+
+
+class AnalyticsStats(BaseModel):
+    queued: int = 0
+    dropped: int = 0
+    sent: int = 0
+    batches: int = 0
+    retries: int = 0
+    failed: int = 0
+
+
+class MixpanelQueue:
+    """Mixpanel consumer sending the events in batches from a worker thread.
+
+    Tracking an event only puts it in a bounded queue, so requests never wait on
+    Mixpanel. Events are dropped when the queue is full, and a batch still failing
+    after MIXPANEL_RETRIES attempts is counted as failed.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        batch_size: int,
+        flush_interval: float,
+        retries: int,
+    ) -> None:
+        """Initialize the queue without starting its worker."""
+        self.batch_size = min(batch_size, MAX_BATCH_SIZE)
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.stats = AnalyticsStats()
+        self._queue: Queue[Message | None] = Queue(max_size)
+        self._consumer = Consumer(request_timeout=10, retry_limit=0)
+        self._thread: Thread | None = None
+
+    def send(
+        self,
+        endpoint: str,
+        json_message: str,
+        api_key: str | None = None,  # noqa: ARG002
+        api_secret: str | None = None,  # noqa: ARG002
+    ) -> None:
+        """Queue a message for the worker, dropping it if the queue is full."""
+        try:
+            self._queue.put_nowait((endpoint, json_message))
+            self.stats.queued += 1
+        except Full:
+            self.stats.dropped += 1
+
+    def start(self) -> None:
+        """Start the worker thread."""
+        self._thread = Thread(target=self._run, name="mixpanel", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Send the queued events and stop the worker thread."""
+        if not self._thread:
+            return
+        try:
+            self._queue.put_nowait(None)
+        except Full:
+            logger.warning("Mixpanel queue is full, stopping without flushing it")
+            return
+        self._thread.join(timeout=self.flush_interval + 30)
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        """Get the queue counters for monitoring."""
+        stats = self.stats.model_dump()
+        stats["size"] = self._queue.qsize()
+        stats["max_size"] = self._queue.maxsize
+        return stats
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping or not self._queue.empty():
+            batch: list[Message] = []
+            deadline = monotonic() + (0 if stopping else self.flush_interval)
+            while len(batch) < self.batch_size:
+                try:
+                    message = self._queue.get(timeout=max(deadline - monotonic(), 0))
+                except Empty:
+                    break
+                if message is None:
+                    stopping = True
+                    deadline = monotonic()
+                else:
+                    batch.append(message)
+            for endpoint in sorted({endpoint for endpoint, _ in batch}):
+                self._send_batch(endpoint, [m for e, m in batch if e == endpoint])
+
+    def _send_batch(self, endpoint: str, messages: list[str]) -> None:
+        batch_json = "[" + ",".join(messages) + "]"
+        for attempt in range(self.retries + 1):
+            try:
+                self._consumer.send(endpoint, batch_json)
+            except MixpanelException as e:
+                if attempt == self.retries:
+                    logger.warning("Dropping %s Mixpanel events: %s", len(messages), e)
+                    self.stats.failed += len(messages)
+                    return
+                self.stats.retries += 1
+                sleep(2**attempt)
+            else:
+                self.stats.sent += len(messages)
+                self.stats.batches += 1
+                return
+
+
+mixpanel_queue = MixpanelQueue(
+    MIXPANEL_QUEUE_SIZE,
+    MIXPANEL_BATCH_SIZE,
+    MIXPANEL_FLUSH_INTERVAL,
+    MIXPANEL_RETRIES,
+)
+
+mixpanel = Mixpanel(MIXPANEL_TOKEN, consumer=mixpanel_queue) if MIXPANEL_TOKEN else None
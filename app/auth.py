@@ -1,15 +1,127 @@
 import logging
+from asyncio import Task, create_task, shield
+from collections import OrderedDict
+from hashlib import sha256
+from time import monotonic
 
 from fastapi import HTTPException, Request, Security, status
 from fastapi.security.api_key import APIKeyHeader
-from httpx import AsyncClient
+from pydantic import BaseModel
 
-from .config import HDX_AUTH_URL
+from .clients import http_clients
+from .config import (
+    HDX_AUTH_URL,
+    TOKEN_CACHE_MAX_SIZE,
+    TOKEN_CACHE_NEGATIVE_TTL,
+    TOKEN_CACHE_TTL,
+)
+from .metrics import timed
+from .tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 api_key_header = APIKeyHeader(name="Authorization", auto_error=False)
 
+# Statuses of HDX rejecting a token, any other error is retried by the next request
+REJECTED_STATUS_CODES = {status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN}
+
+
+class Token(BaseModel):
+    valid: bool
+    app_name: str | None = None
+    email_hash: str | None = None
+    expires: float = 0.0
+
+
+class TokenStats(BaseModel):
+    requests: int = 0
+    hits: int = 0
+    negative_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    evictions: int = 0
+
+
+class TokenCache:
+    """In-memory cache of HDX token validations.
+
+    Entries are keyed by a hash of the API key, so tokens are never kept in memory.
+    Valid tokens are trusted for TOKEN_CACHE_TTL seconds and rejected ones, with a
+    401 or 403, for the shorter TOKEN_CACHE_NEGATIVE_TTL. Other errors are not cached.
+    """
+
+    def __init__(self, max_size: int, ttl: int, negative_ttl: int) -> None:
+        """Initialize the cache."""
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stats = TokenStats()
+        self._entries: OrderedDict[str, Token] = OrderedDict()
+        self._inflight: dict[str, Task[Token]] = {}
+
+    async def get(self, api_key: str) -> Token:
+        """Get the validation of a token, asking HDX once for concurrent requests."""
+        self.stats.requests += 1
+        key = sha256(api_key.encode()).hexdigest()
+        token = self._entries.get(key)
+        if token and token.expires > monotonic():
+            self._entries.move_to_end(key)
+            self.stats.hits += token.valid
+            self.stats.negative_hits += not token.valid
+            return token
+        task = self._inflight.get(key)
+        if task:
+            self.stats.coalesced += 1
+            return await shield(task)
+        self.stats.misses += 1
+        task = create_task(self._validate(key, api_key))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await shield(task)
+
+    def get_stats(self) -> dict:
+        """Get the cache counters for monitoring."""
+        stats = self.stats.model_dump()
+        served = stats["hits"] + stats["negative_hits"] + stats["coalesced"]
+        stats["hit_rate"] = served / stats["requests"] if stats["requests"] else 0.0
+        stats["entries"] = len(self._entries)
+        stats["max_size"] = self.max_size
+        return stats
+
+    async def _validate(self, key: str, api_key: str) -> Token:
+        response = await http_clients.hdx.get(
+            HDX_AUTH_URL,
+            headers={"Authorization": api_key},
+            timeout=10,
+        )
+        if response.status_code not in REJECTED_STATUS_CODES:
+            response.raise_for_status()
+        json = response.json()
+        if response.is_success:
+            result = json.get("result", {})
+            token = Token(
+                valid=True,
+                app_name=result.get("token_name"),
+                email_hash=result.get("email_hash"),
+                expires=monotonic() + self.ttl,
+            )
+        else:
+            logger.warning("Token validation failed: %s", json)
+            token = Token(valid=False, expires=monotonic() + self.negative_ttl)
+        self._entries[key] = token
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+        return token
+
+
+token_cache = TokenCache(
+    TOKEN_CACHE_MAX_SIZE,
+    TOKEN_CACHE_TTL,
+    TOKEN_CACHE_NEGATIVE_TTL,
+)
+
 
 async def get_api_key(request: Request, api_key: str = Security(api_key_header)) -> str:
     """Authorize the API key in the header through the CKAN token endpoint."""
@@ -26,18 +138,17 @@ async def get_api_key(request: Request, api_key: str = Security(api_key_header))
             ),
         )
     try:
-        async with AsyncClient(http2=True, timeout=10) as client:
-            headers = {"Authorization": api_key}
-            response = await client.get(HDX_AUTH_URL, headers=headers)
-            json = response.json()
-            if response.is_success:
-                app_name = json.get("result", {}).get("token_name")
-                email_hash = json.get("result", {}).get("email_hash")
-                request.state.app_name = app_name
-                request.state.email_hash = email_hash
-                logger.info("Application: %s, Email: %s", app_name, email_hash)
-                return api_key
-            logger.warning("Token validation failed: %s", json)
+        with timed("token"), tracer.span("get_api_key") as span:
+            token = await token_cache.get(api_key)
+            span.set_attribute("auth.valid", token.valid)
+        if token.valid:
+            request.state.app_name = token.app_name
+            request.state.email_hash = token.email_hash
+            request.state.owner = (
+                token.email_hash or sha256(api_key.encode()).hexdigest()
+            )
+            logger.info("Application: %s, Email: %s", token.app_name, token.email_hash)
+            return api_key
     except Exception as e:  # noqa: BLE001
         logger.warning("Token validation error: %s", e)
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid API KEY")
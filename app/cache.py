@@ -0,0 +1,421 @@
+import logging
+from asyncio import Task, create_task, shield
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from hashlib import sha256
+from os import link
+from pathlib import Path
+from shutil import copyfile, rmtree
+from time import time
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from .config import (
+    CACHE_DIR,
+    RESOURCE_CACHE_MAX_BYTES,
+    RESOURCE_CACHE_REVALIDATE,
+    RESULT_CACHE_MAX_AGE,
+    RESULT_CACHE_MAX_BYTES,
+)
+from .threads import run_io
+
+logger = logging.getLogger(__name__)
+
+ENTRY_FILE = "entry.json"
+
+
+class Resource(BaseModel):
+    uuid: str
+    download_url: str
+    version: str
+    size: int = 0
+
+
+class Download(BaseModel):
+    filename: str
+    size: int
+    etag: str | None = None
+    last_modified: str | None = None
+
+
+class ResourceEntry(Download):
+    uuid: str
+    version: str
+    key: str
+    validated: float = 0.0
+    last_used: float = 0.0
+
+
+class ResultEntry(BaseModel):
+    key: str
+    filename: str
+    media_type: str
+    size: int
+    created: float
+    last_used: float = 0.0
+
+
+class CacheStats(BaseModel):
+    requests: int = 0
+    hits: int = 0
+    misses: int = 0
+    revalidated: int = 0
+    coalesced: int = 0
+    bytes_downloaded: int = 0
+    bytes_saved: int = 0
+    evictions: int = 0
+    bytes_evicted: int = 0
+
+
+def link_or_copy(input_path: Path, output_path: Path) -> Path:
+    """Hard link a file, copying it when the link crosses filesystems."""
+    try:
+        link(input_path, output_path)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        copyfile(input_path, output_path)
+    return output_path
+
+
+class ResultStats(BaseModel):
+    requests: int = 0
+    hits: int = 0
+    misses: int = 0
+    not_modified: int = 0
+    stores: int = 0
+    bytes_served: int = 0
+    evictions: int = 0
+    bytes_evicted: int = 0
+
+
+Fetch = Callable[[ResourceEntry | None, Path], Awaitable[Download | None]]
+
+
+class ResourceCache:
+    """Shared on-disk cache of HDX resources.
+
+    Entries are stored in content-addressed folders keyed by resource UUID, HDX
+    version and HTTP ETag. Each UUID keeps its latest entry only, and entries are
+    evicted least recently used first once the cache grows past its size limit.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, revalidate: int) -> None:
+        """Initialize the cache without touching the disk."""
+        self.root = root
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, ResourceEntry] = OrderedDict()
+        self._inflight: dict[tuple[str, str], Task[ResourceEntry]] = {}
+
+    @property
+    def size(self) -> int:
+        """Total bytes of the cached files."""
+        return sum(entry.size for entry in self._entries.values())
+
+    def entry_dir(self, entry: ResourceEntry) -> Path:
+        """Get the folder holding an entry."""
+        return self.root / "resources" / entry.key
+
+    def entry_path(self, entry: ResourceEntry) -> Path:
+        """Get the path of the cached file of an entry."""
+        return self.entry_dir(entry) / entry.filename
+
+    def load(self) -> None:
+        """Index the entries already on disk and remove incomplete downloads."""
+        rmtree(self.root / "tmp", ignore_errors=True)
+        entries = []
+        for entry_file in (self.root / "resources").glob(f"*/{ENTRY_FILE}"):
+            try:
+                entry = ResourceEntry.model_validate_json(entry_file.read_text())
+            except ValueError:
+                rmtree(entry_file.parent, ignore_errors=True)
+                continue
+            if self.entry_path(entry).is_file():
+                entries.append(entry)
+            else:
+                rmtree(entry_file.parent, ignore_errors=True)
+        entries.sort(key=lambda entry: entry.last_used)
+        for entry in entries:
+            stale = self._entries.pop(entry.uuid, None)
+            if stale:
+                rmtree(self.entry_dir(stale), ignore_errors=True)
+            self._entries[entry.uuid] = entry
+        logger.info("Resource cache: %s entries, %s bytes", len(entries), self.size)
+
+    def contains(self, uuid: str, version: str) -> bool:
+        """Check if a version of a resource is cached, even if due revalidation."""
+        entry = self._entries.get(uuid)
+        return bool(entry and entry.version == version)
+
+    def get_path(self, uuid: str, version: str) -> Path | None:
+        """Get the cached file of a version of a resource, if any."""
+        entry = self._entries.get(uuid)
+        if entry and entry.version == version:
+            return self.entry_path(entry)
+        return None
+
+    async def get(self, uuid: str, version: str, fetch: Fetch) -> ResourceEntry:
+        """Get an entry, downloading or revalidating it at most once at a time."""
+        self.stats.requests += 1
+        entry = self._entries.get(uuid)
+        if (
+            entry
+            and entry.version == version
+            and time() - entry.validated < self.revalidate
+        ):
+            return self._hit(entry)
+        key = (uuid, version)
+        task = self._inflight.get(key)
+        if task:
+            self.stats.coalesced += 1
+            entry = await shield(task)
+            self.stats.bytes_saved += entry.size
+            return entry
+        task = create_task(self._refresh(uuid, version, fetch))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await shield(task)
+
+    async def checkout(
+        self,
+        uuid: str,
+        version: str,
+        fetch: Fetch,
+        output_dir: Path,
+    ) -> Path:
+        """Get an entry and hard link its file into a working directory.
+
+        The link keeps the file readable even if the entry is evicted afterwards. It
+        falls back to a copy when the working directory is on another filesystem.
+        """
+        entry = await self.get(uuid, version, fetch)
+        try:
+            return await run_io(
+                link_or_copy,
+                self.entry_path(entry),
+                output_dir / entry.filename,
+            )
+        except FileNotFoundError:
+            logger.warning("Cached file of resource %s went missing", uuid)
+            self._remove(uuid)
+        entry = await self.get(uuid, version, fetch)
+        return await run_io(
+            link_or_copy,
+            self.entry_path(entry),
+            output_dir / entry.filename,
+        )
+
+    def get_stats(self) -> dict:
+        """Get the cache counters for monitoring."""
+        stats = self.stats.model_dump()
+        served = stats["hits"] + stats["revalidated"] + stats["coalesced"]
+        stats["hit_rate"] = served / stats["requests"] if stats["requests"] else 0.0
+        stats["entries"] = len(self._entries)
+        stats["bytes"] = self.size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _hit(self, entry: ResourceEntry) -> ResourceEntry:
+        self.stats.hits += 1
+        self.stats.bytes_saved += entry.size
+        entry.last_used = time()
+        self._entries.move_to_end(entry.uuid)
+        return entry
+
+    async def _refresh(self, uuid: str, version: str, fetch: Fetch) -> ResourceEntry:
+        entry = self._entries.get(uuid)
+        stale = entry if entry and entry.version == version else None
+        tmp_dir = self.root / "tmp" / uuid4().hex
+        tmp_dir.mkdir(parents=True)
+        try:
+            download = await fetch(stale, tmp_dir)
+            if download is None and stale:
+                self.stats.revalidated += 1
+                self.stats.bytes_saved += stale.size
+                stale.validated = stale.last_used = time()
+                self._entries.move_to_end(uuid)
+                self._write_entry(stale)
+                return stale
+            if download is None:
+                error = f"Resource {uuid} was not modified but is not cached."
+                raise RuntimeError(error)
+            self.stats.misses += 1
+            self.stats.bytes_downloaded += download.size
+            key = sha256(f"{uuid}\n{version}\n{download.etag}".encode()).hexdigest()
+            fresh = ResourceEntry(
+                **download.model_dump(),
+                uuid=uuid,
+                version=version,
+                key=key[:32],
+                validated=time(),
+                last_used=time(),
+            )
+            self._remove(uuid)
+            rmtree(self.entry_dir(fresh), ignore_errors=True)
+            self.entry_dir(fresh).parent.mkdir(parents=True, exist_ok=True)
+            tmp_dir.rename(self.entry_dir(fresh))
+            self._write_entry(fresh)
+            self._entries[uuid] = fresh
+            self._evict()
+            return fresh
+        finally:
+            rmtree(tmp_dir, ignore_errors=True)
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            uuid = next(iter(self._entries))
+            entry = self._remove(uuid)
+            if entry:
+                self.stats.evictions += 1
+                self.stats.bytes_evicted += entry.size
+                logger.info("Evicted resource %s (%s bytes)", uuid, entry.size)
+
+    def _remove(self, uuid: str) -> ResourceEntry | None:
+        entry = self._entries.pop(uuid, None)
+        if entry:
+            rmtree(self.entry_dir(entry), ignore_errors=True)
+        return entry
+
+    def _write_entry(self, entry: ResourceEntry) -> None:
+        (self.entry_dir(entry) / ENTRY_FILE).write_text(entry.model_dump_json())
+
+
+class ResultCache:
+    """Persistent cache of command outputs.
+
+    Entries are keyed by a hash of the resource version, the command and its
+    parameters, which also serves as their strong ETag. They are evicted once older
+    than the maximum age, or least recently used first past the size limit.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, max_age: int) -> None:
+        """Initialize the cache without touching the disk."""
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.stats = ResultStats()
+        self._entries: OrderedDict[str, ResultEntry] = OrderedDict()
+
+    @property
+    def size(self) -> int:
+        """Total bytes of the cached files."""
+        return sum(entry.size for entry in self._entries.values())
+
+    def entry_path(self, entry: ResultEntry) -> Path:
+        """Get the path of the cached file of an entry."""
+        return self.root / "results" / entry.key / entry.filename
+
+    def load(self) -> None:
+        """Index the entries already on disk."""
+        entries = []
+        for entry_file in (self.root / "results").glob(f"*/{ENTRY_FILE}"):
+            try:
+                entry = ResultEntry.model_validate_json(entry_file.read_text())
+            except ValueError:
+                rmtree(entry_file.parent, ignore_errors=True)
+                continue
+            if self.entry_path(entry).is_file():
+                entries.append(entry)
+            else:
+                rmtree(entry_file.parent, ignore_errors=True)
+        for entry in sorted(entries, key=lambda entry: entry.last_used):
+            self._entries[entry.key] = entry
+        self._evict()
+        logger.info("Result cache: %s entries, %s bytes", len(entries), self.size)
+
+    def get(self, key: str) -> ResultEntry | None:
+        """Get a fresh entry."""
+        self.stats.requests += 1
+        entry = self._entries.get(key)
+        if entry and time() - entry.created < self.max_age:
+            self.stats.hits += 1
+            entry.last_used = time()
+            self._entries.move_to_end(key)
+            return entry
+        if entry:
+            self._evict_one(key)
+        self.stats.misses += 1
+        return None
+
+    def put(self, key: str, output_path: Path, media_type: str) -> ResultEntry:
+        """Store an output file, hard linking it when possible."""
+        entry = ResultEntry(
+            key=key,
+            filename=output_path.name,
+            media_type=media_type,
+            size=output_path.stat().st_size,
+            created=time(),
+            last_used=time(),
+        )
+        self._remove(key)
+        entry_dir = self.entry_path(entry).parent
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        link_or_copy(output_path, self.entry_path(entry))
+        (entry_dir / ENTRY_FILE).write_text(entry.model_dump_json())
+        self._entries[key] = entry
+        self.stats.stores += 1
+        self._evict()
+        return entry
+
+    async def checkout(self, entry: ResultEntry, output_dir: Path) -> Path | None:
+        """Hard link the file of an entry into a working directory to serve it.
+
+        The link keeps the file readable even if the entry is evicted while it is
+        sent. Returns None if the file was removed before it could be linked.
+        """
+        try:
+            return await run_io(
+                link_or_copy,
+                self.entry_path(entry),
+                output_dir / entry.filename,
+            )
+        except FileNotFoundError:
+            logger.warning("Cached file of result %s went missing", entry.key)
+            if self._entries.get(entry.key) is entry:
+                self._remove(entry.key)
+            return None
+
+    def get_stats(self) -> dict:
+        """Get the cache counters for monitoring."""
+        stats = self.stats.model_dump()
+        stats["hit_rate"] = (
+            stats["hits"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        stats["entries"] = len(self._entries)
+        stats["bytes"] = self.size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _evict(self) -> None:
+        expired = [
+            key
+            for key, entry in self._entries.items()
+            if time() - entry.created >= self.max_age
+        ]
+        for key in expired:
+            self._evict_one(key)
+        while self.size > self.max_bytes and self._entries:
+            self._evict_one(next(iter(self._entries)))
+
+    def _evict_one(self, key: str) -> None:
+        entry = self._remove(key)
+        if entry:
+            self.stats.evictions += 1
+            self.stats.bytes_evicted += entry.size
+
+    def _remove(self, key: str) -> ResultEntry | None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            rmtree(self.entry_path(entry).parent, ignore_errors=True)
+        return entry
+
+
+resource_cache = ResourceCache(
+    CACHE_DIR,
+    RESOURCE_CACHE_MAX_BYTES,
+    RESOURCE_CACHE_REVALIDATE,
+)
+result_cache = ResultCache(CACHE_DIR, RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_AGE)
@@ -0,0 +1,118 @@
+from collections import defaultdict
+from collections.abc import Awaitable, Callable
+
+from httpx import AsyncClient, AsyncHTTPTransport, Limits, Request, Response
+from pydantic import BaseModel
+
+from .config import (
+    HTTP_KEEPALIVE_EXPIRY,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE,
+    TIMEOUT,
+)
+
+
+class HostStats(BaseModel):
+    requests: int = 0
+    responses: int = 0
+    errors: int = 0
+    tcp_connects: int = 0
+    tls_handshakes: int = 0
+
+
+class HttpClients:
+    """HTTP clients shared by all requests for the lifetime of the application.
+
+    Reusing their connection pools saves a TCP and TLS handshake on every call to
+    HDX, and HTTP/2 multiplexes concurrent calls over the same connection.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the holder without opening any connection."""
+        self.stats: defaultdict[str, HostStats] = defaultdict(HostStats)
+        self._hdx: AsyncClient | None = None
+        self._download: AsyncClient | None = None
+
+    @property
+    def hdx(self) -> AsyncClient:
+        """Client for the HDX API, such as token checks and resource metadata."""
+        if self._hdx is None:
+            self._hdx = self._create_client(follow_redirects=False)
+        return self._hdx
+
+    @property
+    def download(self) -> AsyncClient:
+        """Client for resource downloads, following redirects to file hosts."""
+        if self._download is None:
+            self._download = self._create_client(follow_redirects=True)
+        return self._download
+
+    def start(self) -> None:
+        """Create the clients."""
+        _ = self.hdx, self.download
+
+    async def stop(self) -> None:
+        """Close the clients and their connections."""
+        for client in (self._hdx, self._download):
+            if client:
+                await client.aclose()
+        self._hdx = self._download = None
+
+    def get_stats(self) -> dict[str, dict]:
+        """Get the per-host counters and open connections for monitoring."""
+        stats = {
+            host: host_stats.model_dump() for host, host_stats in self.stats.items()
+        }
+        for client in (self._hdx, self._download):
+            pool = getattr(getattr(client, "_transport", None), "_pool", None)
+            for connection in getattr(pool, "connections", []):
+                origin = getattr(connection, "_origin", None)
+                if origin is None:
+                    continue
+                host = origin.host.decode()
+                host_stats = stats.setdefault(host, HostStats().model_dump())
+                state = "idle" if connection.is_idle() else "active"
+                host_stats[f"{state}_connections"] = (
+                    host_stats.get(f"{state}_connections", 0) + 1
+                )
+        return stats
+
+    def _create_client(self, *, follow_redirects: bool) -> AsyncClient:
+        limits = Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        )
+        return AsyncClient(
+            http2=True,
+            timeout=TIMEOUT,
+            follow_redirects=follow_redirects,
+            transport=AsyncHTTPTransport(http2=True, limits=limits),
+            event_hooks={
+                "request": [self._on_request],
+                "response": [self._on_response],
+            },
+        )
+
+    async def _on_request(self, request: Request) -> None:
+        host_stats = self.stats[request.url.host]
+        host_stats.requests += 1
+        request.extensions["trace"] = self._get_trace(host_stats)
+
+    async def _on_response(self, response: Response) -> None:
+        host_stats = self.stats[response.request.url.host]
+        host_stats.responses += 1
+        host_stats.errors += response.is_error
+
+    @staticmethod
+    def _get_trace(host_stats: HostStats) -> Callable[[str, dict], Awaitable[None]]:
+        async def trace(event_name: str, _: dict) -> None:
+            if event_name == "connection.connect_tcp.complete":
+                host_stats.tcp_connects += 1
+            elif event_name == "connection.start_tls.complete":
+                host_stats.tls_handshakes += 1
+
+        return trace
+
+
+http_clients = HttpClients()
@@ -1,27 +1,126 @@
 from logging.config import fileConfig
-from os import environ, getenv
+from os import cpu_count, environ, getenv
+from pathlib import Path
+from tempfile import gettempdir
 
 from dotenv import load_dotenv
-from mixpanel import Mixpanel
 
 load_dotenv(override=True)
 
 BASE_URL_PATH = getenv("BASE_URL_PATH", "")
+BATCH_CONCURRENCY = int(getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_OPERATIONS = int(getenv("BATCH_MAX_OPERATIONS", "50"))
+CACHE_DIR = Path(getenv("CACHE_DIR", f"{gettempdir()}/hdx-geo-data-api"))
 DOCS_URL = f"{BASE_URL_PATH}{getenv('DOCS_URL', '/docs')}"
+DOWNLOAD_BUFFER_SIZE = int(getenv("DOWNLOAD_BUFFER_SIZE", f"{1024**2}"))  # 1 MiB
+DOWNLOAD_CHUNK_SIZE = int(getenv("DOWNLOAD_CHUNK_SIZE", f"{16 * 1024**2}"))  # 16 MiB
+DOWNLOAD_CONCURRENCY = int(getenv("DOWNLOAD_CONCURRENCY", "4"))
+DOWNLOAD_PARALLEL_MIN_BYTES = int(
+    getenv("DOWNLOAD_PARALLEL_MIN_BYTES", f"{64 * 1024**2}"),
+)  # Default: 64 MiB
+DOWNLOAD_RETRIES = int(getenv("DOWNLOAD_RETRIES", "3"))
+FEATURES_MAX_LIMIT = int(getenv("FEATURES_MAX_LIMIT", "1000"))
+FEATURES_MAX_READERS = int(getenv("FEATURES_MAX_READERS", "64"))
+FEATURES_READER_TTL = int(getenv("FEATURES_READER_TTL", "300"))  # Default: 5 min
+GDAL_ENGINE = getenv("GDAL_ENGINE", "cli")  # cli or process
+GDAL_WORKERS = int(getenv("GDAL_WORKERS", f"{cpu_count() or 1}"))
 HDX_URL = getenv("HDX_URL", "http://data.humdata.local")
 HDX_AUTH_URL = f"{HDX_URL}/api/3/action/hdx_token_info"
+HTTP_KEEPALIVE_EXPIRY = float(getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # 30 sec
+HTTP_MAX_CONNECTIONS = int(getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(getenv("HTTP_MAX_KEEPALIVE", "20"))
+IO_THREADS = int(getenv("IO_THREADS", f"{min(32, (cpu_count() or 1) + 4)}"))
+JOB_CONCURRENCY = int(getenv("JOB_CONCURRENCY", f"{cpu_count() or 1}"))
+JOB_TTL = int(getenv("JOB_TTL", f"{24 * 60 * 60}"))  # Default: 1 day
+LARGE_INPUT_BYTES = int(getenv("LARGE_INPUT_BYTES", f"{1024**3}"))  # Default: 1 GiB
+LARGE_INPUT_LIMIT = int(getenv("LARGE_INPUT_LIMIT", "2"))
 LOGGING_CONF_FILE = getenv("LOGGING_CONF_FILE", "logging.conf")
+LOOP_LAG_INTERVAL = float(getenv("LOOP_LAG_INTERVAL", "0.5"))  # Default: 0.5 sec
+METADATA_INDEX = getenv("METADATA_INDEX", "true").lower() == "true"
+MIXPANEL_BATCH_SIZE = int(getenv("MIXPANEL_BATCH_SIZE", "50"))
+MIXPANEL_FLUSH_INTERVAL = float(getenv("MIXPANEL_FLUSH_INTERVAL", "5"))
+MIXPANEL_QUEUE_SIZE = int(getenv("MIXPANEL_QUEUE_SIZE", "10000"))
+MIXPANEL_RETRIES = int(getenv("MIXPANEL_RETRIES", "3"))
 MIXPANEL_TOKEN = getenv("MIXPANEL_TOKEN", "")
+MONITORING_AUTH = getenv("MONITORING_AUTH", "true").lower() == "true"
 OPENAPI_URL = f"{BASE_URL_PATH}{getenv('OPENAPI_URL', '/openapi.json')}"
 PREFIX = f"{BASE_URL_PATH}{getenv('PREFIX', '/api')}"
 REDOC_URL = f"{BASE_URL_PATH}{getenv('REDOC_URL', '/redoc')}"
+REMOTE_INPUT = getenv("REMOTE_INPUT", "true").lower() == "true"
+REMOTE_MIN_BYTES = int(getenv("REMOTE_MIN_BYTES", f"{100 * 1024**2}"))  # 100 MiB
+REMOTE_SUFFIXES = getenv("REMOTE_SUFFIXES", ".fgb,.gpkg,.parquet").split(",")
+RESOURCE_CACHE_MAX_BYTES = int(
+    getenv("RESOURCE_CACHE_MAX_BYTES", f"{20 * 1024**3}"),
+)  # Default: 20 GiB
+RESOURCE_CACHE_REVALIDATE = int(getenv("RESOURCE_CACHE_REVALIDATE", "60"))  # 1 min
+RESULT_CACHE_MAX_AGE = int(getenv("RESULT_CACHE_MAX_AGE", f"{24 * 60 * 60}"))  # 1 day
+RESULT_CACHE_MAX_BYTES = int(
+    getenv("RESULT_CACHE_MAX_BYTES", f"{10 * 1024**3}"),
+)  # Default: 10 GiB
+SCHEDULER_DEFAULT_LIMIT = int(getenv("SCHEDULER_DEFAULT_LIMIT", f"{cpu_count() or 1}"))
+SCHEDULER_LIMITS = {
+    command: int(limit)
+    for command, limit in (
+        item.split("=")
+        for item in getenv("SCHEDULER_LIMITS", "simplify-coverage=2").split(",")
+        if item
+    )
+}
+SCHEDULER_MAX_QUEUE = int(getenv("SCHEDULER_MAX_QUEUE", "100"))
+SCHEDULER_RETRY_AFTER = int(getenv("SCHEDULER_RETRY_AFTER", "30"))  # 30 sec
+SIMPLIFY_PARTITION_MIN_BYTES = int(
+    getenv("SIMPLIFY_PARTITION_MIN_BYTES", f"{256 * 1024**2}"),
+)  # Default: 256 MiB
+SIMPLIFY_PARTITIONS = int(getenv("SIMPLIFY_PARTITIONS", f"{cpu_count() or 1}"))
+SOZIP_CHUNK_SIZE = int(getenv("SOZIP_CHUNK_SIZE", f"{32 * 1024}"))  # Default: 32 KiB
+SOZIP_MIN_SIZE = int(getenv("SOZIP_MIN_SIZE", f"{1024**2}"))  # Default: 1 MiB
+SOZIP_THREADS = int(getenv("SOZIP_THREADS", f"{cpu_count() or 1}"))
+STREAM_CHUNK_SIZE = int(getenv("STREAM_CHUNK_SIZE", f"{64 * 1024}"))  # Default: 64 KiB
+STREAMING = getenv("STREAMING", "true").lower() == "true"
+TILE_CACHE_MAX_BYTES = int(
+    getenv("TILE_CACHE_MAX_BYTES", f"{5 * 1024**3}"),
+)  # Default: 5 GiB
+TILE_PYRAMID_MAX_ZOOM = int(getenv("TILE_PYRAMID_MAX_ZOOM", "8"))
+TILE_PYRAMID_MIN_REQUESTS = int(getenv("TILE_PYRAMID_MIN_REQUESTS", "50"))
+TILE_SIMPLIFICATION = float(getenv("TILE_SIMPLIFICATION", "4"))
 TIMEOUT = int(getenv("TIMEOUT", f"{5 * 60}"))  # Default: 5 min
+TOKEN_CACHE_MAX_SIZE = int(getenv("TOKEN_CACHE_MAX_SIZE", "10000"))
+TOKEN_CACHE_NEGATIVE_TTL = int(getenv("TOKEN_CACHE_NEGATIVE_TTL", "30"))  # 30 sec
+TOKEN_CACHE_TTL = int(getenv("TOKEN_CACHE_TTL", "300"))  # Default: 5 min
+TRACING_EXPORTER = getenv("TRACING_EXPORTER", "").lower()  # "file" or "otlp"
+TRACING_FILE = Path(getenv("TRACING_FILE", f"{CACHE_DIR}/traces.jsonl"))
+TRACING_OTLP_ENDPOINT = getenv(
+    "TRACING_OTLP_ENDPOINT",
+    "http://localhost:4318/v1/traces",
+)
+TRACING_SAMPLE_RATE = float(getenv("TRACING_SAMPLE_RATE", "0.1"))
 VECTOR_COMMANDS = "Vector commands"
+VSICURL_CONFIG = [
+    f"CPL_VSIL_CURL_CACHE_SIZE={getenv('VSICURL_CACHE_SIZE', f'{256 * 1024**2}')}",
+    f"CPL_VSIL_CURL_CHUNK_SIZE={getenv('VSICURL_CHUNK_SIZE', f'{1024**2}')}",
+    "CPL_VSIL_CURL_USE_HEAD=NO",
+    "GDAL_DISABLE_READDIR_ON_OPEN=EMPTY_DIR",
+    "GDAL_HTTP_MAX_RETRY=3",
+    "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES=YES",
+    "GDAL_HTTP_MULTIPLEX=YES",
+    "GDAL_HTTP_RETRY_DELAY=1",
+    "GDAL_HTTP_VERSION=2",
+    "GDAL_INGESTED_BYTES_AT_OPEN=65536",
+]
+VSIZIP_INPUT = getenv("VSIZIP_INPUT", "true").lower() == "true"
+WORKING_COPIES = getenv("WORKING_COPIES", "false").lower() == "true"
+WORKING_COPY_MAX_BYTES = int(
+    getenv("WORKING_COPY_MAX_BYTES", f"{10 * 1024**3}"),
+)  # Default: 10 GiB
+WORKING_COPY_MIN_REQUESTS = int(getenv("WORKING_COPY_MIN_REQUESTS", "3"))
+WORKSPACE_MIN_FREE_BYTES = int(
+    getenv("WORKSPACE_MIN_FREE_BYTES", f"{2 * 1024**3}"),
+)  # Default: 2 GiB
+WORKSPACE_SIZE_FACTOR = float(getenv("WORKSPACE_SIZE_FACTOR", "2"))
+WORKSPACE_WAIT = int(getenv("WORKSPACE_WAIT", "30"))  # Default: 30 sec
 
 fileConfig(LOGGING_CONF_FILE)
 
 environ["OGR_GEOJSON_MAX_OBJ_SIZE"] = "0"
 environ["OGR_ORGANIZE_POLYGONS"] = "ONLY_CCW"
 environ["PYOGRIO_USE_ARROW"] = "1"
-
-mixpanel = Mixpanel(MIXPANEL_TOKEN) if MIXPANEL_TOKEN else None
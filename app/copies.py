@@ -0,0 +1,168 @@
+import logging
+from collections import Counter, OrderedDict
+from pathlib import Path
+from shutil import rmtree
+from time import time
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from .cache import ENTRY_FILE, link_or_copy
+from .config import (
+    CACHE_DIR,
+    WORKING_COPIES,
+    WORKING_COPY_MAX_BYTES,
+    WORKING_COPY_MIN_REQUESTS,
+)
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = "data"
+INDEXED_SUFFIXES = {".fgb", ".gpkg", ".parquet"}
+MAX_TRACKED = 10000
+
+
+class CopyEntry(BaseModel):
+    uuid: str
+    version: str
+    size: int
+    created: float
+    last_used: float
+
+
+class CopyStats(BaseModel):
+    requests: int = 0
+    hits: int = 0
+    builds: int = 0
+    build_failures: int = 0
+    build_seconds: float = 0.0
+    evictions: int = 0
+
+
+class WorkingCopies:
+    """Spatially indexed FlatGeobuf copies of frequently filtered resources.
+
+    Once a resource version has been filtered by bbox WORKING_COPY_MIN_REQUESTS
+    times, a copy with a packed Hilbert R-tree per layer is built in the background,
+    so later bbox filters read only the matching features instead of scanning all.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, min_requests: int) -> None:
+        """Initialize the copies without reading the disk."""
+        self.root = root / "copies"
+        self.max_bytes = max_bytes
+        self.min_requests = min_requests
+        self.stats = CopyStats()
+        self._entries: OrderedDict[str, CopyEntry] = OrderedDict()
+        self._requests: Counter[tuple[str, str]] = Counter()
+
+    @property
+    def size(self) -> int:
+        """Total size of the copies."""
+        return sum(entry.size for entry in self._entries.values())
+
+    def entry_dir(self, entry: CopyEntry) -> Path:
+        """Get the folder of a copy."""
+        return self.root / entry.uuid
+
+    def load(self) -> None:
+        """Index the copies already on disk and remove incomplete builds."""
+        rmtree(self.root / "tmp", ignore_errors=True)
+        entries = []
+        for entry_file in self.root.glob(f"*/{ENTRY_FILE}"):
+            try:
+                entries.append(CopyEntry.model_validate_json(entry_file.read_text()))
+            except ValueError:
+                rmtree(entry_file.parent, ignore_errors=True)
+        for entry in sorted(entries, key=lambda entry: entry.last_used):
+            self._entries[entry.uuid] = entry
+        self._evict()
+        logger.info("Working copies: %s entries, %s bytes", len(entries), self.size)
+
+    def checkout(self, uuid: str, version: str, output_dir: Path) -> Path | None:
+        """Hard link the copy of a resource version into a working directory."""
+        self.stats.requests += 1
+        entry = self._entries.get(uuid)
+        if not entry or entry.version != version:
+            return None
+        output_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            for data_file in (self.entry_dir(entry) / DATA_DIR).iterdir():
+                link_or_copy(data_file, output_dir / data_file.name)
+        except FileNotFoundError:
+            logger.warning("Working copy of resource %s went missing", uuid)
+            self._remove(uuid)
+            rmtree(output_dir, ignore_errors=True)
+            return None
+        self.stats.hits += 1
+        entry.last_used = time()
+        self._entries.move_to_end(uuid)
+        return output_dir
+
+    def record(self, uuid: str, version: str, input_path: str) -> bool:
+        """Count a request for a resource version, returning if a copy is due."""
+        if not WORKING_COPIES or Path(input_path).suffix.lower() in INDEXED_SUFFIXES:
+            return False
+        entry = self._entries.get(uuid)
+        if entry and entry.version == version:
+            return False
+        if len(self._requests) > MAX_TRACKED:
+            self._requests = Counter(dict(self._requests.most_common(MAX_TRACKED // 2)))
+        self._requests[uuid, version] += 1
+        return self._requests[uuid, version] >= self.min_requests
+
+    def create_build_dir(self) -> Path:
+        """Create a folder for a copy being built."""
+        build_dir = self.root / "tmp" / uuid4().hex
+        build_dir.mkdir(parents=True)
+        return build_dir
+
+    def put(self, uuid: str, version: str, build_dir: Path, seconds: float) -> None:
+        """Store a copy built in a folder."""
+        data_dir = build_dir / DATA_DIR
+        entry = CopyEntry(
+            uuid=uuid,
+            version=version,
+            size=sum(f.stat().st_size for f in data_dir.iterdir()),
+            created=time(),
+            last_used=time(),
+        )
+        self._remove(uuid)
+        rmtree(self.entry_dir(entry), ignore_errors=True)
+        (build_dir / ENTRY_FILE).write_text(entry.model_dump_json())
+        build_dir.rename(self.entry_dir(entry))
+        self._entries[uuid] = entry
+        self._requests.pop((uuid, version), None)
+        self.stats.builds += 1
+        self.stats.build_seconds += seconds
+        self._evict()
+
+    def get_stats(self) -> dict:
+        """Get the counters of the copies for monitoring."""
+        stats = self.stats.model_dump()
+        stats["hit_rate"] = (
+            stats["hits"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        stats["entries"] = len(self._entries)
+        stats["bytes"] = self.size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _evict(self) -> None:
+        while self.size > self.max_bytes and self._entries:
+            entry = self._remove(next(iter(self._entries)))
+            if entry:
+                self.stats.evictions += 1
+
+    def _remove(self, uuid: str) -> CopyEntry | None:
+        entry = self._entries.pop(uuid, None)
+        if entry:
+            rmtree(self.entry_dir(entry), ignore_errors=True)
+        return entry
+
+
+working_copies = WorkingCopies(
+    CACHE_DIR,
+    WORKING_COPY_MAX_BYTES,
+    WORKING_COPY_MIN_REQUESTS,
+)
@@ -0,0 +1,261 @@
+import logging
+import os
+from asyncio import TaskGroup, sleep
+from pathlib import Path
+from time import monotonic
+
+from httpx import AsyncClient, Response, TransportError, codes
+from pydantic import BaseModel
+
+from .config import (
+    DOWNLOAD_BUFFER_SIZE,
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_CONCURRENCY,
+    DOWNLOAD_PARALLEL_MIN_BYTES,
+    DOWNLOAD_RETRIES,
+)
+from .metrics import downloaded_bytes, get_labels
+from .threads import run_io
+
+logger = logging.getLogger(__name__)
+
+
+class RangeError(RuntimeError):
+    pass
+
+
+class DownloadStats(BaseModel):
+    downloads: int = 0
+    parallel: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    retries: int = 0
+    resumed_bytes: int = 0
+
+
+class Downloader:
+    """Download engine writing files off the event loop.
+
+    When the server accepts range requests, large files are split in chunks fetched
+    in parallel into a preallocated file, and an interrupted chunk or stream resumes
+    from its last written byte instead of starting over.
+    """
+
+    def __init__(
+        self,
+        chunk_size: int,
+        concurrency: int,
+        min_bytes: int,
+        retries: int,
+    ) -> None:
+        """Initialize the downloader."""
+        self.chunk_size = chunk_size
+        self.concurrency = concurrency
+        self.min_bytes = min_bytes
+        self.retries = retries
+        self.stats = DownloadStats()
+
+    async def download(
+        self,
+        client: AsyncClient,
+        url: str,
+        output_file: Path,
+        headers: dict[str, str],
+        head: Response,
+    ) -> int:
+        """Download a file described by a HEAD response, returning its size."""
+        start = monotonic()
+        size = int(head.headers.get("Content-Length", "0"))
+        ranges = head.headers.get("Accept-Ranges") == "bytes"
+        validator = head.headers.get("ETag") or head.headers.get("Last-Modified")
+        if validator:
+            headers = {**headers, "If-Range": validator}
+        fd = os.open(output_file, os.O_CREAT | os.O_TRUNC | os.O_WRONLY, 0o644)
+        try:
+            if ranges and size >= self.min_bytes:
+                try:
+                    await self._download_ranges(client, url, fd, headers, size)
+                    self.stats.parallel += 1
+                except RangeError:
+                    logger.warning("Range requests failed for %s, streaming it", url)
+                    await run_io(os.ftruncate, fd, 0)
+                    await self._download_stream(client, url, fd, headers, ranges=False)
+            else:
+                await self._download_stream(client, url, fd, headers, ranges=ranges)
+        finally:
+            os.close(fd)
+        seconds = monotonic() - start
+        size = (await run_io(output_file.stat)).st_size
+        self.stats.downloads += 1
+        self.stats.bytes += size
+        downloaded_bytes.inc(size, **get_labels())
+        self.stats.seconds += seconds
+        logger.info(
+            "Downloaded %s bytes in %.1fs (%.1f MiB/s) from %s",
+            size,
+            seconds,
+            size / 1024**2 / max(seconds, 1e-6),
+            url,
+        )
+        return size
+
+    def get_stats(self) -> dict:
+        """Get the download counters and throughput for monitoring."""
+        stats = self.stats.model_dump()
+        stats["bytes_per_second"] = (
+            stats["bytes"] / stats["seconds"] if stats["seconds"] else 0.0
+        )
+        return stats
+
+    async def _download_ranges(
+        self,
+        client: AsyncClient,
+        url: str,
+        fd: int,
+        headers: dict[str, str],
+        size: int,
+    ) -> None:
+        await run_io(preallocate, fd, size)
+        spans = [
+            (start, min(start + self.chunk_size, size) - 1)
+            for start in range(0, size, self.chunk_size)
+        ]
+        try:
+            async with TaskGroup() as tg:
+                for i in range(min(self.concurrency, len(spans))):
+                    worker_spans = spans[i :: self.concurrency]
+                    tg.create_task(
+                        self._download_worker(client, url, fd, headers, worker_spans),
+                    )
+        except ExceptionGroup as eg:
+            # Unwrap the first failure, a range error first so the caller streams
+            # the file instead.
+            range_errors, errors = eg.split(RangeError)
+            raise (range_errors or errors).exceptions[0] from None
+
+    async def _download_worker(
+        self,
+        client: AsyncClient,
+        url: str,
+        fd: int,
+        headers: dict[str, str],
+        spans: list[tuple[int, int]],
+    ) -> None:
+        for span in spans:
+            await self._download_range(client, url, fd, headers, span)
+
+    async def _download_range(
+        self,
+        client: AsyncClient,
+        url: str,
+        fd: int,
+        headers: dict[str, str],
+        span: tuple[int, int],
+    ) -> None:
+        start, end = span
+        writer = FileWriter(fd, start)
+        for attempt in range(self.retries + 1):
+            range_headers = {**headers, "Range": f"bytes={writer.position}-{end}"}
+            try:
+                async with client.stream("GET", url, headers=range_headers) as r:
+                    if r.status_code != codes.PARTIAL_CONTENT:
+                        error = f"Expected a partial response, got {r.status_code}."
+                        raise RangeError(error)
+                    await writer.write_response(r)
+                if writer.position > end:
+                    return
+            except TransportError as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning(
+                    "Retrying range of %s at byte %s: %s",
+                    url,
+                    writer.position,
+                    e,
+                )
+            self.stats.retries += 1
+            self.stats.resumed_bytes += writer.position - start
+            await sleep(2**attempt)
+        error = f"Range {start}-{end} of {url} is incomplete."
+        raise RangeError(error)
+
+    async def _download_stream(
+        self,
+        client: AsyncClient,
+        url: str,
+        fd: int,
+        headers: dict[str, str],
+        *,
+        ranges: bool,
+    ) -> None:
+        writer = FileWriter(fd, 0)
+        for attempt in range(self.retries + 1):
+            stream_headers = (
+                {**headers, "Range": f"bytes={writer.position}-"}
+                if writer.position
+                else headers
+            )
+            try:
+                async with client.stream("GET", url, headers=stream_headers) as r:
+                    r.raise_for_status()
+                    if writer.position and r.status_code != codes.PARTIAL_CONTENT:
+                        await run_io(os.ftruncate, fd, 0)
+                        writer.position = 0
+                    await writer.write_response(r)
+                    return
+            except TransportError as e:
+                if attempt == self.retries:
+                    raise
+                logger.warning("Retrying %s at byte %s: %s", url, writer.position, e)
+                if not ranges:
+                    await run_io(os.ftruncate, fd, 0)
+                    writer.position = 0
+                self.stats.retries += 1
+                self.stats.resumed_bytes += writer.position
+            await sleep(2**attempt)
+
+
+def preallocate(fd: int, size: int) -> None:
+    """Reserve the space of a file, so parallel writes do not fragment it."""
+    try:
+        os.posix_fallocate(fd, 0, size)
+    except (AttributeError, OSError):
+        os.ftruncate(fd, size)
+
+
+class FileWriter:
+    """Buffered writer at a position of a file, running the writes in a thread."""
+
+    def __init__(self, fd: int, position: int) -> None:
+        """Initialize the writer."""
+        self.fd = fd
+        self.position = position
+
+    async def write_response(self, r: Response) -> None:
+        """Write a response body, keeping the position of the last byte written."""
+        buffer = bytearray()
+        try:
+            async for chunk in r.aiter_bytes():
+                buffer += chunk
+                if len(buffer) >= DOWNLOAD_BUFFER_SIZE:
+                    await self.write(buffer)
+                    buffer.clear()
+        except TransportError:
+            # Keep the bytes received, so a retry resumes after them.
+            if buffer:
+                await self.write(buffer)
+            raise
+        if buffer:
+            await self.write(buffer)
+
+    async def write(self, data: bytearray) -> None:
+        """Write data at the current position."""
+        self.position += await run_io(os.pwrite, self.fd, bytes(data), self.position)
+
+
+downloader = Downloader(
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_CONCURRENCY,
+    DOWNLOAD_PARALLEL_MIN_BYTES,
+    DOWNLOAD_RETRIES,
+)
@@ -0,0 +1,125 @@
+import logging
+from asyncio import get_running_loop
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+from .config import GDAL_ENGINE, GDAL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+SEGMENTATION_FAULT = -11
+
+
+def init_worker() -> None:
+    """Load GDAL drivers and the PROJ database once per worker process."""
+    from osgeo import gdal, osr  # noqa: PLC0415
+
+    gdal.UseExceptions()
+    gdal.AllRegister()
+    osr.SpatialReference().ImportFromEPSG(4326)
+
+
+def split_config(args: list[str]) -> tuple[list[str], dict[str, str]]:
+    """Separate the --config KEY=VALUE options from the other arguments of a command.
+
+    The algorithm API does not apply them like the GDAL CLI does.
+    """
+    other_args = []
+    config = {}
+    args_iter = iter(args)
+    for arg in args_iter:
+        option = next(args_iter, "") if arg == "--config" else arg
+        if arg == "--config" or arg.startswith("--config="):
+            key, _, value = option.removeprefix("--config=").partition("=")
+            if key:
+                config[key] = value
+        else:
+            other_args.append(arg)
+    return other_args, config
+
+
+def run_algorithm(cmd: list[str]) -> tuple[int, str, str]:
+    """Run a GDAL CLI command through the algorithm API.
+
+    Returns the exit code, stdout and stderr the CLI would have produced.
+    """
+    from osgeo import gdal  # noqa: PLC0415
+
+    _, group, command, *args = cmd
+    args, config = split_config(args)
+    try:
+        alg = gdal.GetGlobalAlgorithmRegistry().InstantiateAlg(group)
+        alg = alg.InstantiateSubAlgorithm(command)
+        with gdal.config_options(config):
+            ok = alg.ParseCommandLineArguments(args) and alg.Run() and alg.Finalize()
+        if not ok:
+            return 1, "", gdal.GetLastErrorMsg()
+        output = alg.GetArg("output-string")
+        return 0, output.Get() if output else "", ""
+    except RuntimeError as e:
+        return 1, "", str(e)
+
+
+class ProcessEngine:
+    """Pool of warm worker processes running GDAL algorithms in-process.
+
+    Saves the process startup, driver registration and PROJ database loading of the
+    GDAL CLI on every request. A worker crash is reported like a segmentation fault
+    of the CLI and the pool is replaced.
+    """
+
+    def __init__(self, workers: int) -> None:
+        """Initialize the engine without starting the workers."""
+        self.workers = workers
+        self._pool: ProcessPoolExecutor | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Check if the engine has started."""
+        return self._pool is not None
+
+    def start(self) -> None:
+        """Start the worker processes."""
+        try:
+            import osgeo.gdal  # noqa: F401, PLC0415
+        except ImportError:
+            logger.warning("GDAL Python bindings are missing, using the GDAL CLI")
+            return
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=init_worker,
+        )
+        logger.info("GDAL process engine started with %s workers", self.workers)
+
+    def stop(self) -> None:
+        """Stop the worker processes."""
+        if self._pool:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    async def run(self, cmd: list[str]) -> tuple[int, str, str]:
+        """Run a GDAL command in a worker process off the event loop."""
+        if self._pool is None:
+            error = "GDAL process engine is not started."
+            raise RuntimeError(error)
+        pool = self._pool
+        try:
+            return await get_running_loop().run_in_executor(pool, run_algorithm, cmd)
+        except BrokenProcessPool:
+            if self._pool is pool:
+                logger.exception("GDAL worker crashed, restarting the pool")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+                self.start()
+            return SEGMENTATION_FAULT, "", ""
+
+
+engine = ProcessEngine(GDAL_WORKERS)
+
+
+def start_engine() -> None:
+    """Start the configured GDAL engine."""
+    if GDAL_ENGINE == "process":
+        engine.start()
@@ -0,0 +1,359 @@
+import logging
+from asyncio import get_running_loop
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from json import dumps
+from pathlib import Path
+from shutil import rmtree
+from time import monotonic
+from typing import TYPE_CHECKING
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from .config import CACHE_DIR, FEATURES_MAX_READERS, FEATURES_READER_TTL
+from .models import FeatureQuery
+from .threads import run_io
+
+if TYPE_CHECKING:
+    from osgeo import gdal, ogr
+
+logger = logging.getLogger(__name__)
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+GEOJSON_MEDIA_TYPE = "application/geo+json"
+INPUT_DIRS = ("copy", "input")  # Workspace folders holding the input of a request
+
+
+class FeatureStats(BaseModel):
+    pages: int = 0
+    features: int = 0
+    opened: int = 0
+    reused: int = 0
+    closed: int = 0
+    evicted: int = 0
+
+
+class Reader:
+    """An opened layer with the filters of a query, positioned after its last page."""
+
+    def __init__(
+        self,
+        dataset: "gdal.Dataset",
+        layer: "ogr.Layer",
+        config: dict[str, str],
+        folder: Path | None,
+    ) -> None:
+        """Keep the dataset with its layer, as the layer is only valid while it is."""
+        self.dataset = dataset
+        self.layer = layer
+        self.config = config
+        self.folder = folder
+        self.last_used = monotonic()
+
+
+class FeatureReaders:
+    """OGR layers paged through by `/vector/features`, kept open between pages.
+
+    A reader stays positioned after the page it returned, so the next page is read
+    without reopening the dataset or scanning it from the start. GDAL handles are not
+    thread-safe, so they are all used from one dedicated thread. Readers unused for
+    FEATURES_READER_TTL seconds, or beyond FEATURES_MAX_READERS, are closed.
+    """
+
+    def __init__(self, root: Path, max_readers: int, ttl: int) -> None:
+        """Initialize the readers without starting their thread."""
+        self.root = root
+        self.max_readers = max_readers
+        self.ttl = ttl
+        self.stats = FeatureStats()
+        self._readers: OrderedDict[str, Reader] = OrderedDict()
+        self._thread: ThreadPoolExecutor | None = None
+
+    @property
+    def enabled(self) -> bool:
+        """Check if the reader thread has started."""
+        return self._thread is not None
+
+    def start(self) -> None:
+        """Start the reader thread, removing the inputs left by a previous run."""
+        rmtree(self.root, ignore_errors=True)
+        try:
+            import osgeo.ogr  # noqa: F401, PLC0415
+        except ImportError:
+            logger.warning("GDAL Python bindings are missing, features are disabled")
+            return
+        self._thread = ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="ogr",
+            initializer=init_thread,
+        )
+
+    async def stop(self) -> None:
+        """Close the readers and stop their thread."""
+        if self._thread is None:
+            return
+        await self._close(list(self._readers.values()))
+        self._readers.clear()
+        self._thread.shutdown()
+        self._thread = None
+
+    def adopt(self, tmp: Path, input_path: str) -> tuple[str, Path | None]:
+        """Move an input out of a workspace, to keep it while its reader is open."""
+        if str(tmp) not in input_path:
+            return input_path, None
+        folder = self.root / uuid4().hex
+        folder.mkdir(parents=True)
+        for name in INPUT_DIRS:
+            if (tmp / name).exists():
+                (tmp / name).rename(folder / name)
+        return input_path.replace(str(tmp), str(folder), 1), folder
+
+    async def continue_page(
+        self,
+        key: str,
+        params: FeatureQuery,
+    ) -> tuple[bytes, str | None] | None:
+        """Read a page from the reader left at its cursor, or None if there is none."""
+        await self._expire()
+        reader = self._readers.pop(get_reader_key(key, params.cursor), None)
+        if reader is None:
+            return None
+        self.stats.reused += 1
+        return await self._read(key, reader, params)
+
+    async def open_page(
+        self,
+        key: str,
+        params: FeatureQuery,
+        folder: Path | None,
+    ) -> tuple[bytes, str | None]:
+        """Open a reader at the cursor of a query and read a page from it."""
+        try:
+            reader = await self._run(open_reader, params, folder)
+        except BaseException:
+            if folder:
+                await run_io(rmtree, folder, ignore_errors=True)
+            raise
+        self.stats.opened += 1
+        return await self._read(key, reader, params)
+
+    def get_stats(self) -> dict:
+        """Get the reader counters for monitoring."""
+        stats = self.stats.model_dump()
+        stats["enabled"] = self.enabled
+        stats["open"] = len(self._readers)
+        stats["max_readers"] = self.max_readers
+        return stats
+
+    async def _read(
+        self,
+        key: str,
+        reader: Reader,
+        params: FeatureQuery,
+    ) -> tuple[bytes, str | None]:
+        try:
+            content, cursor, count = await self._run(read_page, reader, params)
+        except BaseException:
+            await self._close([reader])
+            raise
+        self.stats.pages += 1
+        self.stats.features += count
+        if cursor is None:
+            await self._close([reader])
+            return content, None
+        reader.last_used = monotonic()
+        replaced = self._readers.pop(get_reader_key(key, cursor), None)
+        self._readers[get_reader_key(key, cursor)] = reader
+        evicted = [replaced] if replaced else []
+        while len(self._readers) > self.max_readers:
+            evicted.append(self._readers.popitem(last=False)[1])
+            self.stats.evicted += 1
+        await self._close(evicted)
+        return content, cursor
+
+    async def _expire(self) -> None:
+        deadline = monotonic() - self.ttl
+        expired = [key for key, r in self._readers.items() if r.last_used < deadline]
+        await self._close([self._readers.pop(key) for key in expired])
+
+    async def _close(self, readers: list[Reader]) -> None:
+        if not readers:
+            return
+        await self._run(close_readers, readers)
+        self.stats.closed += len(readers)
+        for reader in readers:
+            if reader.folder:
+                await run_io(rmtree, reader.folder, ignore_errors=True)
+
+    async def _run[**P, R](
+        self,
+        func: Callable[P, R],
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> R:
+        if self._thread is None:
+            error = "Feature readers are not started."
+            raise RuntimeError(error)
+        return await get_running_loop().run_in_executor(
+            self._thread,
+            partial(func, *args, **kwargs),
+        )
+
+
+def init_thread() -> None:
+    """Make GDAL raise exceptions in the reader thread."""
+    from osgeo import gdal  # noqa: PLC0415
+
+    gdal.UseExceptions()
+
+
+def get_reader_key(key: str, cursor: str | None) -> str:
+    """Get the key of the reader of a query positioned at a cursor."""
+    return f"{key}:{cursor or ''}"
+
+
+def open_reader(params: FeatureQuery, folder: Path | None) -> Reader:
+    """Open the layer of a query with its filters, after the feature of its cursor.
+
+    The cursor is the id of the last feature read, so reopening a layer at it needs
+    features in id order. A spatial index may return them in another order, so a
+    cursor with a bbox is rejected on layers with one, once their reader is closed.
+
+    Raises ValueError if the input, layer, filters or cursor are invalid.
+    """
+    from osgeo import gdal, ogr  # noqa: PLC0415
+
+    config = dict(option.split("=", 1) for option in params.config or [])
+    try:
+        with gdal.config_options(config):
+            dataset = gdal.OpenEx(
+                params.input,
+                gdal.OF_VECTOR | gdal.OF_READONLY,
+                allowed_drivers=params.input_format or [],
+                open_options=params.open_option or [],
+            )
+    except RuntimeError as e:
+        raise ValueError(str(e)) from e
+    layer = (
+        dataset.GetLayerByName(params.layer) if params.layer else dataset.GetLayer(0)
+    )
+    if layer is None:
+        error = f"The layer {params.layer} does not exist."
+        raise ValueError(error)
+    if params.cursor and params.bbox and layer.TestCapability(ogr.OLCFastSpatialFilter):
+        error = (
+            "The cursor has expired, and this layer cannot resume a bbox query "
+            "from a cursor. Request its pages again from the first one."
+        )
+        raise ValueError(error)
+    if params.fields:
+        defn = layer.GetLayerDefn()
+        names = [defn.GetFieldDefn(i).GetName() for i in range(defn.GetFieldCount())]
+        layer.SetIgnoredFields([name for name in names if name not in params.fields])
+    conditions = [f"({params.where})"] if params.where else []
+    if params.cursor:
+        conditions.insert(0, f"FID > {int(params.cursor)}")
+    if conditions:
+        try:
+            layer.SetAttributeFilter(" AND ".join(conditions))
+        except RuntimeError as e:
+            raise ValueError(str(e)) from e
+    if params.bbox:
+        layer.SetSpatialFilterRect(*[float(value) for value in params.bbox.split(",")])
+    return Reader(dataset, layer, config, folder)
+
+
+def read_page(reader: Reader, params: FeatureQuery) -> tuple[bytes, str | None, int]:
+    """Read the next features of a reader, with the cursor of the page after."""
+    from osgeo import gdal  # noqa: PLC0415
+
+    with gdal.config_options(reader.config):
+        features = list(islice(iter(reader.layer.GetNextFeature, None), params.limit))
+    cursor = str(features[-1].GetFID()) if len(features) == params.limit else None
+    if params.output_format == "Arrow":
+        content = get_arrow_page(reader.layer, features, params.fields)
+    else:
+        content = get_geojson_page(features, params.fields, cursor)
+    return content, cursor, len(features)
+
+
+def get_geojson_page(
+    features: list["ogr.Feature"],
+    fields: list[str] | None,
+    cursor: str | None,
+) -> bytes:
+    """Encode features as a GeoJSON feature collection with the next cursor."""
+    items = []
+    for feature in features:
+        item = feature.ExportToJson(as_object=True)
+        if fields:
+            item["properties"] = {
+                name: value
+                for name, value in item["properties"].items()
+                if name in fields
+            }
+        items.append(item)
+    page = {
+        "type": "FeatureCollection",
+        "features": items,
+        "numberReturned": len(items),
+        "next_cursor": cursor,
+    }
+    return dumps(page).encode()
+
+
+def get_arrow_page(
+    layer: "ogr.Layer",
+    features: list["ogr.Feature"],
+    fields: list[str] | None,
+) -> bytes:
+    """Encode features as an Arrow IPC stream with GeoArrow geometries."""
+    from osgeo import gdal, ogr  # noqa: PLC0415
+
+    path = f"/vsimem/{uuid4().hex}.arrows"
+    try:
+        dataset = ogr.GetDriverByName("Arrow").CreateDataSource(path)
+        output = dataset.CreateLayer(
+            layer.GetName(),
+            srs=layer.GetSpatialRef(),
+            geom_type=layer.GetGeomType(),
+            options=[
+                "FORMAT=STREAM",
+                "GEOMETRY_ENCODING=GEOARROW",
+                f"FID={layer.GetFIDColumn() or 'fid'}",
+            ],
+        )
+        defn = layer.GetLayerDefn()
+        for i in range(defn.GetFieldCount()):
+            field = defn.GetFieldDefn(i)
+            if not fields or field.GetName() in fields:
+                output.CreateField(field)
+        for feature in features:
+            output_feature = ogr.Feature(output.GetLayerDefn())
+            output_feature.SetFrom(feature)
+            output_feature.SetFID(feature.GetFID())
+            output.CreateFeature(output_feature)
+        dataset.Close()
+        with gdal.VSIFile(path, "rb") as f:
+            return f.read()
+    finally:
+        if gdal.VSIStatL(path):
+            gdal.Unlink(path)
+
+
+def close_readers(readers: list[Reader]) -> None:
+    """Release the GDAL handles of readers."""
+    for reader in readers:
+        reader.layer = None
+        reader.dataset.Close()
+
+
+feature_readers = FeatureReaders(
+    CACHE_DIR / "features",
+    FEATURES_MAX_READERS,
+    FEATURES_READER_TTL,
+)
@@ -0,0 +1,128 @@
+import logging
+import sqlite3
+from json import loads
+from pathlib import Path
+from threading import Lock
+from time import time
+
+from pydantic import BaseModel
+
+from .config import CACHE_DIR
+from .threads import run_io
+
+logger = logging.getLogger(__name__)
+
+
+class IndexStats(BaseModel):
+    requests: int = 0
+    hits: int = 0
+    misses: int = 0
+    stale: int = 0
+    stores: int = 0
+    errors: int = 0
+
+
+class MetadataIndex:
+    """Persistent index of the `gdal vector info` output of each resource version.
+
+    Rows are keyed by resource UUID and replaced when HDX reports a new version, so
+    default info requests are answered without downloading or opening the resource.
+    Queries run in the I/O threads, one at a time as they share a connection.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """Initialize the index without opening the database."""
+        self.path = path
+        self.stats = IndexStats()
+        self._db: sqlite3.Connection | None = None
+        self._lock = Lock()
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        """Connection to the index database, created on first use."""
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(
+                self.path,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS info ("
+                "uuid TEXT PRIMARY KEY, version TEXT, info TEXT, updated REAL)",
+            )
+        return self._db
+
+    def load(self) -> None:
+        """Open the index."""
+        count = self.db.execute("SELECT COUNT(*) FROM info").fetchone()[0]
+        logger.info("Metadata index has %s resources", count)
+
+    def close(self) -> None:
+        """Close the index."""
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    async def contains(self, uuid: str, version: str) -> bool:
+        """Check if a version of a resource is indexed."""
+        rows = await run_io(
+            self._execute,
+            "SELECT version FROM info WHERE uuid = ?",
+            uuid,
+        )
+        return rows == [(version,)]
+
+    async def get(self, uuid: str, version: str) -> dict | None:
+        """Get the info of a version of a resource, or None if it is not indexed."""
+        self.stats.requests += 1
+        rows = await run_io(
+            self._execute,
+            "SELECT version, info FROM info WHERE uuid = ?",
+            uuid,
+        )
+        if not rows:
+            self.stats.misses += 1
+            return None
+        if rows[0][0] != version:
+            self.stats.stale += 1
+            await run_io(self._execute, "DELETE FROM info WHERE uuid = ?", uuid)
+            return None
+        self.stats.hits += 1
+        return loads(rows[0][1])
+
+    async def put(self, uuid: str, version: str, info: str) -> None:
+        """Store the info of a version of a resource."""
+        try:
+            loads(info)
+        except ValueError:
+            self.stats.errors += 1
+            logger.warning("Not indexing invalid info of resource %s", uuid)
+            return
+        await run_io(
+            self._execute,
+            "INSERT OR REPLACE INTO info VALUES (?, ?, ?, ?)",
+            uuid,
+            version,
+            info,
+            time(),
+        )
+        self.stats.stores += 1
+
+    async def get_stats(self) -> dict:
+        """Get the index counters for monitoring."""
+        stats = self.stats.model_dump()
+        stats["hit_rate"] = (
+            stats["hits"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        rows = await run_io(self._execute, "SELECT COUNT(*) FROM info")
+        stats["entries"] = rows[0][0]
+        return stats
+
+    def _execute(self, sql: str, *params: str | float) -> list[tuple]:
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+
+metadata_index = MetadataIndex(CACHE_DIR / "metadata.sqlite")
@@ -0,0 +1,143 @@
+import logging
+from asyncio import Semaphore, Task, create_task
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+from shutil import rmtree
+from time import time
+from typing import Literal
+from uuid import uuid4
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+from .cache import link_or_copy
+from .config import CACHE_DIR, JOB_CONCURRENCY, JOB_TTL
+from .threads import run_io
+from .workspaces import workspaces
+
+logger = logging.getLogger(__name__)
+
+
+class Job(BaseModel):
+    job_id: str
+    command: str
+    status: Literal["queued", "running", "succeeded", "failed"] = "queued"
+    progress: float = 0.0
+    created: float
+    started: float | None = None
+    finished: float | None = None
+    expires: float | None = None
+    error: str | None = None
+    filename: str | None = None
+    media_type: str | None = None
+    owner: str | None = Field(default=None, exclude=True)
+
+    def set_progress(self, progress: float) -> None:
+        """Update the progress percentage reported by GDAL."""
+        self.progress = progress
+
+
+class Manifest(BaseModel):
+    jobs: list[Job]
+
+
+Run = Callable[[Job, Path], Awaitable[tuple[Path, str]]]
+
+
+class JobStore:
+    """Background jobs and their results kept on local disk for a limited time."""
+
+    def __init__(self, root: Path, ttl: int, concurrency: int) -> None:
+        """Initialize the store without touching the disk."""
+        self.root = root
+        self.ttl = ttl
+        self._jobs: dict[str, Job] = {}
+        self._semaphore = Semaphore(concurrency)
+        self._tasks: set[Task[None]] = set()
+
+    def job_dir(self, job: Job) -> Path:
+        """Get the folder holding the files of a job."""
+        return self.root / job.job_id
+
+    def result_path(self, job: Job) -> Path | None:
+        """Get the path of the result of a finished job."""
+        if job.status != "succeeded" or not job.filename:
+            return None
+        return self.job_dir(job) / job.filename
+
+    def clear(self) -> None:
+        """Remove results left by a previous run, as their jobs are gone."""
+        rmtree(self.root, ignore_errors=True)
+
+    def submit(self, command: str, owner: str | None, run: Run) -> Job:
+        """Queue a job and return it immediately."""
+        self.sweep()
+        job = Job(
+            job_id=uuid4().hex,
+            command=command,
+            created=time(),
+            owner=owner,
+        )
+        self._jobs[job.job_id] = job
+        task = create_task(self._run(job, run))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str, owner: str | None) -> Job | None:
+        """Get a job submitted by the same user, who must be known."""
+        self.sweep()
+        job = self._jobs.get(job_id)
+        if job and owner and job.owner == owner:
+            return job
+        return None
+
+    async def checkout(self, job: Job, output_dir: Path) -> Path | None:
+        """Hard link the result of a finished job into a working directory to serve it.
+
+        The link keeps the result readable even if the job expires while it is sent.
+        Returns None if the job has no result, or it was removed already.
+        """
+        result_path = self.result_path(job)
+        if not result_path:
+            return None
+        try:
+            return await run_io(link_or_copy, result_path, output_dir / job.filename)
+        except FileNotFoundError:
+            return None
+
+    def sweep(self) -> None:
+        """Forget expired jobs and delete their results."""
+        now = time()
+        for job in list(self._jobs.values()):
+            if job.expires and job.expires <= now:
+                del self._jobs[job.job_id]
+                rmtree(self.job_dir(job), ignore_errors=True)
+
+    async def _run(self, job: Job, run: Run) -> None:
+        async with self._semaphore:
+            job.status = "running"
+            job.started = time()
+            self.job_dir(job).mkdir(parents=True)
+            work_dir = workspaces.create()
+            try:
+                output_path, media_type = await run(job, work_dir)
+                link_or_copy(output_path, self.job_dir(job) / output_path.name)
+                job.filename = output_path.name
+                job.media_type = media_type
+                job.progress = 100.0
+                job.status = "succeeded"
+            except HTTPException as e:
+                job.error = str(e.detail)
+                job.status = "failed"
+            except Exception as e:
+                logger.exception("Job %s failed", job.job_id)
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                await workspaces.remove(work_dir)
+                job.finished = time()
+                job.expires = job.finished + self.ttl
+
+
+job_store = JobStore(CACHE_DIR / "jobs", JOB_TTL, JOB_CONCURRENCY)
@@ -0,0 +1,304 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+
+from pydantic import BaseModel
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LABEL_NAMES = ("command", "output_format")
+MAX_LABEL_LENGTH = 32
+OUTPUT_FORMATS = frozenset(
+    {
+        # GDAL vector drivers supporting creation, lowercase
+        "arrow",
+        "csv",
+        "dxf",
+        "esri shapefile",
+        "flatgeobuf",
+        "geojson",
+        "geojsonseq",
+        "gml",
+        "gpkg",
+        "gpx",
+        "json",
+        "kml",
+        "libkml",
+        "mapinfo file",
+        "mbtiles",
+        "mvt",
+        "ods",
+        "openfilegdb",
+        "parquet",
+        "pmtiles",
+        "sqlite",
+        "xlsx",
+        # Output file extensions
+        "arrows",
+        "feather",
+        "fgb",
+        "gdb",
+        "geojsonl",
+        "geojsons",
+        "kmz",
+        "mif",
+        "none",
+        "shp",
+        "shz",
+        "tab",
+        "zip",
+    },
+)
+SECONDS_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+    600.0,
+)
+
+request_labels: ContextVar[dict[str, str] | None] = ContextVar(
+    "request_labels",
+    default=None,
+)
+
+
+class Metric:
+    """Metric in the Prometheus text exposition format, with a series per label set."""
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...],
+    ) -> None:
+        """Initialize the metric without any series."""
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._lock = Lock()
+
+    def get_key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        """Get the label values of a series in the order of the label names."""
+        return tuple(labels.get(name, "") for name in self.label_names)
+
+    def format_labels(self, key: tuple[str, ...], **extra: str) -> str:
+        """Format the labels of a sample."""
+        pairs = [*zip(self.label_names, key, strict=True), *extra.items()]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{n}="{escape(v)}"' for n, v in pairs) + "}"
+
+    def render(self) -> list[str]:
+        """Render the help and type lines of the metric."""
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...],
+    ) -> None:
+        """Initialize the counter."""
+        super().__init__(name, documentation, label_names)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, value: float = 1, **labels: str) -> None:
+        """Increase the counter of a label set."""
+        key = self.get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> list[str]:
+        """Render the counter."""
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            *super().render(),
+            *(f"{self.name}{self.format_labels(k)} {v}" for k, v in values),
+        ]
+
+
+class Series(BaseModel):
+    buckets: list[int]
+    sum: float = 0.0
+    count: int = 0
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...],
+        buckets: tuple[float, ...] = SECONDS_BUCKETS,
+    ) -> None:
+        """Initialize the histogram."""
+        super().__init__(name, documentation, label_names)
+        self.buckets = buckets
+        self._series: dict[tuple[str, ...], Series] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation for a label set."""
+        key = self.get_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if not series:
+                series = Series(buckets=[0] * len(self.buckets))
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series.buckets[i] += 1
+            series.sum += value
+            series.count += 1
+
+    def render(self) -> list[str]:
+        """Render the histogram with cumulative buckets."""
+        with self._lock:
+            series = sorted(
+                (k, s.model_copy(deep=True)) for k, s in self._series.items()
+            )
+        lines = super().render()
+        for key, s in series:
+            for bound, count in zip(self.buckets, s.buckets, strict=True):
+                labels = self.format_labels(key, le=str(bound))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = self.format_labels(key, le="+Inf")
+            lines.append(f"{self.name}_bucket{labels} {s.count}")
+            lines.append(f"{self.name}_sum{self.format_labels(key)} {s.sum}")
+            lines.append(f"{self.name}_count{self.format_labels(key)} {s.count}")
+        return lines
+
+
+class Registry:
+    """Collection of the metrics exposed on /metrics."""
+
+    def __init__(self) -> None:
+        """Initialize the registry."""
+        self.metrics: list[Metric] = []
+
+    def counter(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = LABEL_NAMES,
+    ) -> Counter:
+        """Register a counter."""
+        metric = Counter(name, documentation, label_names)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: tuple[str, ...] = LABEL_NAMES,
+        buckets: tuple[float, ...] = SECONDS_BUCKETS,
+    ) -> Histogram:
+        """Register a histogram."""
+        metric = Histogram(name, documentation, label_names, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Render all the metrics in the Prometheus text exposition format."""
+        return "\n".join(line for m in self.metrics for line in m.render()) + "\n"
+
+
+def escape(value: str) -> str:
+    """Escape a label value."""
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def get_labels() -> dict[str, str]:
+    """Get the labels of the current request, shared with its tasks."""
+    labels = request_labels.get()
+    if labels is None:
+        labels = {"command": "", "output_format": ""}
+        request_labels.set(labels)
+    return labels
+
+
+def set_labels(command: str | None = None, output: str | None = None) -> None:
+    """Label the current request with its command and output format.
+
+    The output format is the lowercase GDAL driver name or output file extension,
+    and formats outside OUTPUT_FORMATS are grouped under "other", as are values too
+    long to be a command.
+    """
+    labels = get_labels()
+    if command is not None:
+        labels["command"] = normalize(command)
+    if output is not None:
+        output = output.lower()
+        labels["output_format"] = output if output in OUTPUT_FORMATS else "other"
+
+
+def set_output_labels(output_format: str | None, output: str | None) -> None:
+    """Label the current request with the output format of its parameters."""
+    if output_format:
+        set_labels(output=output_format)
+    elif output:
+        set_labels(output=Path(output).suffix.removeprefix(".") or "none")
+
+
+def normalize(value: str) -> str:
+    """Normalize a label value, bounding the number of series."""
+    value = value.lower()
+    return value if len(value) <= MAX_LABEL_LENGTH else "other"
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time a stage of the current request."""
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(perf_counter() - start, stage=stage, **get_labels())
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    "hdx_geo_stage_seconds",
+    "Time spent in each stage of a request.",
+    ("stage", *LABEL_NAMES),
+)
+downloaded_bytes = registry.counter(
+    "hdx_geo_downloaded_bytes_total",
+    "Bytes of resources downloaded from HDX.",
+)
+served_bytes = registry.counter(
+    "hdx_geo_served_bytes_total",
+    "Bytes of response bodies sent to clients.",
+)
+subprocess_exits = registry.counter(
+    "hdx_geo_subprocess_exits_total",
+    "Exit codes of the GDAL subprocesses.",
+    ("code", *LABEL_NAMES),
+)
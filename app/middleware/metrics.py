@@ -0,0 +1,58 @@
+from collections.abc import AsyncIterator, Callable
+from time import perf_counter
+
+from fastapi import Request, Response
+from starlette.routing import Match
+
+from ..config import PREFIX
+from ..metrics import (
+    request_labels,
+    served_bytes,
+    set_labels,
+    set_output_labels,
+    stage_seconds,
+)
+
+
+async def metrics_tracking(request: Request, call_next: Callable) -> Response:
+    """Middleware labelling a request for its metrics and timing its response."""
+    labels = {"command": "", "output_format": ""}
+    request_labels.set(labels)
+    path = get_route_path(request).removeprefix(PREFIX)
+    if path.startswith(("/vector/", "/jobs/vector/")):
+        command = next(s for s in reversed(path.split("/")) if not s.startswith("{"))
+        set_labels(command=command, output="json" if command == "info" else None)
+        set_output_labels(
+            request.query_params.get("output_format"),
+            request.query_params.get("output"),
+        )
+    response = await call_next(request)
+    response.body_iterator = send_body(response.body_iterator, labels)
+    return response
+
+
+def get_route_path(request: Request) -> str:
+    """Get the path template of the route matching a request, before it is routed.
+
+    Labelling by template keeps path parameters such as tile coordinates out of the
+    series.
+    """
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return ""
+
+
+async def send_body(
+    body: AsyncIterator[bytes],
+    labels: dict[str, str],
+) -> AsyncIterator[bytes]:
+    """Count the bytes of a response body and time sending them."""
+    start = perf_counter()
+    try:
+        async for chunk in body:
+            served_bytes.inc(len(chunk), **labels)
+            yield chunk
+    finally:
+        stage_seconds.observe(perf_counter() - start, stage="send", **labels)
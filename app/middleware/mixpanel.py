@@ -3,7 +3,8 @@ from collections.abc import Callable
 
 from fastapi import BackgroundTasks, Request, Response
 
-from ..config import PREFIX, mixpanel
+from ..analytics import mixpanel
+from ..config import PREFIX
 from .utils import track_api_call
 
 logger = logging.getLogger(__name__)
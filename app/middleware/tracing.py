@@ -0,0 +1,16 @@
+from collections.abc import Callable
+
+from fastapi import Request, Response
+
+from ..tracing import tracer
+
+
+async def tracing(request: Request, call_next: Callable) -> Response:
+    """Middleware running a request in the root span of its trace."""
+    name = f"{request.method} {request.url.path}"
+    with tracer.trace(name, request.headers.get("traceparent")) as span:
+        span.set_attribute("http.request.method", request.method)
+        span.set_attribute("url.path", request.url.path)
+        response = await call_next(request)
+        span.set_attribute("http.response.status_code", response.status_code)
+        return response
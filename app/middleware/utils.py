@@ -1,4 +1,5 @@
 import logging
+from functools import lru_cache
 from hashlib import md5
 from time import time
 from urllib.parse import parse_qs, unquote, urlparse
@@ -6,10 +7,12 @@ from urllib.parse import parse_qs, unquote, urlparse
 import ua_parser.user_agent_parser as useragent
 from fastapi import Request, Response
 
-from ..config import mixpanel
+from ..analytics import mixpanel
 
 logger = logging.getLogger(__name__)
 
+USER_AGENT_CACHE_SIZE = 1024
+
 
 async def track_api_call(request: Request, response: Response) -> None:
     """Tracks an API call by collecting request and response metadata to Mixpanel.
@@ -76,7 +79,9 @@ async def send_mixpanel_event(
     distinct_id: str,
     event_data: dict,
 ) -> None:
-    """Send an event to Mixpanel for analytics tracking.
+    """Queue an event for Mixpanel analytics tracking.
+
+    The event is sent in a batch by the worker thread of the Mixpanel queue.
 
     Args:
         event_name: The name of the event to track.
@@ -155,6 +160,7 @@ def _parse_nginx_header(request: Request) -> tuple[str, list[str], str, str]:
     return endpoint, query_params_keys, resource_id, current_url
 
 
+@lru_cache(maxsize=USER_AGENT_CACHE_SIZE)
 def _parse_user_agent(user_agent: str) -> tuple[str | None, str | None, str | None]:
     """Parse the user agent string.
 
@@ -1,8 +1,9 @@
 # ruff: noqa: UP040
-from typing import Annotated, TypeAlias
+from typing import Annotated, Literal, TypeAlias
 
 from pydantic import BaseModel, Field
 
+from .config import FEATURES_MAX_LIMIT
 from .docs import descriptions as d
 
 Bool = bool | None
@@ -12,14 +13,18 @@ One = str | None
 
 ActiveGeometry: TypeAlias = Annotated[One, Field(description=d["active_geometry"])]
 ActiveLayer: TypeAlias = Annotated[One, Field(description=d["active_layer"])]
+Archive: TypeAlias = Annotated[bool, Field(description=d["archive"])]
 Bbox: TypeAlias = Annotated[One, Field(description=d["bbox"])]
 Config: TypeAlias = Annotated[Many, Field(description=d["config"])]
 CreationOption: TypeAlias = Annotated[Many, Field(description=d["creation_option"])]
+Cursor: TypeAlias = Annotated[One, Field(pattern=r"^\d+$", description=d["cursor"])]
 Dialect: TypeAlias = Annotated[One, Field(description=d["dialect"])]
 Features: TypeAlias = Annotated[Bool, Field(description=d["features"])]
+Fields: TypeAlias = Annotated[Many, Field(description=d["fields"])]
 Input: TypeAlias = Annotated[str, Field(description=d["input"])]
 InputFormat: TypeAlias = Annotated[Many, Field(description=d["input_format"])]
 InputLayer: TypeAlias = Annotated[Many, Field(description=d["input_layer"])]
+Layer: TypeAlias = Annotated[One, Field(description=d["layer"])]
 LayerCreationOption: TypeAlias = Annotated[
     Many,
     Field(description=d["layer_creation_option"]),
@@ -29,8 +34,17 @@ OpenOption: TypeAlias = Annotated[Many, Field(description=d["open_option"])]
 Output: TypeAlias = Annotated[str, Field(description=d["output"])]
 OutputFormat: TypeAlias = Annotated[One, Field(description=d["output_format"])]
 OutputLayer: TypeAlias = Annotated[One, Field(description=d["output_layer"])]
+PageFormat: TypeAlias = Annotated[
+    Literal["GeoJSON", "Arrow"],
+    Field(description=d["page_format"]),
+]
+PageLimit: TypeAlias = Annotated[
+    int,
+    Field(ge=1, le=FEATURES_MAX_LIMIT, description=d["page_limit"]),
+]
 PreserveBoundary: TypeAlias = Annotated[Bool, Field(description=d["preserve_boundary"])]
 SkipErrors: TypeAlias = Annotated[Bool, Field(description=d["skip_errors"])]
+Steps: TypeAlias = Annotated[list["Step"], Field(min_length=1, description=d["steps"])]
 Sql: TypeAlias = Annotated[One, Field(description=d["sql"])]
 Summary: TypeAlias = Annotated[Bool, Field(description=d["summary"])]
 Tolerance: TypeAlias = Annotated[float, Field(description=d["tolerance"])]
@@ -145,4 +159,123 @@ class SimplifyCoverage(BaseModel):
     open_option: OpenOption = None
 
 
+class Tiles(BaseModel):
+    # required options
+    input: Input
+    # common options
+    config: Config = None
+    # options
+    input_layer: InputLayer = None
+    # advanced options
+    input_format: InputFormat = None
+    open_option: OpenOption = None
+
+
+class FeatureQuery(BaseModel):
+    # required options
+    input: Input
+    # common options
+    config: Config = None
+    # options
+    layer: Layer = None
+    bbox: Bbox = None
+    where: Where = None
+    fields: Fields = None
+    limit: PageLimit = 100
+    cursor: Cursor = None
+    output_format: PageFormat = "GeoJSON"
+    # advanced options
+    input_format: InputFormat = None
+    open_option: OpenOption = None
+
+
 VectorFile = Convert | Filter | Simplify | SimplifyCoverage
+
+
+class ConvertOperation(Convert):
+    command: Literal["convert"]
+
+
+class FilterOperation(Filter):
+    command: Literal["filter"]
+
+
+class SimplifyOperation(Simplify):
+    command: Literal["simplify"]
+
+
+class SimplifyCoverageOperation(SimplifyCoverage):
+    command: Literal["simplify-coverage"]
+
+
+Operation: TypeAlias = Annotated[
+    ConvertOperation | FilterOperation | SimplifyOperation | SimplifyCoverageOperation,
+    Field(discriminator="command"),
+]
+
+
+class Batch(BaseModel):
+    operations: Annotated[
+        list[Operation],
+        Field(min_length=1, description=d["operations"]),
+    ]
+    archive: Archive = True
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "operations": [
+                        {"command": "convert", "input": "Foo", "output": "foo.geojson"},
+                        {"command": "convert", "input": "Foo", "output": "foo.shp"},
+                    ],
+                },
+            ],
+        },
+    }
+
+
+class FilterStep(BaseModel):
+    step: Literal["filter"]
+    active_layer: ActiveLayer = None
+    bbox: Bbox = None
+    where: Where = None
+
+
+class SimplifyStep(BaseModel):
+    step: Literal["simplify"]
+    tolerance: Tolerance
+    active_layer: ActiveLayer = None
+    active_geometry: ActiveGeometry = None
+
+
+class SimplifyCoverageStep(BaseModel):
+    step: Literal["simplify-coverage"]
+    tolerance: Tolerance
+    active_layer: ActiveLayer = None
+    preserve_boundary: PreserveBoundary = None
+
+
+Step: TypeAlias = Annotated[
+    FilterStep | SimplifyStep | SimplifyCoverageStep,
+    Field(discriminator="step"),
+]
+
+
+class Pipeline(Convert):
+    steps: Steps
+
+    model_config = {
+        "json_schema_extra": {
+            "examples": [
+                {
+                    "input": "Foo",
+                    "output": "foo.parquet",
+                    "steps": [
+                        {"step": "filter", "bbox": "30,-5,35,0"},
+                        {"step": "simplify", "tolerance": 0.001},
+                    ],
+                },
+            ],
+        },
+    }
@@ -0,0 +1,117 @@
+import logging
+from functools import partial
+from pathlib import Path
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import FileResponse
+
+from .. import models
+from ..auth import get_api_key
+from ..jobs import Job, job_store
+from ..workspaces import get_workspace
+from .vector_utils import vector_job
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["Jobs"], dependencies=[Depends(get_api_key)])
+
+
+def submit_job(
+    request: Request,
+    params: models.VectorFile | models.Info,
+    command: str,
+) -> Job:
+    """Queue a vector command as a background job."""
+    app_name = getattr(request.state, "app_name", None)
+    owner = getattr(request.state, "owner", None)
+    run = partial(vector_job, params=params, command=command, app_name=app_name)
+    return job_store.submit(command, owner, run)
+
+
+def get_job(request: Request, job_id: str) -> Job:
+    """Get a job of the current user."""
+    job = job_store.get(job_id, getattr(request.state, "owner", None))
+    if not job:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return job
+
+
+@router.post("/jobs/vector/convert", status_code=status.HTTP_202_ACCEPTED)
+async def job_vector_convert(
+    request: Request,
+    params: Annotated[models.Convert, Query()],
+) -> Job:
+    """Submit a job converting a vector dataset to another format."""
+    return submit_job(request, params, "convert")
+
+
+@router.post("/jobs/vector/filter", status_code=status.HTTP_202_ACCEPTED)
+async def job_vector_filter(
+    request: Request,
+    params: Annotated[models.Filter, Query()],
+) -> Job:
+    """Submit a job filtering a vector dataset."""
+    return submit_job(request, params, "filter")
+
+
+@router.post("/jobs/vector/info", status_code=status.HTTP_202_ACCEPTED)
+async def job_vector_info(
+    request: Request,
+    params: Annotated[models.Info, Query()],
+) -> Job:
+    """Submit a job returning information about a vector dataset."""
+    return submit_job(request, params, "info")
+
+
+@router.post("/jobs/vector/pipeline", status_code=status.HTTP_202_ACCEPTED)
+async def job_vector_pipeline(request: Request, params: models.Pipeline) -> Job:
+    """Submit a job running processing steps on a vector dataset."""
+    return submit_job(request, params, "pipeline")
+
+
+@router.post("/jobs/vector/simplify", status_code=status.HTTP_202_ACCEPTED)
+async def job_vector_simplify(
+    request: Request,
+    params: Annotated[models.Simplify, Query()],
+) -> Job:
+    """Submit a job simplifying geometries of a vector dataset."""
+    return submit_job(request, params, "simplify")
+
+
+@router.post("/jobs/vector/simplify-coverage", status_code=status.HTTP_202_ACCEPTED)
+async def job_vector_simplify_coverage(
+    request: Request,
+    params: Annotated[models.SimplifyCoverage, Query()],
+) -> Job:
+    """Submit a job simplifying boundaries of a polygonal vector dataset."""
+    return submit_job(request, params, "simplify-coverage")
+
+
+@router.get("/jobs/{job_id}")
+async def job_status(request: Request, job_id: str) -> Job:
+    """Get the status and progress of a job.
+
+    Progress is the percentage reported by GDAL, and is only updated for commands
+    writing a file.
+    """
+    return get_job(request, job_id)
+
+
+@router.get("/jobs/{job_id}/result")
+async def job_result(
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
+    job_id: str,
+) -> FileResponse:
+    """Download the result of a finished job. Supports range requests."""
+    job = get_job(request, job_id)
+    result_path = await job_store.checkout(job, tmp_dir)
+    if not result_path and job.status == "succeeded":
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not result_path:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Job is {job.status}",
+        )
+    return FileResponse(result_path, media_type=job.media_type, filename=job.filename)
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, Depends, Response
+
+from ..analytics import mixpanel_queue
+from ..auth import get_api_key, token_cache
+from ..cache import resource_cache, result_cache
+from ..clients import http_clients
+from ..config import MONITORING_AUTH
+from ..copies import working_copies
+from ..download import downloader
+from ..features import feature_readers
+from ..index import metadata_index
+from ..metrics import CONTENT_TYPE, registry
+from ..scheduler import scheduler
+from ..sozip import archiver
+from ..threads import loop_monitor
+from ..tiles import tile_cache
+from ..tracing import tracer
+from ..utils import zip_stats
+from ..workspaces import workspaces
+
+router = APIRouter(
+    tags=["Monitoring"],
+    dependencies=[Depends(get_api_key)] if MONITORING_AUTH else [],
+)
+
+
+@router.get("/stats")
+async def stats() -> dict[str, dict]:
+    """Endpoint to monitor the caches of the service."""
+    return {
+        "resource_cache": resource_cache.get_stats(),
+        "result_cache": result_cache.get_stats(),
+        "scheduler": scheduler.get_stats(),
+        "downloads": downloader.get_stats(),
+        "event_loop": loop_monitor.get_stats(),
+        "features": feature_readers.get_stats(),
+        "http_clients": http_clients.get_stats(),
+        "mixpanel": mixpanel_queue.get_stats(),
+        "metadata_index": await metadata_index.get_stats(),
+        "sozip": archiver.get_stats(),
+        "tiles": tile_cache.get_stats(),
+        "token_cache": token_cache.get_stats(),
+        "tracing": tracer.get_stats(),
+        "working_copies": working_copies.get_stats(),
+        "workspaces": workspaces.get_stats(),
+        "zip_inputs": zip_stats.get_stats(),
+    }
+
+
+@router.get("/metrics", response_class=Response)
+async def metrics() -> Response:
+    """Endpoint exposing the request stage timings in the Prometheus text format."""
+    return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -2,60 +2,137 @@ import logging
 from pathlib import Path
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Query
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, Depends, Query, Request, Response, status
+from fastapi.responses import JSONResponse
 
 from .. import models
 from ..auth import get_api_key
-from ..utils import get_temp_dir
-from .vector_utils import vector_file, vector_json
+from ..jobs import Manifest
+from ..tiles import Tile
+from ..workspaces import get_workspace
+from .jobs import submit_job
+from .vector_utils import (
+    get_operations,
+    get_tile,
+    vector_batch,
+    vector_features,
+    vector_file,
+    vector_json,
+    vector_tile,
+)
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["Vector Commands"], dependencies=[Depends(get_api_key)])
 
 
+@router.post("/vector/batch")
+async def vector_batch_operations(
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
+    batch: models.Batch,
+) -> Response:
+    """Run several commands on one or more vector datasets in a single request.
+
+    Each input is downloaded once. By default, the outputs are returned together in a
+    SOZip archive, prefixed with the operation number if their names collide. With
+    `archive` set to `false`, each operation is submitted as a background job and a
+    manifest of the jobs is returned, their results fetchable from
+    `/jobs/{job_id}/result`.
+    """
+    operations = get_operations(batch)
+    if not batch.archive:
+        jobs = [submit_job(request, params, command) for command, params in operations]
+        return JSONResponse(
+            Manifest(jobs=jobs).model_dump(mode="json"),
+            status_code=status.HTTP_202_ACCEPTED,
+        )
+    return await vector_batch(request, tmp_dir, operations)
+
+
 @router.get("/vector/convert")
 async def vector_convert(
-    tmp_dir: Annotated[Path, Depends(get_temp_dir)],
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
     params: Annotated[models.Convert, Query()],
-) -> FileResponse:
+) -> Response:
     """Convert a vector dataset to another format.
 
     [Original documentation](https://gdal.org/en/stable/programs/gdal_vector_convert.html)
     """
-    return await vector_file(tmp_dir, params, "convert")
+    return await vector_file(request, tmp_dir, params, "convert")
+
+
+@router.get("/vector/features")
+async def vector_read_features(
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
+    params: Annotated[models.FeatureQuery, Query()],
+) -> Response:
+    """Read one page of the features of a layer, filtered by bbox and attributes.
+
+    Pages are GeoJSON feature collections, or Arrow IPC streams with GeoArrow
+    geometries. Each page but the last gives the `cursor` of the next one, in its
+    `next_cursor` member or `Next-Cursor` header, along with a `Link` header to it.
+    Features are ordered by their id, unless a `bbox` is read through a spatial
+    index, and geometries are in the CRS of the layer.
+
+    The layer stays open between the pages of a query for a few minutes, so paging
+    through it reads on from the last page instead of starting over. Cursors of a
+    query read through a spatial index are rejected once its layer is closed, and
+    paging has to start over.
+    """
+    return await vector_features(request, tmp_dir, params)
 
 
 @router.get("/vector/filter")
 async def vector_filter(
-    tmp_dir: Annotated[Path, Depends(get_temp_dir)],
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
     params: Annotated[models.Filter, Query()],
-) -> FileResponse:
+) -> Response:
     """Filter a vector dataset with a spatial extent (bbox) or a SQL WHERE clause.
 
     [Original documentation](https://gdal.org/en/stable/programs/gdal_vector_filter.html)
     """
-    return await vector_file(tmp_dir, params, "filter")
+    return await vector_file(request, tmp_dir, params, "filter")
 
 
 @router.get("/vector/info")
 async def vector_info(
-    tmp_dir: Annotated[Path, Depends(get_temp_dir)],
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
     params: Annotated[models.Info, Query()],
-) -> JSONResponse:
+) -> Response:
     """Return various information about a GDAL supported vector dataset.
 
     [Original documentation](https://gdal.org/en/stable/programs/gdal_vector_info.html)
     """
-    return await vector_json(tmp_dir, params, "info")
+    return await vector_json(request, tmp_dir, params, "info")
+
+
+@router.post("/vector/pipeline")
+async def vector_pipeline(
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
+    params: models.Pipeline,
+) -> Response:
+    """Read a vector dataset, run processing steps on it and write the result.
+
+    Steps are chained in a single `gdal vector pipeline`, so the features stream from
+    one step to the next without intermediate files, and the input is downloaded once.
+
+    [Original documentation](https://gdal.org/en/stable/programs/gdal_vector_pipeline.html)
+    """
+    return await vector_file(request, tmp_dir, params, "pipeline")
 
 
 @router.get("/vector/simplify")
 async def vector_simplify(
-    tmp_dir: Annotated[Path, Depends(get_temp_dir)],
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
     params: Annotated[models.Simplify, Query()],
-) -> FileResponse:
+) -> Response:
     """Simplify geometries of a vector dataset (for lines and polygons).
 
     Ensures that the result is a valid geometry having the same dimension and number of
@@ -71,14 +148,15 @@ async def vector_simplify(
 
     [Original documentation](https://gdal.org/en/stable/programs/gdal_vector_simplify.html)
     """
-    return await vector_file(tmp_dir, params, "simplify")
+    return await vector_file(request, tmp_dir, params, "simplify")
 
 
 @router.get("/vector/simplify-coverage")
 async def vector_simplify_coverage(
-    tmp_dir: Annotated[Path, Depends(get_temp_dir)],
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
     params: Annotated[models.SimplifyCoverage, Query()],
-) -> FileResponse:
+) -> Response:
     """Simplify boundaries of a polygonal vector dataset (will give errors for lines).
 
     Shared boundaries are preserved without introducing gaps or overlaps between
@@ -93,4 +171,26 @@ async def vector_simplify_coverage(
 
     [Original documentation](https://gdal.org/en/stable/programs/gdal_vector_simplify_coverage.html)
     """
-    return await vector_file(tmp_dir, params, "simplify-coverage")
+    return await vector_file(request, tmp_dir, params, "simplify-coverage")
+
+
+@router.get("/vector/tiles/{z}/{x}/{y}")
+async def vector_tiles(
+    request: Request,
+    tmp_dir: Annotated[Path, Depends(get_workspace)],
+    tile: Annotated[Tile, Depends(get_tile)],
+    params: Annotated[models.Tiles, Query()],
+) -> Response:
+    """Return a Mapbox Vector Tile of a vector dataset in the Web Mercator grid.
+
+    Tiles are gzip-compressed, and empty tiles return 204 No Content. Geometries are
+    clipped to the tile and simplified by an amount depending on the zoom. Tiles are
+    cached per resource version, and all tiles up to a zoom are precomputed for
+    frequently requested resources. Input layers may be in any CRS.
+
+    To export a whole dataset as tiles, use `/vector/convert` with an `.mbtiles` or
+    `.pmtiles` output.
+
+    [Original documentation](https://gdal.org/en/stable/drivers/vector/mvt.html)
+    """
+    return await vector_tile(request, tmp_dir, params, tile)
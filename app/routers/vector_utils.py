@@ -1,29 +1,136 @@
 import logging
+from asyncio import Semaphore, Task, TaskGroup, create_task, gather
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from itertools import pairwise
 from json import loads
 from pathlib import Path
+from shutil import rmtree
+from time import monotonic
+from urllib.parse import quote
+from zipfile import is_zipfile
 
 from content_types import get_content_type
-from fastapi import HTTPException, status
-from fastapi.responses import FileResponse, JSONResponse
-from httpx import HTTPStatusError
+from fastapi import HTTPException, Request, Response, status
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from httpx import HTTPError, HTTPStatusError
 from magic import from_file as magic_from_file
 
-from ..models import Info, VectorFile
+from ..cache import (
+    Resource,
+    ResultEntry,
+    resource_cache,
+    result_cache,
+)
+from ..config import (
+    BATCH_CONCURRENCY,
+    BATCH_MAX_OPERATIONS,
+    METADATA_INDEX,
+    SCHEDULER_RETRY_AFTER,
+    SIMPLIFY_PARTITION_MIN_BYTES,
+    SIMPLIFY_PARTITIONS,
+    STREAMING,
+    TILE_PYRAMID_MAX_ZOOM,
+    WORKING_COPIES,
+    WORKSPACE_WAIT,
+)
+from ..copies import DATA_DIR, working_copies
+from ..features import ARROW_MEDIA_TYPE, GEOJSON_MEDIA_TYPE, feature_readers
+from ..index import metadata_index
+from ..jobs import Job
+from ..metrics import set_output_labels, timed
+from ..models import (
+    Batch,
+    Convert,
+    FeatureQuery,
+    Filter,
+    Info,
+    Operation,
+    Pipeline,
+    Simplify,
+    SimplifyCoverage,
+    Tiles,
+    VectorFile,
+)
+from ..scheduler import FairSemaphore, QueueFullError, scheduler
+from ..sozip import archiver, get_members
+from ..threads import run_io
+from ..tiles import (
+    TILE_MEDIA_TYPE,
+    TILES_DIR,
+    Tile,
+    get_tile_bbox,
+    get_tile_options,
+    is_valid_tile,
+    read_tile,
+    tile_cache,
+)
+from ..tracing import Attributes, set_attributes, traced, tracer
 from ..utils import (
+    Progress,
     download_resource,
+    get_input_size,
     get_options,
     get_output_path,
+    get_remote_config,
+    get_resource,
+    get_result_key,
+    get_zip_input,
+    get_zip_path,
     run_command_and_check,
+    stream_command_and_check,
 )
+from ..workspaces import WorkspaceFullError, workspaces
 
 logger = logging.getLogger(__name__)
 
+PARTITION_COMMAND = "partition"  # Scheduler command of the partitions of a layer
+PARTITION_MIN_FEATURES = 10000
+REMOTE_PREFIXES = ("/vsicurl/", "/vsizip//vsicurl/")
+STREAM_FORMATS = {
+    ".csv": "CSV",
+    ".fgb": "FlatGeobuf",
+    ".geojson": "GeoJSON",
+    ".geojsonl": "GeoJSONSeq",
+    ".geojsons": "GeoJSONSeq",
+}
+STREAM_MEDIA_TYPES = {
+    "CSV": "text/csv",
+    "FlatGeobuf": "application/flatgeobuf",
+    "GeoJSON": "application/geo+json",
+    "GeoJSONSeq": "application/geo+json-seq",
+}
+ZIP_MEDIA_TYPE = "application/zip"
+
+BATCH_MODELS: dict[str, type[VectorFile]] = {
+    "convert": Convert,
+    "filter": Filter,
+    "simplify": Simplify,
+    "simplify-coverage": SimplifyCoverage,
+}
+
+PAGE_FIELDS = {"cursor", "limit", "output_format"}
+PIPELINE_GLOBAL_FIELDS = {"config"}
+PIPELINE_READ_FIELDS = {"input", "input_format", "input_layer", "open_option"}
+PIPELINE_WRITE_FIELDS = {
+    "creation_option",
+    "layer_creation_option",
+    "output",
+    "output_format",
+    "output_layer",
+}
+
+building: dict[str, Task[None]] = {}
+indexing: dict[str, Task[None]] = {}
+tiling: dict[str, Task[None]] = {}
+
 
 def add_default_options(options: list[str], params: VectorFile) -> list[str]:
     """Add default options."""
     compression = "--layer-creation-option=COMPRESSION="
     compression_level = "--layer-creation-option=COMPRESSION_LEVEL="
     encoding = "--layer-creation-option=ENCODING="
+    max_zoom = "--creation-option=MAXZOOM="
     target_arcgis_version = "--layer-creation-option=TARGET_ARCGIS_VERSION="
     response = [*options]
     suffixes = Path(params.output).suffixes
@@ -41,78 +148,1083 @@ def add_default_options(options: list[str], params: VectorFile) -> list[str]:
         ".shp" in suffixes or output_format == "ESRI Shapefile"
     ) and encoding not in "".join(options):
         response.append(f"{encoding}UTF-8")
+    if (
+        ".mbtiles" in suffixes
+        or ".pmtiles" in suffixes
+        or output_format in {"MBTiles", "PMTiles"}
+    ) and max_zoom not in "".join(options):
+        response.extend(
+            f"--creation-option={option}"
+            for option in get_tile_options(0, TILE_PYRAMID_MAX_ZOOM)
+        )
     return response
 
 
-def get_media_type(output_path: Path) -> str:
+def get_vector_command(params: VectorFile, command: str) -> list[str]:
+    """Build the GDAL command of an endpoint writing a file."""
+    if isinstance(params, Pipeline):
+        return get_pipeline_command(params)
+    options = get_options(params)
+    options = add_default_options(options, params)
+    return ["gdal", "vector", command, *options]
+
+
+def get_pipeline_command(params: Pipeline) -> list[str]:
+    """Build a `gdal vector pipeline` reading, processing and writing in one run."""
+    pipeline = ["read", *get_options(params, PIPELINE_READ_FIELDS)]
+    for step in params.steps:
+        step_fields = step.model_fields_set - {"step"}
+        pipeline.extend(["!", step.step, *get_options(step, step_fields)])
+    write_options = get_options(params, PIPELINE_WRITE_FIELDS)
+    write_options = add_default_options(write_options, params)
+    pipeline.extend(["!", "write", *write_options])
+    global_options = get_options(params, PIPELINE_GLOBAL_FIELDS)
+    return ["gdal", "vector", "pipeline", *global_options, *pipeline]
+
+
+def is_partial_read(
+    params: VectorFile | Info | Tiles | FeatureQuery,
+    command: str,
+) -> bool:
+    """Check if a command reads only part of its input, like a header or a bbox."""
+    if command == "tiles":
+        return True
+    if command == "features":
+        return not params.where
+    if command == "info":
+        return not (params.features or params.limit or params.sql or params.where)
+    if command == "filter":
+        return bool(params.bbox) and not params.where
+    return False
+
+
+def is_index_request(params: Info, command: str) -> bool:
+    """Check if a command can be answered from the metadata index."""
+    return METADATA_INDEX and command == "info" and params.model_fields_set <= {"input"}
+
+
+def get_stream_format(params: VectorFile) -> str | None:
+    """Get the output format if it can be written to a pipe."""
+    if not STREAMING:
+        return None
+    suffix = Path(params.output).suffix.lower()
+    output_format = params.output_format or STREAM_FORMATS.get(suffix)
+    if output_format in STREAM_FORMATS.values():
+        return output_format
+    return None
+
+
+async def get_media_type(output_path: Path) -> str:
     """Get the media type of a file."""
     geo_content_types = {
         ".fgb": "application/flatgeobuf",
         ".geojson": "application/geo+json",
+        ".geojsonl": "application/geo+json-seq",
+        ".geojsons": "application/geo+json-seq",
         ".gpx": "application/gpx+xml",
         ".kml": "application/vnd.google-earth.kml+xml",
         ".kmz": "application/vnd.google-earth.kmz",
+        ".pmtiles": "application/vnd.pmtiles",
     }
-    media_type = get_content_type(output_path)
-    if media_type == "application/octet-stream":
-        media_type = geo_content_types.get(
-            output_path.suffix,
-            "application/octet-stream",
-        )
-    if media_type == "application/octet-stream":
-        media_type = magic_from_file(output_path, mime=True)
+    with timed("media_type"):
+        media_type = get_content_type(output_path)
+        if media_type == "application/octet-stream":
+            media_type = geo_content_types.get(
+                output_path.suffix,
+                "application/octet-stream",
+            )
+        if media_type == "application/octet-stream":
+            media_type = await run_io(magic_from_file, output_path, mime=True)
     return media_type
 
 
-async def vector_json(tmp: Path, params: Info, command: str) -> JSONResponse:
-    """Endpoint to convert a vector file to another format."""
+def is_not_modified(request: Request, etag: str) -> bool:
+    """Check if an entity tag is listed in the If-None-Match header of a request."""
+    if_none_match = request.headers.get("If-None-Match", "")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+async def cached_response(
+    request: Request,
+    tmp: Path,
+    entry: ResultEntry,
+) -> Response | None:
+    """Serve a cached output, or 304 Not Modified if the client has it already.
+
+    The output is linked into the workspace first, so an eviction cannot delete it
+    while it is sent. Returns None if it was evicted before that.
+    """
+    etag = f'"{entry.key}"'
+    if is_not_modified(request, etag):
+        result_cache.stats.not_modified += 1
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+    output_path = await result_cache.checkout(entry, tmp)
+    if not output_path:
+        return None
+    result_cache.stats.bytes_served += entry.size
+    return FileResponse(
+        output_path,
+        media_type=entry.media_type,
+        filename=entry.filename,
+        headers={"ETag": etag},
+    )
+
+
+async def cache_stream(
+    chunks: AsyncGenerator[bytes],
+    output_path: Path,
+    key: str,
+    media_type: str,
+    semaphores: list[FairSemaphore],
+) -> AsyncGenerator[bytes]:
+    """Forward a stream, storing it in the result cache once complete."""
+    f = None
+    try:
+        f = await run_io(output_path.open, "wb")
+        async for chunk in chunks:
+            await run_io(f.write, chunk)
+            yield chunk
+        await run_io(f.close)
+        result_cache.put(key, output_path, media_type)
+    finally:
+        if f:
+            await run_io(f.close)
+        await chunks.aclose()
+        scheduler.release(semaphores)
+
+
+async def acquire_slots(
+    app_name: str | None,
+    command: str,
+    input_path: str,
+    *,
+    bounded: bool = True,
+    size: int | None = None,
+) -> list[FairSemaphore]:
+    """Wait for the scheduler slots of a command, or reject it if the queue is full.
+
+    The size of the input is measured unless it is given.
+    """
+    if size is None:
+        size = await run_io(get_input_size, input_path)
     try:
-        params.input = await download_resource(tmp, params.input)
+        return await scheduler.acquire(command, app_name, size, bounded=bounded)
+    except QueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(SCHEDULER_RETRY_AFTER)},
+        ) from e
+
+
+@asynccontextmanager
+async def command_slots(
+    app_name: str | None,
+    command: str,
+    input_path: str,
+    *,
+    bounded: bool = True,
+) -> AsyncGenerator[None]:
+    """Hold the scheduler slots of a command while it runs."""
+    semaphores = await acquire_slots(app_name, command, input_path, bounded=bounded)
+    try:
+        yield
+    finally:
+        scheduler.release(semaphores)
+
+
+async def get_input_resource(
+    params: VectorFile | Info | Tiles | FeatureQuery,
+) -> Resource:
+    """Get the version of the input resource."""
+    try:
+        return await get_resource(params.input)
     except HTTPStatusError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         ) from e
-    options = get_options(params)
-    cmd = ["gdal", "vector", command, "--output-format=json", *options]
+
+
+async def reserve_workspace(tmp: Path, resource: Resource) -> None:
+    """Reserve the disk space needed to process a resource in a workspace."""
     try:
-        stdout_string = await run_command_and_check(cmd)
-    except RuntimeError as e:
+        await workspaces.reserve(tmp, resource.size)
+    except WorkspaceFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(WORKSPACE_WAIT)},
+        ) from e
+
+
+async def prepare_input(
+    tmp: Path,
+    resource: Resource,
+    params: VectorFile | Info | Tiles | FeatureQuery,
+    command: str,
+) -> None:
+    """Download the input resource, or point GDAL at it remotely.
+
+    Bbox filters and tiles read the spatially indexed working copy of the resource if
+    any. Requests with open options or an input format read the resource itself, as
+    the copy is converted without them and read by another driver.
+    """
+    await reserve_workspace(tmp, resource)
+    copy_request = (
+        WORKING_COPIES
+        and not params.open_option
+        and not params.input_format
+        and (
+            command == "tiles"
+            or (command in {"features", "filter"} and bool(params.bbox))
+        )
+    )
+    if copy_request:
+        copy_dir = working_copies.checkout(
+            resource.uuid,
+            resource.version,
+            tmp / "copy",
+        )
+        if copy_dir:
+            params.input = str(copy_dir)
+            return
+    try:
+        params.input = await download_resource(
+            tmp,
+            resource,
+            partial_read=is_partial_read(params, command),
+        )
+    except HTTPError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         ) from e
-    return JSONResponse(loads(stdout_string))
+    if params.input.startswith(REMOTE_PREFIXES):
+        params.config = [*get_remote_config(), *(params.config or [])]
+        return
+    if copy_request and working_copies.record(
+        resource.uuid,
+        resource.version,
+        params.input,
+    ):
+        copy_in_background(resource)
+    if METADATA_INDEX and not (
+        isinstance(params, Info) and is_index_request(params, command)
+    ):
+        index_in_background(resource)
 
 
-async def vector_file(tmp: Path, params: VectorFile, command: str) -> FileResponse:
-    """Endpoint to convert a vector file to another format."""
+def get_cached_input(resource: Resource) -> str | None:
+    """Get the input path of a cached resource version for background work."""
+    path = resource_cache.get_path(resource.uuid, resource.version)
+    if path is None:
+        return None
+    if is_zipfile(path):
+        return get_zip_input(path) or f"/vsizip/{path}"
+    return str(path)
+
+
+def copy_in_background(resource: Resource) -> None:
+    """Build the working copy of a resource, unless it is being built."""
+    if resource.uuid in building:
+        return
+    task = create_task(build_working_copy(resource))
+    building[resource.uuid] = task
+    task.add_done_callback(lambda _: building.pop(resource.uuid, None))
+
+
+async def build_working_copy(resource: Resource) -> None:
+    """Convert a cached resource to FlatGeobuf layers with a spatial index."""
+    input_path = await run_io(get_cached_input, resource)
+    if input_path is None:
+        return
+    build_dir = working_copies.create_build_dir()
+    cmd = [
+        *["gdal", "vector", "convert", f"--input={input_path}"],
+        *[f"--output={build_dir / DATA_DIR}", "--output-format=FlatGeobuf"],
+        "--layer-creation-option=SPATIAL_INDEX=YES",
+    ]
+    start = monotonic()
+    try:
+        async with command_slots("working-copy", "convert", input_path, bounded=False):
+            await run_command_and_check(cmd)
+        working_copies.put(
+            resource.uuid,
+            resource.version,
+            build_dir,
+            monotonic() - start,
+        )
+        logger.info("Built the working copy of resource %s", resource.uuid)
+    except (HTTPException, OSError, RuntimeError):
+        working_copies.stats.build_failures += 1
+        logger.warning("Building the working copy of %s failed", resource.uuid)
+    finally:
+        rmtree(build_dir, ignore_errors=True)
+
+
+def pyramid_in_background(resource: Resource, params: Tiles, key: str) -> None:
+    """Build all the tiles of a tileset up to a zoom, unless they are being built."""
+    if key in tiling:
+        return
+    task = create_task(build_pyramid(resource, params, key))
+    tiling[key] = task
+    task.add_done_callback(lambda _: tiling.pop(key, None))
+
+
+async def cache_input(resource: Resource) -> str | None:
+    """Download a resource to the resource cache for background work.
+
+    Tiles read large resources through /vsicurl/, so they may never be cached.
+    """
+    workspace = workspaces.create()
+    try:
+        await workspaces.reserve(workspace, resource.size)
+        await download_resource(workspace, resource)
+    except (HTTPError, OSError, WorkspaceFullError):
+        logger.warning("Downloading resource %s failed", resource.uuid)
+        return None
+    finally:
+        await workspaces.remove(workspace)
+    return await run_io(get_cached_input, resource)
+
+
+async def build_pyramid(resource: Resource, params: Tiles, key: str) -> None:
+    """Convert a cached resource to the tiles of a tileset up to a zoom.
+
+    The resource is downloaded first if it is not cached.
+    """
+    input_path = await run_io(get_cached_input, resource)
+    if input_path is None:
+        input_path = await cache_input(resource)
+    if input_path is None:
+        tile_cache.stats.pyramid_skips += 1
+        logger.warning("Skipped the tile pyramid of uncached %s", resource.uuid)
+        return
+    build_dir = await run_io(tile_cache.create_build_dir)
+    pyramid_params = params.model_copy(update={"input": input_path})
+    cmd = [
+        *["gdal", "vector", "convert"],
+        *get_options(pyramid_params, PIPELINE_GLOBAL_FIELDS | PIPELINE_READ_FIELDS),
+        *[f"--output={build_dir / TILES_DIR}", "--output-format=MVT"],
+        *[
+            f"--creation-option={option}"
+            for option in get_tile_options(0, TILE_PYRAMID_MAX_ZOOM)
+        ],
+    ]
+    start = monotonic()
+    try:
+        async with command_slots("tile-pyramid", "tiles", input_path, bounded=False):
+            await run_command_and_check(cmd)
+        await tile_cache.put_pyramid(key, resource.uuid, build_dir, monotonic() - start)
+        logger.info("Built the tile pyramid of resource %s", resource.uuid)
+    except (HTTPException, OSError, RuntimeError):
+        tile_cache.stats.pyramid_failures += 1
+        logger.warning("Building the tile pyramid of %s failed", resource.uuid)
+    finally:
+        await run_io(rmtree, build_dir, ignore_errors=True)
+
+
+def index_in_background(resource: Resource) -> None:
+    """Index the info of a cached resource, unless it is indexed or being indexed."""
+    if resource.uuid in indexing:
+        return
+    task = create_task(index_resource(resource))
+    indexing[resource.uuid] = task
+    task.add_done_callback(lambda _: indexing.pop(resource.uuid, None))
+
+
+async def index_resource(resource: Resource) -> None:
+    """Run `gdal vector info` on a cached resource and store it in the index."""
+    if await metadata_index.contains(resource.uuid, resource.version):
+        return
+    input_path = await run_io(get_cached_input, resource)
+    if input_path is None:
+        return
+    cmd = ["gdal", "vector", "info", "--output-format=json", f"--input={input_path}"]
+    try:
+        async with command_slots("metadata-index", "info", input_path, bounded=False):
+            info = await run_command_and_check(cmd)
+    except (HTTPException, RuntimeError):
+        metadata_index.stats.errors += 1
+        logger.warning("Indexing resource %s failed", resource.uuid)
+        return
+    await metadata_index.put(resource.uuid, resource.version, info)
+
+
+def prepare_output(tmp: Path, params: VectorFile) -> Path:
+    """Point the output of a command at the temporary directory."""
     output_path = tmp / "output" / params.output
     output_path.parent.mkdir()
     params.output = str(output_path)
+    return output_path
+
+
+async def write_vector_json(tmp: Path, params: Info, command: str) -> Path:
+    """Run a command with a JSON output and write it to a file."""
+    options = get_options(params)
+    cmd = ["gdal", "vector", command, "--output-format=json", *options]
     try:
-        params.input = await download_resource(tmp, params.input)
-    except HTTPStatusError as e:
+        stdout_string = await run_command_and_check(cmd)
+    except RuntimeError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         ) from e
-    options = get_options(params)
-    options = add_default_options(options, params)
-    cmd = ["gdal", "vector", command, *options]
+    output_path = tmp / f"{command}.json"
+    await run_io(output_path.write_text, stdout_string)
+    return output_path
+
+
+async def write_vector_tile(tmp: Path, params: Tiles, tile: Tile) -> Path | None:
+    """Generate a tile around its bbox, returning its file or None if it is empty.
+
+    Features are clipped to the bbox, which GDAL reprojects to the CRS of each layer,
+    so the MVT driver only writes the tile and the edges of its neighbours.
+    """
+    z, x, y = tile
+    output_dir = tmp / TILES_DIR
+    cmd = [
+        *["gdal", "vector", "pipeline", *get_options(params, PIPELINE_GLOBAL_FIELDS)],
+        *["read", *get_options(params, PIPELINE_READ_FIELDS)],
+        *["!", "clip", f"--bbox={get_tile_bbox(tile)}", "--bbox-crs=EPSG:4326"],
+        *["!", "write", f"--output={output_dir}", "--output-format=MVT"],
+        *[f"--creation-option={option}" for option in get_tile_options(z, z)],
+    ]
+    await run_command_and_check(cmd)
+    tile_file = output_dir / str(z) / str(x) / f"{y}.pbf"
+    return tile_file if await run_io(tile_file.exists) else None
+
+
+async def write_vector_file(
+    output_path: Path,
+    params: VectorFile,
+    command: str,
+    progress: Progress | None = None,
+    *,
+    archive: bool = True,
+) -> Path:
+    """Run a command with a file output, zipping it if it has several files.
+
+    Without archive, the folder of the files to zip is returned instead.
+    """
+    cmd = get_vector_command(params, command)
+    if progress:
+        cmd.insert(3, "--progress")
     try:
-        await run_command_and_check(cmd)
+        plan = await plan_partitions(params, command)
+        if plan:
+            await run_partitions(output_path, params, *plan, progress)
+        else:
+            await run_command_and_check(cmd, progress)
+        return await get_output_path(output_path, archive=archive)
     except RuntimeError as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e),
         ) from e
+
+
+def is_partitioned(params: VectorFile, command: str, size: int) -> bool:
+    """Check if a command may run over partitions of its input, from its size."""
+    return (
+        command == "simplify"
+        and SIMPLIFY_PARTITIONS > 1
+        and not (params.active_layer or params.skip_errors)
+        and not params.input.startswith(REMOTE_PREFIXES)
+        and size >= SIMPLIFY_PARTITION_MIN_BYTES
+    )
+
+
+async def plan_partitions(
+    params: VectorFile,
+    command: str,
+    size: int | None = None,
+) -> tuple[str, list[str]] | None:
+    """Get the layer and partition filters of a command, or None to run it once."""
+    if size is None:
+        size = await run_io(get_input_size, params.input)
+    if not is_partitioned(params, command, size):
+        return None
+    return await get_partition_plan(params, SIMPLIFY_PARTITIONS)
+
+
+async def get_layers(params: VectorFile) -> list[dict]:
+    """Get the info of the layers of an input, or none if it cannot be read."""
+    info_fields = {"input", "config", "input_layer", "input_format", "open_option"}
+    info_params = Info.model_validate(
+        params.model_dump(include=info_fields, exclude_none=True),
+    )
+    cmd = ["gdal", "vector", "info", "--output-format=json", *get_options(info_params)]
     try:
-        output_path = await get_output_path(output_path)
-    except RuntimeError as e:
+        return loads(await run_command_and_check(cmd)).get("layers") or []
+    except (RuntimeError, ValueError):
+        return []
+
+
+async def get_partition_plan(
+    params: VectorFile,
+    partitions: int,
+) -> tuple[str, list[str]] | None:
+    """Split a single layer into ranges of feature ids of about the same size.
+
+    Returns the layer and the filter of each range, or None if the input has several
+    layers or too few features to be worth splitting.
+    """
+    layers = await get_layers(params)
+    if len(layers) != 1:
+        return None
+    count = layers[0].get("featureCount") or 0
+    partitions = min(partitions, count // PARTITION_MIN_FEATURES)
+    if partitions < 2:  # noqa: PLR2004
+        return None
+    fid_column = layers[0].get("fidColumnName")
+    fid = quote_identifier(fid_column) if fid_column else "FID"
+    bounds = [count * i // partitions for i in range(1, partitions)]
+    filters = [
+        f"{fid} < {bounds[0]}",
+        *(f"{fid} >= {start} AND {fid} < {end}" for start, end in pairwise(bounds)),
+        f"{fid} >= {bounds[-1]}",
+    ]
+    return layers[0]["name"], filters
+
+
+def quote_identifier(name: str) -> str:
+    """Quote the name of a layer or field in a filter or an SQL query."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def get_partition_command(
+    params: VectorFile,
+    layer: str,
+    where: str,
+    output_path: Path,
+) -> list[str]:
+    """Build the pipeline simplifying a partition of a layer to FlatGeobuf."""
+    read_fields = PIPELINE_GLOBAL_FIELDS | {"input", "input_format", "open_option"}
+    step_fields = {"tolerance", "active_geometry"}
+    pipeline = Pipeline.model_validate(
+        {
+            **params.model_dump(include=read_fields, exclude_none=True),
+            "input_layer": [layer],
+            "output": str(output_path),
+            "output_format": "FlatGeobuf",
+            "layer_creation_option": ["SPATIAL_INDEX=NO"],
+            "steps": [
+                {"step": "filter", "where": where},
+                {
+                    "step": "simplify",
+                    **params.model_dump(include=step_fields, exclude_none=True),
+                },
+            ],
+        },
+    )
+    return get_pipeline_command(pipeline)
+
+
+def get_merge_command(
+    params: VectorFile,
+    layer: str,
+    input_paths: list[Path],
+) -> list[str]:
+    """Build the command concatenating partitions, in order, into the output."""
+    write_options = get_options(params, PIPELINE_WRITE_FIELDS)
+    write_options = add_default_options(write_options, params)
+    if not params.output_layer:
+        write_options.append(f"--output-layer={layer}")
+    return [
+        *["gdal", "vector", "concat"],
+        *get_options(params, PIPELINE_GLOBAL_FIELDS),
+        "--mode=single",
+        *[f"--input={input_path}" for input_path in input_paths],
+        *write_options,
+    ]
+
+
+async def run_partitions(
+    output_path: Path,
+    params: VectorFile,
+    layer: str,
+    filters: list[str],
+    progress: Progress | None = None,
+) -> None:
+    """Run a command over partitions of a layer, then merge them in order.
+
+    The partitions run in parallel in the process engine when it is enabled, or as
+    separate GDAL processes, each taking a slot of the partition command of the
+    scheduler.
+    """
+    partition_dir = output_path.parent.with_name("partitions")
+    await run_io(partition_dir.mkdir)
+    partition_paths = [partition_dir / f"{i}.fgb" for i in range(len(filters))]
+    done = 0
+
+    async def run(where: str, partition_path: Path) -> None:
+        nonlocal done
+        semaphores = await scheduler.acquire(PARTITION_COMMAND, None, 0, bounded=False)
+        try:
+            await run_command_and_check(
+                get_partition_command(params, layer, where, partition_path),
+            )
+        finally:
+            scheduler.release(semaphores)
+        done += 1
+        if progress:
+            progress(100 * done / (len(filters) + 1))
+
+    start = monotonic()
+    with tracer.span("run_partitions", partitions=len(filters)):
+        try:
+            async with TaskGroup() as tg:
+                for where, partition_path in zip(filters, partition_paths, strict=True):
+                    tg.create_task(run(where, partition_path))
+        except* RuntimeError as eg:
+            raise eg.exceptions[0] from None
+        await run_command_and_check(get_merge_command(params, layer, partition_paths))
+    await run_io(rmtree, partition_dir, ignore_errors=True)
+    logger.info(
+        "Simplified %s in %s partitions in %.1fs",
+        layer,
+        len(filters),
+        monotonic() - start,
+    )
+
+
+def get_info_attributes(info: dict) -> Attributes:
+    """Get the driver and feature count of an info output for tracing."""
+    layers = info.get("layers") or []
+    return {
+        "gdal.driver": info.get("driverShortName"),
+        "gdal.feature_count": sum(layer.get("featureCount") or 0 for layer in layers),
+    }
+
+
+@traced("vector_json")
+async def vector_json(
+    request: Request,
+    tmp: Path,
+    params: Info,
+    command: str,
+) -> Response:
+    """Endpoint to convert a vector file to another format."""
+    set_attributes({"gdal.command": command})
+    resource = await get_input_resource(params)
+    key = get_result_key(resource, command, params)
+    entry = result_cache.get(key)
+    response = await cached_response(request, tmp, entry) if entry else None
+    if response:
+        set_attributes({"cache.hit": "result"})
+        return response
+    index_request = is_index_request(params, command)
+    if index_request:
+        info = await metadata_index.get(resource.uuid, resource.version)
+        if info is not None:
+            set_attributes({"cache.hit": "index", **get_info_attributes(info)})
+            return JSONResponse(info, headers={"ETag": f'"{key}"'})
+    await prepare_input(tmp, resource, params, command)
+    app_name = getattr(request.state, "app_name", None)
+    async with command_slots(app_name, command, params.input):
+        output_path = await write_vector_json(tmp, params, command)
+    output_text = await run_io(output_path.read_text)
+    if index_request:
+        await metadata_index.put(resource.uuid, resource.version, output_text)
+    entry = result_cache.put(key, output_path, "application/json")
+    output = loads(output_text)
+    set_attributes(get_info_attributes(output))
+    return JSONResponse(output, headers={"ETag": f'"{entry.key}"'})
+
+
+async def vector_stream(
+    key: str,
+    output_path: Path,
+    params: VectorFile,
+    command: str,
+    semaphores: list[FairSemaphore],
+) -> StreamingResponse | None:
+    """Stream the output of a command, or None if it cannot be streamed.
+
+    Once streaming, the scheduler slots are released at the end of the stream.
+    """
+    output_format = get_stream_format(params)
+    if not output_format:
+        return None
+    spatial_index = "SPATIAL_INDEX="
+    stream_params = params.model_copy(
+        update={"output": "/vsistdout/", "output_format": output_format},
+    )
+    layer_creation_options = stream_params.layer_creation_option or []
+    if output_format == "FlatGeobuf" and spatial_index not in "".join(
+        layer_creation_options,
+    ):
+        stream_params.layer_creation_option = [
+            *layer_creation_options,
+            f"{spatial_index}NO",
+        ]
+    cmd = get_vector_command(stream_params, command)
+    media_type = STREAM_MEDIA_TYPES[output_format]
+    try:
+        chunks = await stream_command_and_check(cmd)
+    except RuntimeError:
+        logger.warning("Streaming %s failed, writing to a file instead", output_format)
+        return None
+    try:
+        return StreamingResponse(
+            cache_stream(chunks, output_path, key, media_type, semaphores),
+            media_type=media_type,
+            headers={
+                "Content-Disposition": get_content_disposition(output_path.name),
+                "ETag": f'"{key}"',
+            },
+        )
+    except BaseException:
+        await chunks.aclose()
+        raise
+
+
+async def stream_archive(key: str, input_path: Path, output_zip: Path) -> Response:
+    """Stream the SOZip of a folder while it is built, then cache it."""
+    members = await run_io(get_members, input_path)
+    return StreamingResponse(
+        cache_stream(archiver.stream(members), output_zip, key, ZIP_MEDIA_TYPE, []),
+        media_type=ZIP_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": get_content_disposition(output_zip.name),
+            "ETag": f'"{key}"',
+        },
+    )
+
+
+def get_content_disposition(filename: str) -> str:
+    """Get the header to download a file, encoding its name if needed."""
+    quoted = quote(filename)
+    if quoted == filename:
+        return f'attachment; filename="{filename}"'
+    return f"attachment; filename*=utf-8''{quoted}"
+
+
+@traced("vector_file")
+async def vector_file(
+    request: Request,
+    tmp: Path,
+    params: VectorFile,
+    command: str,
+) -> Response:
+    """Endpoint to convert a vector file to another format."""
+    set_output_labels(params.output_format, params.output)
+    set_attributes(
+        {
+            "gdal.command": command,
+            "gdal.driver": params.output_format
+            or Path(params.output).suffix.removeprefix("."),
+        },
+    )
+    resource = await get_input_resource(params)
+    key = get_result_key(resource, command, params)
+    entry = result_cache.get(key)
+    response = await cached_response(request, tmp, entry) if entry else None
+    if response:
+        set_attributes({"cache.hit": "result"})
+        return response
+    output_path = prepare_output(tmp, params)
+    await prepare_input(tmp, resource, params, command)
+    app_name = getattr(request.state, "app_name", None)
+    size = await run_io(get_input_size, params.input)
+    semaphores = await acquire_slots(app_name, command, params.input, size=size)
+    try:
+        response = (
+            None
+            if is_partitioned(params, command, size)
+            else await vector_stream(key, output_path, params, command, semaphores)
+        )
+        if response:
+            semaphores = []
+            set_attributes({"output.streamed": True})
+            return response
+        result_path = await write_vector_file(
+            output_path,
+            params,
+            command,
+            archive=not STREAMING,
+        )
+    finally:
+        scheduler.release(semaphores)
+    if await run_io(result_path.is_dir):
+        set_attributes({"output.streamed": True})
+        return await stream_archive(key, result_path, get_zip_path(output_path))
+    output_path = result_path
+    media_type = await get_media_type(output_path)
+    entry = result_cache.put(key, output_path, media_type)
+    return FileResponse(
+        output_path,
+        media_type=media_type,
+        filename=output_path.name,
+        headers={"ETag": f'"{entry.key}"'},
+    )
+
+
+def get_tile(z: int, x: int, y: int) -> Tile:
+    """Get the tile of a request path, checking it is in the grid."""
+    tile = (z, x, y)
+    if not is_valid_tile(tile):
         raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="The tile is outside of the Web Mercator grid.",
+        )
+    return tile
+
+
+def tile_response(request: Request, content: bytes, etag: str) -> Response:
+    """Serve a tile, 204 No Content if it is empty, or 304 Not Modified."""
+    if is_not_modified(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag},
+        )
+    if not content:
+        tile_cache.stats.empty += 1
+        return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"ETag": etag})
+    return Response(
+        content,
+        media_type=TILE_MEDIA_TYPE,
+        headers={"Content-Encoding": "gzip", "ETag": etag},
+    )
+
+
+@traced("vector_tile")
+async def vector_tile(
+    request: Request,
+    tmp: Path,
+    params: Tiles,
+    tile: Tile,
+) -> Response:
+    """Endpoint to get a Mapbox Vector Tile of a vector dataset.
+
+    Tiles are read before they are served, so an eviction in between cannot turn a
+    cached tile into an empty one.
+    """
+    set_attributes({"gdal.command": "tiles", "tile.zoom": tile[0]})
+    resource = await get_input_resource(params)
+    key = get_result_key(resource, "tiles", params)
+    pyramid_params = params.model_copy()
+    path = tile_cache.get(key, tile)
+    content = await run_io(read_tile, path) if path else None
+    if content is None and path and tile_cache.is_empty(key, tile):
+        content = b""
+    if content is None:
+        await prepare_input(tmp, resource, params, "tiles")
+        app_name = getattr(request.state, "app_name", None)
+        async with command_slots(app_name, "tiles", params.input):
+            tile_file = await write_vector_tile(tmp, params, tile)
+        content = await run_io(tile_file.read_bytes) if tile_file else b""
+        await tile_cache.put(key, resource.uuid, tile, tile_file)
+    else:
+        set_attributes({"cache.hit": "tiles"})
+    if tile_cache.record(key):
+        pyramid_in_background(resource, pyramid_params, key)
+    z, x, y = tile
+    return tile_response(request, content, f'"{key}-{z}-{x}-{y}"')
+
+
+def get_query_key(resource: Resource, params: FeatureQuery) -> str:
+    """Get a hash identifying the layer and filters of a feature query."""
+    query = FeatureQuery.model_validate(
+        params.model_dump(include=params.model_fields_set - PAGE_FIELDS | {"input"}),
+    )
+    return get_result_key(resource, "features", query)
+
+
+def get_page_url(request: Request, cursor: str) -> str:
+    """Get the URL of the next page of a feature query."""
+    return str(request.url.include_query_params(cursor=cursor))
+
+
+@traced("vector_features")
+async def vector_features(
+    request: Request,
+    tmp: Path,
+    params: FeatureQuery,
+) -> Response:
+    """Endpoint to read a page of the features of a vector dataset."""
+    if not feature_readers.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Reading features needs the GDAL Python bindings.",
+        )
+    set_attributes({"gdal.command": "features"})
+    resource = await get_input_resource(params)
+    key = get_query_key(resource, params)
+    try:
+        page = await feature_readers.continue_page(key, params)
+        if page:
+            set_attributes({"cache.hit": "reader"})
+        else:
+            await prepare_input(tmp, resource, params, "features")
+            params.input, folder = await run_io(
+                feature_readers.adopt,
+                tmp,
+                params.input,
+            )
+            page = await feature_readers.open_page(key, params, folder)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
             detail=str(e),
         ) from e
-    media_type = get_media_type(output_path)
-    return FileResponse(output_path, media_type=media_type, filename=output_path.name)
+    content, cursor = page
+    headers = {}
+    if cursor:
+        headers = {
+            "Link": f'<{get_page_url(request, cursor)}>; rel="next"',
+            "Next-Cursor": cursor,
+        }
+    media_type = (
+        ARROW_MEDIA_TYPE if params.output_format == "Arrow" else GEOJSON_MEDIA_TYPE
+    )
+    return Response(content, media_type=media_type, headers=headers)
+
+
+async def vector_job(
+    job: Job,
+    tmp: Path,
+    params: VectorFile | Info,
+    command: str,
+    app_name: str | None,
+) -> tuple[Path, str]:
+    """Run a command for a background job, returning its output and media type."""
+    if not isinstance(params, Info):
+        set_output_labels(params.output_format, params.output)
+    resource = await get_input_resource(params)
+    key = get_result_key(resource, command, params)
+    entry = result_cache.get(key)
+    output_path = await result_cache.checkout(entry, tmp) if entry else None
+    if entry and output_path:
+        return output_path, entry.media_type
+    if isinstance(params, Info):
+        await prepare_input(tmp, resource, params, command)
+        async with command_slots(app_name, command, params.input, bounded=False):
+            output_path = await write_vector_json(tmp, params, command)
+        media_type = "application/json"
+    else:
+        output_path = prepare_output(tmp, params)
+        await prepare_input(tmp, resource, params, command)
+        async with command_slots(app_name, command, params.input, bounded=False):
+            output_path = await write_vector_file(
+                output_path,
+                params,
+                command,
+                job.set_progress,
+            )
+        media_type = await get_media_type(output_path)
+    result_cache.put(key, output_path, media_type)
+    return output_path, media_type
+
+
+def get_operations(batch: Batch) -> list[tuple[str, VectorFile]]:
+    """Get the commands and parameters of a batch, checking its size."""
+    if len(batch.operations) > BATCH_MAX_OPERATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"A batch is limited to {BATCH_MAX_OPERATIONS} operations.",
+        )
+    return [
+        (operation.command, get_operation_params(operation))
+        for operation in batch.operations
+    ]
+
+
+def get_operation_params(operation: Operation) -> VectorFile:
+    """Get the parameters of a batch operation as those of its command."""
+    model = BATCH_MODELS[operation.command]
+    fields = operation.model_dump(exclude={"command"}, exclude_unset=True)
+    return model.model_validate(fields)
+
+
+async def batch_operation(
+    work_dir: Path,
+    resource: Resource,
+    input_path: str,
+    operation: tuple[str, VectorFile],
+    app_name: str | None,
+) -> Path:
+    """Run an operation of a batch on a downloaded input, through the result cache."""
+    command, params = operation
+    key = get_result_key(resource, command, params)
+    entry = result_cache.get(key)
+    output_path = await result_cache.checkout(entry, work_dir) if entry else None
+    if output_path:
+        return output_path
+    output_path = prepare_output(work_dir, params)
+    params.input = input_path
+    async with command_slots(app_name, command, input_path, bounded=False):
+        output_path = await write_vector_file(output_path, params, command)
+    result_cache.put(key, output_path, await get_media_type(output_path))
+    return output_path
+
+
+async def vector_batch(
+    request: Request,
+    tmp: Path,
+    operations: list[tuple[str, VectorFile]],
+) -> StreamingResponse:
+    """Endpoint to run several commands and return their outputs in a SOZip.
+
+    Each input is downloaded once, and at most BATCH_CONCURRENCY operations run at
+    the same time.
+    """
+    app_name = getattr(request.state, "app_name", None)
+    params_by_input = {params.input: params for _, params in operations}
+    resources = dict(
+        zip(
+            params_by_input,
+            await gather(*map(get_input_resource, params_by_input.values())),
+            strict=True,
+        ),
+    )
+    input_paths = {}
+    for i, (resource_id, resource) in enumerate(resources.items()):
+        await reserve_workspace(tmp, resource)
+        input_dir = tmp / "inputs" / str(i)
+        input_dir.mkdir(parents=True)
+        try:
+            input_paths[resource_id] = await download_resource(input_dir, resource)
+        except HTTPError as e:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=str(e),
+            ) from e
+    semaphore = Semaphore(BATCH_CONCURRENCY)
+
+    async def run(i: int, operation: tuple[str, VectorFile]) -> Path:
+        resource_id = operation[1].input
+        work_dir = tmp / "operations" / str(i)
+        work_dir.mkdir(parents=True)
+        async with semaphore:
+            return await batch_operation(
+                work_dir,
+                resources[resource_id],
+                input_paths[resource_id],
+                operation,
+                app_name,
+            )
+
+    try:
+        async with TaskGroup() as tg:
+            tasks = [tg.create_task(run(i, op)) for i, op in enumerate(operations)]
+    except* HTTPException as eg:
+        raise eg.exceptions[0] from None
+    members = []
+    for i, task in enumerate(tasks):
+        output_path = task.result()
+        name = output_path.name
+        if name in {member_name for _, member_name in members}:
+            name = f"{i + 1}-{name}"
+        members.append((output_path, name))
+    return StreamingResponse(
+        archiver.stream(members),
+        media_type=ZIP_MEDIA_TYPE,
+        headers={"Content-Disposition": get_content_disposition("batch.zip")},
+    )
@@ -0,0 +1,195 @@
+import logging
+from asyncio import CancelledError, Future, get_running_loop
+from collections import OrderedDict, deque
+from time import monotonic
+
+from pydantic import BaseModel
+
+from .config import (
+    LARGE_INPUT_BYTES,
+    LARGE_INPUT_LIMIT,
+    SCHEDULER_DEFAULT_LIMIT,
+    SCHEDULER_LIMITS,
+    SCHEDULER_MAX_QUEUE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class SchedulerStats(BaseModel):
+    acquired: int = 0
+    queued: int = 0
+    rejected: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class FairSemaphore:
+    """Semaphore handing free slots to waiting applications in turn.
+
+    Each application has its own first in, first out queue, so a burst of requests
+    from one application cannot starve the others.
+    """
+
+    def __init__(self, capacity: int) -> None:
+        """Initialize the semaphore."""
+        self.capacity = capacity
+        self.active = 0
+        self._waiters: OrderedDict[str, deque[Future[None]]] = OrderedDict()
+
+    @property
+    def depth(self) -> int:
+        """Number of waiting requests."""
+        return sum(len(queue) for queue in self._waiters.values())
+
+    @property
+    def full(self) -> bool:
+        """Check if a new request would have to wait."""
+        return self.active >= self.capacity or bool(self._waiters)
+
+    async def acquire(self, app_name: str) -> bool:
+        """Take a slot, returning whether the request had to wait for it."""
+        if not self.full:
+            self.active += 1
+            return False
+        future = get_running_loop().create_future()
+        self._waiters.setdefault(app_name, deque()).append(future)
+        try:
+            await future
+        except CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                queue = self._waiters.get(app_name)
+                if queue and future in queue:
+                    queue.remove(future)
+                    if not queue:
+                        del self._waiters[app_name]
+            raise
+        return True
+
+    def release(self) -> None:
+        """Free a slot and wake up the next application in turn."""
+        self.active -= 1
+        while self.active < self.capacity and self._waiters:
+            app_name, queue = next(iter(self._waiters.items()))
+            future = queue.popleft()
+            if queue:
+                self._waiters.move_to_end(app_name)
+            else:
+                del self._waiters[app_name]
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+    def get_stats(self) -> dict:
+        """Get the occupancy of the semaphore."""
+        return {"active": self.active, "capacity": self.capacity, "depth": self.depth}
+
+
+class Scheduler:
+    """Concurrency limits in front of GDAL commands.
+
+    Each command has its own slots, and inputs over LARGE_INPUT_BYTES also need one
+    of the slots shared by all large inputs. Requests wait in a bounded queue and
+    are rejected once it is full.
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, int],
+        default_limit: int,
+        large_bytes: int,
+        large_limit: int,
+        max_queue: int,
+    ) -> None:
+        """Initialize the scheduler."""
+        self.limits = limits
+        self.default_limit = default_limit
+        self.large_bytes = large_bytes
+        self.max_queue = max_queue
+        self.large = FairSemaphore(large_limit)
+        self.stats = SchedulerStats()
+        self._commands: dict[str, FairSemaphore] = {}
+
+    @property
+    def depth(self) -> int:
+        """Number of waiting requests."""
+        return self.large.depth + sum(pool.depth for pool in self._commands.values())
+
+    def get_semaphores(self, command: str, size: int) -> list[FairSemaphore]:
+        """Get the semaphores a command needs, in acquisition order."""
+        if command not in self._commands:
+            limit = self.limits.get(command, self.default_limit)
+            self._commands[command] = FairSemaphore(limit)
+        semaphores = [self._commands[command]]
+        if size >= self.large_bytes:
+            semaphores.append(self.large)
+        return semaphores
+
+    async def acquire(
+        self,
+        command: str,
+        app_name: str | None,
+        size: int,
+        *,
+        bounded: bool = True,
+    ) -> list[FairSemaphore]:
+        """Wait for the slots of a command, raising QueueFullError if it cannot.
+
+        Background jobs are not bounded by the queue size, as they hold no connection
+        while they wait.
+        """
+        semaphores = self.get_semaphores(command, size)
+        if bounded and self.depth >= self.max_queue and any(s.full for s in semaphores):
+            self.stats.rejected += 1
+            logger.warning("Scheduler queue is full, rejecting %s", command)
+            error = "Too many requests are waiting, please retry later."
+            raise QueueFullError(error)
+        start = monotonic()
+        acquired = []
+        queued = False
+        try:
+            for semaphore in semaphores:
+                queued = await semaphore.acquire(app_name or "") or queued
+                acquired.append(semaphore)
+        except BaseException:
+            self.release(acquired)
+            raise
+        wait = monotonic() - start
+        self.stats.acquired += 1
+        self.stats.queued += queued
+        self.stats.wait_seconds_total += wait
+        self.stats.wait_seconds_max = max(self.stats.wait_seconds_max, wait)
+        return acquired
+
+    def release(self, semaphores: list[FairSemaphore]) -> None:
+        """Free the slots of a command."""
+        for semaphore in reversed(semaphores):
+            semaphore.release()
+
+    def get_stats(self) -> dict:
+        """Get the scheduler counters and queue depths for monitoring."""
+        return {
+            **self.stats.model_dump(),
+            "depth": self.depth,
+            "max_queue": self.max_queue,
+            "large": self.large.get_stats(),
+            "commands": {
+                command: semaphore.get_stats()
+                for command, semaphore in self._commands.items()
+            },
+        }
+
+
+scheduler = Scheduler(
+    SCHEDULER_LIMITS,
+    SCHEDULER_DEFAULT_LIMIT,
+    LARGE_INPUT_BYTES,
+    LARGE_INPUT_LIMIT,
+    SCHEDULER_MAX_QUEUE,
+)
@@ -0,0 +1,479 @@
+import logging
+import zlib
+from asyncio import Future, Task, create_task, get_running_loop
+from collections import deque
+from collections.abc import AsyncGenerator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from struct import pack
+from tempfile import SpooledTemporaryFile
+from time import localtime, perf_counter
+from typing import BinaryIO
+from zipfile import ZIP_DEFLATED, ZIP_STORED
+
+from pydantic import BaseModel
+
+from .config import SOZIP_CHUNK_SIZE, SOZIP_MIN_SIZE, SOZIP_THREADS
+from .metrics import get_labels, registry
+from .threads import run_io
+from .tracing import set_attributes
+
+logger = logging.getLogger(__name__)
+
+BLOCK_SIZE = 1024**2
+COMPRESSED_SUFFIXES = {
+    ".7z",
+    ".gz",
+    ".jpeg",
+    ".jpg",
+    ".kmz",
+    ".parquet",
+    ".png",
+    ".webp",
+    ".zip",
+    ".zst",
+}
+MAX_UINT16 = 0xFFFF
+MAX_UINT32 = 0xFFFFFFFF
+MIN_RATIO = 0.95  # Members compressing less than this in a sample are stored
+SPOOL_MEMORY_BYTES = 8 * 1024**2
+UTF8_FLAG = 0x800
+ZIP64_VERSION = 45
+ZIP_VERSION = 20
+
+cpu_pool = ThreadPoolExecutor(max_workers=SOZIP_THREADS, thread_name_prefix="sozip")
+
+sozip_input_bytes = registry.counter(
+    "hdx_geo_sozip_input_bytes_total",
+    "Bytes of the files packaged in zip archives.",
+)
+sozip_output_bytes = registry.counter(
+    "hdx_geo_sozip_output_bytes_total",
+    "Bytes of the zip archives produced.",
+)
+
+
+class ZipEntry(BaseModel):
+    name: str
+    method: int
+    crc: int
+    compressed_size: int
+    size: int
+    offset: int
+    dos_time: int
+    dos_date: int
+
+
+class SOZipStats(BaseModel):
+    archives: int = 0
+    members: int = 0
+    stored: int = 0
+    indexed: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    compress_seconds: float = 0.0
+    seconds: float = 0.0
+
+
+class PreparedMember:
+    """File ready to be written in an archive, compressed unless stored."""
+
+    def __init__(self, path: Path, size: int, mtime: float) -> None:
+        """Initialize the member as stored."""
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.method = ZIP_STORED
+        self.crc = 0
+        self.compressed_size = size
+        self.offsets: list[int] | None = None
+        self.spool: SpooledTemporaryFile | None = None
+        self.seconds = 0.0
+
+    def close(self) -> None:
+        """Release the compressed data."""
+        if self.spool:
+            self.spool.close()
+
+
+class Archiver:
+    """Builder of Seek-Optimized ZIP (SOZip) archives.
+
+    Members are deflated in chunks of SOZIP_CHUNK_SIZE, compressed in parallel on
+    SOZIP_THREADS threads as each chunk is independent, and files of at least
+    SOZIP_MIN_SIZE get the index letting GDAL seek in them through /vsizip/.
+    Already compressed members are stored. The archive is produced as a stream,
+    compressing the next member while the current one is sent.
+    """
+
+    def __init__(self, chunk_size: int, min_size: int) -> None:
+        """Initialize the archiver."""
+        self.chunk_size = chunk_size
+        self.min_size = min_size
+        self.task_size = max(BLOCK_SIZE // chunk_size, 1) * chunk_size
+        self.stats = SOZipStats()
+
+    async def stream(self, members: list[tuple[Path, str]]) -> AsyncGenerator[bytes]:
+        """Stream an archive of files, each with its name in the archive."""
+        start = perf_counter()
+        entries: list[ZipEntry] = []
+        offset = 0
+        size = 0
+        compress_seconds = 0.0
+        pending: Task[PreparedMember] | None = None
+        if members:
+            pending = create_task(self._prepare(members[0][0]))
+        try:
+            for i, (_, name) in enumerate(members):
+                prepared = await pending
+                pending = (
+                    create_task(self._prepare(members[i + 1][0]))
+                    if i + 1 < len(members)
+                    else None
+                )
+                size += prepared.size
+                compress_seconds += prepared.seconds
+                try:
+                    async for data, entry in self._emit(prepared, name, offset):
+                        if entry:
+                            entries.append(entry)
+                        offset += len(data)
+                        yield data
+                finally:
+                    prepared.close()
+            data = get_central_directory(entries, offset)
+            offset += len(data)
+            yield data
+        finally:
+            if pending:
+                pending.cancel()
+                pending.add_done_callback(close_prepared)
+        self._record(len(members), size, offset, compress_seconds)
+        self.stats.seconds += perf_counter() - start
+
+    async def write(self, members: list[tuple[Path, str]], output_zip: Path) -> None:
+        """Write an archive of files to disk."""
+        with output_zip.open("wb") as f:
+            async for data in self.stream(members):
+                await run_io(f.write, data)
+
+    def get_stats(self) -> dict:
+        """Get the packaging counters for monitoring."""
+        stats = self.stats.model_dump()
+        stats["ratio"] = (
+            stats["bytes_out"] / stats["bytes_in"] if stats["bytes_in"] else 0.0
+        )
+        stats["compress_bytes_per_second"] = (
+            stats["bytes_in"] / stats["compress_seconds"]
+            if stats["compress_seconds"]
+            else 0.0
+        )
+        return stats
+
+    async def _prepare(self, path: Path) -> PreparedMember:
+        start = perf_counter()
+        stat = await run_io(path.stat)
+        member = PreparedMember(path, stat.st_size, stat.st_mtime)
+        try:
+            await self._compress(member)
+        except BaseException:
+            member.close()
+            raise
+        member.seconds = perf_counter() - start
+        return member
+
+    async def _compress(self, member: PreparedMember) -> None:
+        path = member.path
+        if await run_io(is_compressed, path):
+            member.crc = await run_io(get_crc, path)
+            self.stats.stored += 1
+            return
+        member.method = ZIP_DEFLATED
+        member.spool = SpooledTemporaryFile(SPOOL_MEMORY_BYTES, dir=path.parent)  # noqa: SIM115
+        indexed = member.size >= self.min_size
+        chunk_size = self.chunk_size if indexed else max(member.size, 1)
+        task_size = self.task_size if indexed else chunk_size
+        offsets: list[int] = []
+        loop = get_running_loop()
+        window: deque[Future[list[bytes]]] = deque()
+        with path.open("rb") as f:
+            for start in range(0, max(member.size, 1), task_size):
+                data, member.crc = await run_io(read_block, f, task_size, member.crc)
+                final = start + task_size >= member.size
+                window.append(
+                    loop.run_in_executor(
+                        cpu_pool,
+                        compress_chunks,
+                        data,
+                        chunk_size,
+                        final,
+                    ),
+                )
+                if len(window) > SOZIP_THREADS * 2:
+                    await self._spool(member, await window.popleft(), offsets)
+            while window:
+                await self._spool(member, await window.popleft(), offsets)
+        member.offsets = offsets if indexed else None
+
+    async def _spool(
+        self,
+        member: PreparedMember,
+        chunks: list[bytes],
+        offsets: list[int],
+    ) -> None:
+        for chunk in chunks:
+            if member.spool.tell():
+                offsets.append(member.spool.tell())
+            await run_io(member.spool.write, chunk)
+        member.compressed_size = member.spool.tell()
+
+    async def _emit(
+        self,
+        member: PreparedMember,
+        name: str,
+        offset: int,
+    ) -> AsyncGenerator[tuple[bytes, ZipEntry | None]]:
+        dos_time, dos_date = get_dos_datetime(member.mtime)
+        entry = ZipEntry(
+            name=name,
+            method=member.method,
+            crc=member.crc,
+            compressed_size=member.compressed_size,
+            size=member.size,
+            offset=offset,
+            dos_time=dos_time,
+            dos_date=dos_date,
+        )
+        yield get_local_header(entry), entry
+        if member.spool:
+            member.spool.seek(0)
+            source = member.spool
+        else:
+            source = await run_io(member.path.open, "rb")
+        try:
+            while data := await run_io(source.read, BLOCK_SIZE):
+                yield data, None
+        finally:
+            if source is not member.spool:
+                source.close()
+        if member.offsets is None:
+            return
+        index = get_sozip_index(member, self.chunk_size)
+        parent, _, basename = name.rpartition("/")
+        index_entry = ZipEntry(
+            name=f"{parent}/.{basename}.sozip.idx" if parent else f".{name}.sozip.idx",
+            method=ZIP_STORED,
+            crc=zlib.crc32(index),
+            compressed_size=len(index),
+            size=len(index),
+            offset=offset + len(get_local_header(entry)) + member.compressed_size,
+            dos_time=dos_time,
+            dos_date=dos_date,
+        )
+        yield get_local_header(index_entry) + index, index_entry
+        self.stats.indexed += 1
+
+    def _record(
+        self,
+        members: int,
+        size: int,
+        archive_size: int,
+        compress_seconds: float,
+    ) -> None:
+        self.stats.archives += 1
+        self.stats.members += members
+        self.stats.bytes_in += size
+        self.stats.bytes_out += archive_size
+        self.stats.compress_seconds += compress_seconds
+        sozip_input_bytes.inc(size, **get_labels())
+        sozip_output_bytes.inc(archive_size, **get_labels())
+        ratio = archive_size / size if size else 0.0
+        set_attributes(
+            {
+                "zip.members": members,
+                "zip.input_bytes": size,
+                "zip.output_bytes": archive_size,
+                "zip.ratio": round(ratio, 4),
+                "zip.compress_seconds": round(compress_seconds, 3),
+            },
+        )
+        logger.info(
+            "Zipped %s files of %s bytes to %s bytes (%.1f%%), compressed in %.1fs",
+            members,
+            size,
+            archive_size,
+            ratio * 100,
+            compress_seconds,
+        )
+
+
+def close_prepared(task: Task[PreparedMember]) -> None:
+    """Release a member prepared for an archive which was abandoned."""
+    if not task.cancelled() and not task.exception():
+        task.result().close()
+
+
+def compress_chunks(data: bytes, chunk_size: int, final: bool) -> list[bytes]:  # noqa: FBT001
+    """Deflate data in chunks which can each be inflated on their own.
+
+    Each chunk ends with a sync and a full flush, which align it on a byte and reset
+    the dictionary, so chunks compressed separately form one valid Deflate stream.
+    The last chunk of a file ends the stream instead.
+    """
+    chunks = []
+    starts = range(0, len(data), chunk_size) if data else [0]
+    for i, start in enumerate(starts):
+        compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+        chunk = compressor.compress(data[start : start + chunk_size])
+        if final and i == len(starts) - 1:
+            chunk += compressor.flush(zlib.Z_FINISH)
+        else:
+            chunk += compressor.flush(zlib.Z_SYNC_FLUSH)
+            chunk += compressor.flush(zlib.Z_FULL_FLUSH)
+        chunks.append(chunk)
+    return chunks
+
+
+def get_members(input_path: Path) -> list[tuple[Path, str]]:
+    """Get the files of a folder to zip, named without their folders."""
+    return [
+        (path, path.name) for path in sorted(input_path.rglob("*")) if path.is_file()
+    ]
+
+
+def is_compressed(path: Path) -> bool:
+    """Check if a file is already compressed, from its suffix or a sample."""
+    if path.suffix.lower() in COMPRESSED_SUFFIXES:
+        return True
+    with path.open("rb") as f:
+        sample = f.read(BLOCK_SIZE)
+    if len(sample) < BLOCK_SIZE:
+        return False
+    return len(zlib.compress(sample, 1)) > len(sample) * MIN_RATIO
+
+
+def read_block(f: BinaryIO, size: int, crc: int) -> tuple[bytes, int]:
+    """Read a block of a file, updating the CRC-32 of what was read."""
+    data = f.read(size)
+    return data, zlib.crc32(data, crc)
+
+
+def get_crc(path: Path) -> int:
+    """Get the CRC-32 of a file."""
+    crc = 0
+    with path.open("rb") as f:
+        while data := f.read(BLOCK_SIZE):
+            crc = zlib.crc32(data, crc)
+    return crc
+
+
+def get_dos_datetime(mtime: float) -> tuple[int, int]:
+    """Get the MS-DOS time and date of a modification time."""
+    t = localtime(mtime)
+    if t.tm_year < 1980:  # noqa: PLR2004
+        return 0, (1 << 5) | 1
+    dos_time = (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2)
+    dos_date = ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+    return dos_time, dos_date
+
+
+def get_sozip_index(member: PreparedMember, chunk_size: int) -> bytes:
+    """Get the SOZip index of a member, the offsets of its chunks after the first."""
+    header = pack("<IIIIQQ", 1, 0, chunk_size, 8, member.size, member.compressed_size)
+    return header + b"".join(pack("<Q", offset) for offset in member.offsets or [])
+
+
+def get_local_header(entry: ZipEntry) -> bytes:
+    """Get the local file header of a member."""
+    name = entry.name.encode()
+    zip64 = max(entry.size, entry.compressed_size) >= MAX_UINT32
+    extra = pack("<HHQQ", 1, 16, entry.size, entry.compressed_size) if zip64 else b""
+    return (
+        pack(
+            "<IHHHHHIIIHH",
+            0x04034B50,
+            ZIP64_VERSION if zip64 else ZIP_VERSION,
+            UTF8_FLAG if not entry.name.isascii() else 0,
+            entry.method,
+            entry.dos_time,
+            entry.dos_date,
+            entry.crc,
+            MAX_UINT32 if zip64 else entry.compressed_size,
+            MAX_UINT32 if zip64 else entry.size,
+            len(name),
+            len(extra),
+        )
+        + name
+        + extra
+    )
+
+
+def get_central_directory(entries: list[ZipEntry], offset: int) -> bytes:
+    """Get the central directory and end records of an archive."""
+    headers = []
+    for entry in entries:
+        name = entry.name.encode()
+        fields = [entry.size, entry.compressed_size, entry.offset]
+        zip64 = [value for value in fields if value >= MAX_UINT32]
+        extra = pack(f"<HH{len(zip64)}Q", 1, 8 * len(zip64), *zip64) if zip64 else b""
+        version = ZIP64_VERSION if zip64 else ZIP_VERSION
+        headers.append(
+            pack(
+                "<IHHHHHHIIIHHHHHII",
+                0x02014B50,
+                (3 << 8) | version,
+                version,
+                UTF8_FLAG if not entry.name.isascii() else 0,
+                entry.method,
+                entry.dos_time,
+                entry.dos_date,
+                entry.crc,
+                *(min(value, MAX_UINT32) for value in fields[1::-1]),
+                len(name),
+                len(extra),
+                0,
+                0,
+                0,
+                0o100644 << 16,
+                min(entry.offset, MAX_UINT32),
+            )
+            + name
+            + extra,
+        )
+    directory = b"".join(headers)
+    end = offset + len(directory)
+    records = [directory]
+    if len(entries) >= MAX_UINT16 or max(offset, len(directory)) >= MAX_UINT32:
+        records.append(
+            pack(
+                "<IQHHIIQQQQ",
+                0x06064B50,
+                44,
+                (3 << 8) | ZIP64_VERSION,
+                ZIP64_VERSION,
+                0,
+                0,
+                len(entries),
+                len(entries),
+                len(directory),
+                offset,
+            ),
+        )
+        records.append(pack("<IIQI", 0x07064B50, 0, end, 1))
+    records.append(
+        pack(
+            "<IHHHHIIH",
+            0x06054B50,
+            0,
+            0,
+            min(len(entries), MAX_UINT16),
+            min(len(entries), MAX_UINT16),
+            min(len(directory), MAX_UINT32),
+            min(offset, MAX_UINT32),
+            0,
+        ),
+    )
+    return b"".join(records)
+
+
+archiver = Archiver(SOZIP_CHUNK_SIZE, SOZIP_MIN_SIZE)
@@ -0,0 +1,94 @@
+import logging
+from asyncio import CancelledError, Task, create_task, get_running_loop, sleep
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from functools import partial
+from time import perf_counter
+
+from pydantic import BaseModel
+
+from .config import IO_THREADS, LOOP_LAG_INTERVAL
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+LAG_WARNING = 0.5
+
+io_pool = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="io")
+
+loop_lag_seconds = registry.histogram(
+    "hdx_geo_event_loop_lag_seconds",
+    "Delay of the event loop in running a scheduled callback.",
+    (),
+    LAG_BUCKETS,
+)
+
+
+async def run_io[**P, R](func: Callable[P, R], *args: P.args, **kwargs: P.kwargs) -> R:
+    """Run a blocking filesystem call in the bounded I/O thread pool."""
+    return await get_running_loop().run_in_executor(
+        io_pool,
+        partial(func, *args, **kwargs),
+    )
+
+
+class LoopStats(BaseModel):
+    samples: int = 0
+    lag_seconds: float = 0.0
+    max_lag_seconds: float = 0.0
+    slow: int = 0
+
+
+class LoopMonitor:
+    """Measure how late the event loop runs a callback scheduled every interval.
+
+    Blocking calls on the loop delay every request, including health checks and
+    token validations, so a sustained lag points at a call to move to the I/O pool.
+    """
+
+    def __init__(self, interval: float) -> None:
+        """Initialize the monitor without starting it."""
+        self.interval = interval
+        self.stats = LoopStats()
+        self._task: Task | None = None
+
+    def start(self) -> None:
+        """Start sampling the lag of the running loop."""
+        if self.interval > 0:
+            self._task = create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop sampling."""
+        if self._task:
+            self._task.cancel()
+            with suppress(CancelledError):
+                await self._task
+            self._task = None
+
+    def get_stats(self) -> dict:
+        """Get the lag of the loop and the load of the I/O pool for monitoring."""
+        stats = self.stats.model_dump()
+        stats["mean_lag_seconds"] = (
+            stats["lag_seconds"] / stats["samples"] if stats["samples"] else 0.0
+        )
+        stats["io_threads"] = io_pool._max_workers  # noqa: SLF001
+        stats["io_queue"] = io_pool._work_queue.qsize()  # noqa: SLF001
+        return stats
+
+    async def _run(self) -> None:
+        while True:
+            start = perf_counter()
+            await sleep(self.interval)
+            lag = max(perf_counter() - start - self.interval, 0.0)
+            loop_lag_seconds.observe(lag)
+            self.stats.samples += 1
+            self.stats.lag_seconds += lag
+            self.stats.max_lag_seconds = max(self.stats.max_lag_seconds, lag)
+            if lag >= LAG_WARNING:
+                self.stats.slow += 1
+                logger.warning("Event loop blocked for %.2fs", lag)
+
+
+loop_monitor = LoopMonitor(LOOP_LAG_INTERVAL)
@@ -0,0 +1,283 @@
+import logging
+from collections import Counter, OrderedDict
+from math import atan, degrees, pi, sinh
+from pathlib import Path
+from shutil import rmtree
+from time import time
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from .cache import ENTRY_FILE
+from .config import (
+    CACHE_DIR,
+    TILE_CACHE_MAX_BYTES,
+    TILE_PYRAMID_MAX_ZOOM,
+    TILE_PYRAMID_MIN_REQUESTS,
+    TILE_SIMPLIFICATION,
+)
+from .threads import run_io
+
+logger = logging.getLogger(__name__)
+
+MAX_TRACKED = 10000
+MAX_ZOOM = 22
+TILES_DIR = "tiles"
+TILE_BUFFER = 1 / 16  # Share of a tile read around it, for features crossing edges
+TILE_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+Tile = tuple[int, int, int]
+
+
+class TileEntry(BaseModel):
+    key: str
+    uuid: str
+    size: int
+    created: float
+    last_used: float
+    max_zoom: int = -1  # Zoom up to which every tile is cached
+
+
+class TileStats(BaseModel):
+    requests: int = 0
+    hits: int = 0
+    empty: int = 0
+    generated: int = 0
+    pyramids: int = 0
+    pyramid_failures: int = 0
+    pyramid_skips: int = 0
+    pyramid_seconds: float = 0.0
+    evictions: int = 0
+
+
+class TileCache:
+    """Mapbox Vector Tiles of resources, cached on disk per tileset.
+
+    A tileset is a resource version read with the same options. Tiles are generated
+    one at a time when they are requested, and once a tileset has been requested
+    TILE_PYRAMID_MIN_REQUESTS times, all its tiles up to TILE_PYRAMID_MAX_ZOOM are
+    built in the background. Empty tiles are stored as empty files.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, min_requests: int) -> None:
+        """Initialize the cache without reading the disk."""
+        self.root = root / "tiles"
+        self.max_bytes = max_bytes
+        self.min_requests = min_requests
+        self.stats = TileStats()
+        self._entries: OrderedDict[str, TileEntry] = OrderedDict()
+        self._requests: Counter[str] = Counter()
+
+    @property
+    def size(self) -> int:
+        """Total size of the tiles."""
+        return sum(entry.size for entry in self._entries.values())
+
+    def entry_dir(self, key: str) -> Path:
+        """Get the folder of a tileset."""
+        return self.root / key
+
+    def tile_path(self, key: str, tile: Tile) -> Path:
+        """Get the path of a tile of a tileset."""
+        z, x, y = tile
+        return self.entry_dir(key) / TILES_DIR / str(z) / str(x) / f"{y}.pbf"
+
+    def load(self) -> None:
+        """Index the tilesets already on disk and remove incomplete builds."""
+        rmtree(self.root / "tmp", ignore_errors=True)
+        entries = []
+        for entry_file in self.root.glob(f"*/{ENTRY_FILE}"):
+            try:
+                entry = TileEntry.model_validate_json(entry_file.read_text())
+            except ValueError:
+                rmtree(entry_file.parent, ignore_errors=True)
+                continue
+            entry.size = get_size(entry_file.parent / TILES_DIR)
+            entries.append(entry)
+        for entry in sorted(entries, key=lambda entry: entry.last_used):
+            self._entries[entry.key] = entry
+        for key in self._pop_evicted():
+            rmtree(self.entry_dir(key), ignore_errors=True)
+        logger.info("Tile cache: %s tilesets, %s bytes", len(entries), self.size)
+
+    def get(self, key: str, tile: Tile) -> Path | None:
+        """Get a cached tile, empty if it has no features, or None if it is missing."""
+        self.stats.requests += 1
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+        path = self.tile_path(key, tile)
+        if not path.exists() and tile[0] > entry.max_zoom:
+            return None
+        self.stats.hits += 1
+        entry.last_used = time()
+        self._entries.move_to_end(key)
+        return path
+
+    def is_empty(self, key: str, tile: Tile) -> bool:
+        """Check if a tile missing from the disk is empty rather than evicted.
+
+        Pyramids do not write the tiles without features.
+        """
+        entry = self._entries.get(key)
+        return entry is not None and tile[0] <= entry.max_zoom
+
+    def record(self, key: str) -> bool:
+        """Count a request for a tileset, returning if its pyramid is due."""
+        entry = self._entries.get(key)
+        if entry and entry.max_zoom >= 0:
+            return False
+        if len(self._requests) > MAX_TRACKED:
+            self._requests = Counter(dict(self._requests.most_common(MAX_TRACKED // 2)))
+        self._requests[key] += 1
+        return self._requests[key] >= self.min_requests
+
+    async def put(
+        self,
+        key: str,
+        uuid: str,
+        tile: Tile,
+        tile_file: Path | None,
+    ) -> Path:
+        """Store a generated tile, or an empty one if the file is None."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._create(key, uuid)
+            await run_io(write_entry, self.entry_dir(key), entry)
+        path = self.tile_path(key, tile)
+        entry.size += await run_io(store_tile, path, tile_file)
+        self.stats.generated += 1
+        await self._evict()
+        return path
+
+    def create_build_dir(self) -> Path:
+        """Create a folder for a pyramid being built."""
+        build_dir = self.root / "tmp" / uuid4().hex
+        build_dir.mkdir(parents=True)
+        return build_dir
+
+    async def put_pyramid(
+        self,
+        key: str,
+        uuid: str,
+        build_dir: Path,
+        seconds: float,
+    ) -> None:
+        """Store the tiles of a tileset built in a folder, replacing those cached."""
+        entry = TileEntry(
+            key=key,
+            uuid=uuid,
+            size=await run_io(get_size, build_dir / TILES_DIR),
+            created=time(),
+            last_used=time(),
+            max_zoom=TILE_PYRAMID_MAX_ZOOM,
+        )
+        await run_io(write_entry, build_dir, entry)
+        await run_io(replace_dir, build_dir, self.entry_dir(key))
+        self._entries.pop(key, None)
+        self._entries[key] = entry
+        self._requests.pop(key, None)
+        self.stats.pyramids += 1
+        self.stats.pyramid_seconds += seconds
+        await self._evict()
+
+    def get_stats(self) -> dict:
+        """Get the counters of the tile cache for monitoring."""
+        stats = self.stats.model_dump()
+        stats["hit_rate"] = (
+            stats["hits"] / stats["requests"] if stats["requests"] else 0.0
+        )
+        stats["tilesets"] = len(self._entries)
+        stats["bytes"] = self.size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def _create(self, key: str, uuid: str) -> TileEntry:
+        entry = TileEntry(
+            key=key,
+            uuid=uuid,
+            size=0,
+            created=time(),
+            last_used=time(),
+        )
+        self._entries[key] = entry
+        return entry
+
+    async def _evict(self) -> None:
+        for key in self._pop_evicted():
+            await run_io(rmtree, self.entry_dir(key), ignore_errors=True)
+
+    def _pop_evicted(self) -> list[str]:
+        keys = []
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            keys.append(self._entries.popitem(last=False)[0])
+            self.stats.evictions += 1
+        return keys
+
+
+def get_size(path: Path) -> int:
+    """Get the size of the files in a folder."""
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def write_entry(entry_dir: Path, entry: TileEntry) -> None:
+    """Write the entry file of a tileset in its folder."""
+    entry_dir.mkdir(parents=True, exist_ok=True)
+    (entry_dir / ENTRY_FILE).write_text(entry.model_dump_json())
+
+
+def store_tile(path: Path, tile_file: Path | None) -> int:
+    """Move a tile file into place, or create an empty one, returning the size added."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    old_size = path.stat().st_size if path.exists() else 0
+    if tile_file:
+        tile_file.replace(path)
+    else:
+        path.touch()
+    return path.stat().st_size - old_size
+
+
+def replace_dir(input_dir: Path, output_dir: Path) -> None:
+    """Replace a folder with another one."""
+    rmtree(output_dir, ignore_errors=True)
+    input_dir.rename(output_dir)
+
+
+def read_tile(path: Path) -> bytes | None:
+    """Read a tile, or return None if it is missing."""
+    try:
+        return path.read_bytes()
+    except FileNotFoundError:
+        return None
+
+
+def is_valid_tile(tile: Tile) -> bool:
+    """Check if a tile exists in the Web Mercator grid."""
+    z, x, y = tile
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def get_tile_bbox(tile: Tile) -> str:
+    """Get the longitude and latitude bounds of a tile, with a buffer around it."""
+    z, x, y = tile
+    n = 2**z
+    west = max(x - TILE_BUFFER, 0) / n * 360 - 180
+    east = min(x + 1 + TILE_BUFFER, n) / n * 360 - 180
+    north = degrees(atan(sinh(pi * (1 - 2 * max(y - TILE_BUFFER, 0) / n))))
+    south = degrees(atan(sinh(pi * (1 - 2 * min(y + 1 + TILE_BUFFER, n) / n))))
+    return f"{west!r},{south!r},{east!r},{north!r}"
+
+
+def get_tile_options(min_zoom: int, max_zoom: int) -> list[str]:
+    """Get the creation options of MVT, MBTiles and PMTiles tilesets.
+
+    The simplification is in tile units, so it removes more detail at lower zooms.
+    """
+    return [
+        f"MINZOOM={min_zoom}",
+        f"MAXZOOM={max_zoom}",
+        f"SIMPLIFICATION={TILE_SIMPLIFICATION}",
+    ]
+
+
+tile_cache = TileCache(CACHE_DIR, TILE_CACHE_MAX_BYTES, TILE_PYRAMID_MIN_REQUESTS)
@@ -0,0 +1,312 @@
+import logging
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from json import dumps
+from queue import Empty, Full, Queue
+from random import getrandbits, random
+from threading import Thread
+from time import monotonic, time_ns
+
+from httpx import Client, HTTPError
+from pydantic import BaseModel
+
+from .config import (
+    TRACING_EXPORTER,
+    TRACING_FILE,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SAMPLE_RATE,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 512
+FLUSH_INTERVAL = 5.0
+QUEUE_SIZE = 10000
+SERVICE_NAME = "hdx-geo-data-api"
+STATUS_ERROR = 2
+TRACE_ID_LENGTH = 32
+TRACEPARENT_PARTS = 4
+
+AttributeValue = str | int | float | bool
+Attributes = dict[str, AttributeValue | None]
+
+
+class Span:
+    """Span of a trace, in the OpenTelemetry data model.
+
+    Spans which are not sampled are still created to carry the trace context, but
+    ignore their attributes and are never exported.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        *,
+        sampled: bool,
+    ) -> None:
+        """Start the span."""
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes: dict[str, AttributeValue] = {}
+        self.error: str | None = None
+        self.start = time_ns()
+        self.end = 0
+
+    def is_recording(self) -> bool:
+        """Check if the span is sampled, to skip computing unused attributes."""
+        return self.sampled
+
+    def set_attribute(self, key: str, value: AttributeValue | None) -> None:
+        """Set an attribute of the span, unless its value is None."""
+        if self.sampled and value is not None:
+            self.attributes[key] = value
+
+    def set_error(self, error: BaseException) -> None:
+        """Mark the span as failed."""
+        self.error = f"{type(error).__name__}: {error}"
+
+    def to_otlp(self) -> dict:
+        """Convert the span to its OTLP JSON encoding."""
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start),
+            "endTimeUnixNano": str(self.end),
+            "attributes": get_otlp_attributes(self.attributes),
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        if self.error:
+            span["status"] = {"code": STATUS_ERROR, "message": self.error}
+        return span
+
+
+current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+class TracingStats(BaseModel):
+    traces: int = 0
+    sampled: int = 0
+    exported: int = 0
+    dropped: int = 0
+    failed: int = 0
+
+
+class Tracer:
+    """Tracer sampling traces and exporting their spans from a worker thread.
+
+    A trace is sampled when it starts, with a probability of TRACING_SAMPLE_RATE or
+    as decided by the caller in a W3C traceparent header, and its spans inherit the
+    decision. Sampled spans are written as OTLP JSON lines to TRACING_FILE, or sent
+    to the OTLP/HTTP collector at TRACING_OTLP_ENDPOINT.
+    """
+
+    def __init__(self, exporter: str, sample_rate: float) -> None:
+        """Initialize the tracer without starting its worker."""
+        self.exporter = exporter
+        self.sample_rate = sample_rate if exporter else 0.0
+        self.stats = TracingStats()
+        self._queue: Queue[Span | None] = Queue(QUEUE_SIZE)
+        self._thread: Thread | None = None
+
+    @contextmanager
+    def span(self, name: str, **attributes: AttributeValue | None) -> Iterator[Span]:
+        """Run a block in a span, child of the current span if any."""
+        parent = current_span.get()
+        span = (
+            Span(name, parent.trace_id, parent.span_id, sampled=parent.sampled)
+            if parent
+            else self._start_trace(name, None, None, sampled=None)
+        )
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        with self._activate(span):
+            yield span
+
+    @contextmanager
+    def trace(self, name: str, traceparent: str | None) -> Iterator[Span]:
+        """Run a block in the root span of a trace, continuing the caller's one."""
+        parts = (traceparent or "").split("-")
+        if len(parts) == TRACEPARENT_PARTS and len(parts[1]) == TRACE_ID_LENGTH:
+            span = self._start_trace(name, parts[1], parts[2], sampled=parts[3] == "01")
+        else:
+            span = self._start_trace(name, None, None, sampled=None)
+        with self._activate(span):
+            yield span
+
+    def start(self) -> None:
+        """Start the export worker if an exporter is configured."""
+        if not self.exporter:
+            return
+        self._thread = Thread(target=self._run, name="tracing", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Export the finished spans and stop the worker."""
+        if not self._thread:
+            return
+        try:
+            self._queue.put_nowait(None)
+        except Full:
+            return
+        self._thread.join(timeout=FLUSH_INTERVAL + 30)
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        """Get the tracing counters for monitoring."""
+        stats = self.stats.model_dump()
+        stats["exporter"] = self.exporter or None
+        stats["sample_rate"] = self.sample_rate
+        return stats
+
+    def _start_trace(
+        self,
+        name: str,
+        trace_id: str | None,
+        parent_id: str | None,
+        *,
+        sampled: bool | None,
+    ) -> Span:
+        if sampled is None:
+            sampled = self.sample_rate > 0 and random() < self.sample_rate  # noqa: S311
+        sampled = sampled and bool(self.exporter)
+        self.stats.traces += 1
+        self.stats.sampled += sampled
+        return Span(
+            name,
+            trace_id or f"{getrandbits(128):032x}",
+            parent_id,
+            sampled=sampled,
+        )
+
+    @contextmanager
+    def _activate(self, span: Span) -> Iterator[None]:
+        token = current_span.set(span)
+        try:
+            yield
+        except BaseException as e:
+            span.set_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self._end(span)
+
+    def _end(self, span: Span) -> None:
+        span.end = time_ns()
+        if not span.sampled:
+            return
+        try:
+            self._queue.put_nowait(span)
+        except Full:
+            self.stats.dropped += 1
+
+    def _run(self) -> None:
+        client = Client(timeout=10) if self.exporter == "otlp" else None
+        stopping = False
+        while not stopping or not self._queue.empty():
+            batch: list[Span] = []
+            deadline = monotonic() + (0 if stopping else FLUSH_INTERVAL)
+            while len(batch) < BATCH_SIZE:
+                try:
+                    span = self._queue.get(timeout=max(deadline - monotonic(), 0))
+                except Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    deadline = monotonic()
+                else:
+                    batch.append(span)
+            if batch:
+                self._export(client, batch)
+        if client:
+            client.close()
+
+    def _export(self, client: Client | None, spans: list[Span]) -> None:
+        payload = get_otlp_payload(spans)
+        try:
+            if client:
+                client.post(TRACING_OTLP_ENDPOINT, json=payload).raise_for_status()
+            else:
+                with TRACING_FILE.open("a") as f:
+                    f.write(dumps(payload) + "\n")
+        except (HTTPError, OSError) as e:
+            logger.warning("Failed to export %s spans: %s", len(spans), e)
+            self.stats.failed += len(spans)
+        else:
+            self.stats.exported += len(spans)
+
+
+def get_otlp_attributes(attributes: dict[str, AttributeValue]) -> list[dict]:
+    """Convert attributes to their OTLP JSON encoding."""
+    otlp_attributes = []
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            otlp_value = {"boolValue": value}
+        elif isinstance(value, int):
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+        otlp_attributes.append({"key": key, "value": otlp_value})
+    return otlp_attributes
+
+
+def get_otlp_payload(spans: list[Span]) -> dict:
+    """Wrap spans in an OTLP/JSON export request."""
+    resource = {"service.name": SERVICE_NAME}
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": get_otlp_attributes(resource)},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "app"},
+                        "spans": [span.to_otlp() for span in spans],
+                    },
+                ],
+            },
+        ],
+    }
+
+
+tracer = Tracer(TRACING_EXPORTER, TRACING_SAMPLE_RATE)
+
+
+def traced[**P, R](
+    name: str,
+) -> Callable[[Callable[P, Awaitable[R]]], Callable[P, Awaitable[R]]]:
+    """Decorate an async function to run it in a span."""
+
+    def decorator(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+        @wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            with tracer.span(name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def is_recording() -> bool:
+    """Check if the current span is sampled."""
+    span = current_span.get()
+    return bool(span and span.is_recording())
+
+
+def set_attributes(attributes: Attributes) -> None:
+    """Set attributes of the current span."""
+    span = current_span.get()
+    if span:
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
@@ -1,37 +1,101 @@
 import logging
-from asyncio import create_subprocess_exec
+from asyncio import StreamReader, create_subprocess_exec, create_task, gather
 from asyncio.subprocess import PIPE
-from collections.abc import AsyncGenerator
-from pathlib import Path
+from collections.abc import AsyncGenerator, Callable
+from functools import partial
+from hashlib import sha256
+from json import dumps
+from pathlib import Path, PurePosixPath
 from re import IGNORECASE, findall, search
-from tempfile import TemporaryDirectory
-from zipfile import ZipFile, is_zipfile
+from time import monotonic, perf_counter
+from zipfile import ZIP_STORED, ZipFile, is_zipfile
 
-from httpx import AsyncClient
+from httpx import AsyncClient, Headers, codes
 from pydantic import BaseModel
 from ua_generator import generate as ua_generate
 
-from .config import HDX_URL, TIMEOUT
+from .cache import Download, Resource, ResourceEntry, resource_cache
+from .clients import http_clients
+from .config import (
+    HDX_URL,
+    REMOTE_INPUT,
+    REMOTE_MIN_BYTES,
+    REMOTE_SUFFIXES,
+    STREAM_CHUNK_SIZE,
+    VSICURL_CONFIG,
+    VSIZIP_INPUT,
+)
+from .download import downloader
+from .engine import SEGMENTATION_FAULT, engine
+from .metrics import get_labels, stage_seconds, subprocess_exits, timed
+from .sozip import archiver, get_members
+from .threads import run_io
+from .tracing import set_attributes, traced
 
 logger = logging.getLogger(__name__)
 
+Progress = Callable[[float], None]
 
+ZIP_DATASET_SUFFIXES = {
+    ".csv",
+    ".fgb",
+    ".geojson",
+    ".geojsonl",
+    ".geojsons",
+    ".gml",
+    ".gpkg",
+    ".gpx",
+    ".json",
+    ".kml",
+    ".mif",
+    ".parquet",
+    ".shp",
+    ".sqlite",
+    ".tab",
+}
+ZIP_EXTRACT_SUFFIXES = {".accdb", ".mdb"}
+ZIP_RANDOM_ACCESS_SUFFIXES = {".fgb", ".gpkg", ".parquet", ".sqlite"}
+ZIP_SECONDARY_SUFFIXES = {".csv", ".json"}
+
+
+class ZipStats(BaseModel):
+    in_place: int = 0
+    bytes_not_extracted: int = 0
+    extracted: int = 0
+    bytes_extracted: int = 0
+    extract_seconds: float = 0.0
+
+    def get_stats(self) -> dict:
+        """Get the counters, estimating the extraction time saved from its rate."""
+        stats = self.model_dump()
+        rate = (
+            self.bytes_extracted / self.extract_seconds if self.extract_seconds else 0
+        )
+        stats["seconds_saved"] = self.bytes_not_extracted / rate if rate else 0.0
+        return stats
+
+
+zip_stats = ZipStats()
+
+
+@traced("create_sozip")
 async def create_sozip(input_path: Path, output_path: Path) -> Path:
-    """Zip a folder."""
-    output_zip = output_path.with_suffix(output_path.suffix + ".zip")
-    sozip = await create_subprocess_exec(
-        *["gdal", "vsi", "sozip", "create"],
-        *[input_path, output_zip],
-        *["--no-paths", "--quiet", "--recursive"],
-    )
-    await sozip.wait()
+    """Zip the files of a folder."""
+    output_zip = get_zip_path(output_path)
+    members = await run_io(get_members, input_path)
+    with timed("sozip"):
+        await archiver.write(members, output_zip)
     return output_zip
 
 
-async def get_filename(client: AsyncClient, download_url: str) -> str:
-    """Get the filename from the response headers."""
-    r = await client.head(download_url)
-    content_disposition = r.headers.get("Content-Disposition")
+def get_zip_path(output_path: Path) -> Path:
+    """Get the path of the zip of an output."""
+    return output_path.with_suffix(output_path.suffix + ".zip")
+
+
+def parse_filename(headers: Headers, download_url: str) -> str:
+    """Parse the filename from response headers, falling back on the URL."""
+    content_disposition = headers.get("Content-Disposition")
     if content_disposition:
         filename_match = search(r'filename="?([^"]+)"?', content_disposition)
         if filename_match:
@@ -39,35 +103,177 @@ async def get_filename(client: AsyncClient, download_url: str) -> str:
     return download_url.split("/")[-1]
 
 
-async def download_resource(tmp_dir: Path, resource_id: str) -> str:
-    """Get the download URL for a resource."""
-    async with AsyncClient(
-        http2=True,
-        timeout=TIMEOUT,
-        follow_redirects=True,
-    ) as client:
-        input_path = tmp_dir / "input"
-        input_path.mkdir()
-        uuid = get_last_uuid_v4(resource_id)
-        r1 = await client.get(f"{HDX_URL}/api/3/action/resource_show?id={uuid}")
-        r1.raise_for_status()
-        download_url = r1.json()["result"]["download_url"]
-        filename = await get_filename(client, download_url)
-        input_file = input_path / filename
-        with input_file.open("wb") as f:
-            headers = ua_generate().headers.get()
-            async with client.stream("GET", download_url, headers=headers) as r2:
-                r2.raise_for_status()
-                async for chunk in r2.aiter_bytes():
-                    f.write(chunk)
-        if is_zipfile(input_file):
-            unzip_dir = tmp_dir / "unzip"
-            unzip_dir.mkdir()
-            if input_file.suffix == ".zip":
-                unzip_dir = unzip_dir / input_file.with_suffix("")
-            unzip_flat(input_file, unzip_dir)
-            return str(unzip_dir)
-        return str(input_file)
+@traced("download_resource")
+async def download_resource(
+    tmp_dir: Path,
+    resource: Resource,
+    *,
+    partial_read: bool = False,
+) -> str:
+    """Download a resource, through the shared resource cache.
+
+    When the command only reads part of the input and the resource is not cached,
+    a /vsicurl/ path is returned instead so GDAL only fetches the byte ranges it
+    needs.
+    """
+    set_attributes(
+        {"hdx.resource_id": resource.uuid, "hdx.resource_version": resource.version},
+    )
+    client = http_clients.download
+    if (
+        partial_read
+        and REMOTE_INPUT
+        and not resource_cache.contains(resource.uuid, resource.version)
+    ):
+        remote_input = await get_remote_input(client, resource.download_url)
+        if remote_input:
+            logger.info("Reading %s through %s", resource.uuid, remote_input)
+            set_attributes({"input.remote": True})
+            return remote_input
+    input_path = tmp_dir / "input"
+    input_path.mkdir()
+    fetch = partial(fetch_resource, client, resource.download_url)
+    input_file = await resource_cache.checkout(
+        resource.uuid,
+        resource.version,
+        fetch,
+        input_path,
+    )
+    set_attributes({"input.size": (await run_io(input_file.stat)).st_size})
+    if await run_io(is_zipfile, input_file):
+        zip_input = await run_io(get_zip_input, input_file) if VSIZIP_INPUT else None
+        if zip_input:
+            zip_stats.in_place += 1
+            zip_stats.bytes_not_extracted += await run_io(
+                get_uncompressed_size,
+                input_file,
+            )
+            logger.info("Reading %s through %s", resource.uuid, zip_input)
+            return zip_input
+        unzip_dir = tmp_dir / "unzip"
+        unzip_dir.mkdir()
+        if input_file.suffix == ".zip":
+            unzip_dir = unzip_dir / input_file.with_suffix("")
+        start = monotonic()
+        with timed("unzip"):
+            await run_io(unzip_flat, input_file, unzip_dir)
+        zip_stats.extracted += 1
+        zip_stats.bytes_extracted += await run_io(get_input_size, str(unzip_dir))
+        zip_stats.extract_seconds += monotonic() - start
+        return str(unzip_dir)
+    return str(input_file)
+
+
+async def fetch_resource(
+    client: AsyncClient,
+    download_url: str,
+    stale: ResourceEntry | None,
+    output_dir: Path,
+) -> Download | None:
+    """Download a resource, or return None if the stale copy is still valid."""
+    headers = ua_generate().headers.get()
+    conditional_headers = {}
+    if stale:
+        if stale.etag:
+            conditional_headers["If-None-Match"] = stale.etag
+        if stale.last_modified:
+            conditional_headers["If-Modified-Since"] = stale.last_modified
+    with timed("head"):
+        r = await client.head(download_url, headers={**headers, **conditional_headers})
+    if stale and r.status_code == codes.NOT_MODIFIED:
+        return None
+    filename = (
+        stale.filename if stale else Path(parse_filename(r.headers, download_url)).name
+    )
+    output_file = output_dir / filename
+    with timed("download"):
+        size = await downloader.download(client, download_url, output_file, headers, r)
+    return Download(
+        filename=filename,
+        size=size,
+        etag=r.headers.get("ETag"),
+        last_modified=r.headers.get("Last-Modified"),
+    )
+
+
+async def get_remote_input(client: AsyncClient, download_url: str) -> str | None:
+    """Get a /vsicurl/ path if the server supports range requests on a large file."""
+    with timed("head"):
+        r = await client.head(download_url, headers=ua_generate().headers.get())
+    if not r.is_success or r.headers.get("Accept-Ranges") != "bytes":
+        return None
+    suffix = Path(parse_filename(r.headers, download_url)).suffix.lower()
+    size = int(r.headers.get("Content-Length", "0"))
+    if suffix not in REMOTE_SUFFIXES or size < REMOTE_MIN_BYTES:
+        return None
+    remote_input = f"/vsicurl/{download_url}"
+    return f"/vsizip/{remote_input}" if suffix == ".zip" else remote_input
+
+
+def get_remote_config() -> list[str]:
+    """Get the GDAL configuration for reading /vsicurl/ inputs."""
+    user_agent = ua_generate().headers.get()["user-agent"]
+    return [*VSICURL_CONFIG, f"GDAL_HTTP_USERAGENT={user_agent}"]
+
+
+def get_zip_input(input_file: Path) -> str | None:
+    """Get a /vsizip/ path to the dataset in a zip, or None if it must be extracted.
+
+    Datasets spread over several folders, formats GDAL cannot read through VSI, and
+    compressed formats needing random access are extracted instead.
+    """
+    with ZipFile(input_file) as z:
+        members = [
+            m
+            for m in z.infolist()
+            if not m.is_dir() and not m.filename.startswith("__MACOSX/")
+        ]
+    datasets: set[PurePosixPath] = set()
+    for member in members:
+        path = PurePosixPath(member.filename)
+        suffix = path.suffix.lower()
+        gdb = next((p for p in path.parents if p.suffix.lower() == ".gdb"), None)
+        if suffix in ZIP_EXTRACT_SUFFIXES or (
+            suffix in ZIP_RANDOM_ACCESS_SUFFIXES and member.compress_type != ZIP_STORED
+        ):
+            return None
+        if gdb:
+            datasets.add(gdb)
+        elif suffix in ZIP_DATASET_SUFFIXES:
+            datasets.add(path)
+    primary = {p for p in datasets if p.suffix.lower() not in ZIP_SECONDARY_SUFFIXES}
+    datasets = primary or datasets
+    if len(datasets) == 1:
+        return f"/vsizip/{input_file}/{datasets.pop()}"
+    folders = {p.parent for p in datasets}
+    if len(folders) == 1:
+        folder = folders.pop()
+        return f"/vsizip/{input_file}" + ("" if folder.name == "" else f"/{folder}")
+    return None
+
+
+def get_uncompressed_size(input_file: Path) -> int:
+    """Get the size of the members of a zip once extracted."""
+    with ZipFile(input_file) as z:
+        return sum(member.file_size for member in z.infolist())
+
+
+async def get_resource(resource_id: str) -> Resource:
+    """Get the download URL and version of a resource."""
+    uuid = get_last_uuid_v4(resource_id)
+    with timed("resource_show"):
+        r = await http_clients.hdx.get(
+            f"{HDX_URL}/api/3/action/resource_show?id={uuid}",
+        )
+    r.raise_for_status()
+    result = r.json()["result"]
+    version = result.get("last_modified") or result.get("metadata_modified")
+    return Resource(
+        uuid=uuid,
+        download_url=result["download_url"],
+        version=str(version),
+        size=int(result.get("size") or 0),
+    )
 
 
 def get_last_uuid_v4(text: str) -> str | None:
@@ -81,10 +287,26 @@ def get_last_uuid_v4(text: str) -> str | None:
     return None
 
 
-def get_options(params: BaseModel) -> list[str]:
-    """Format the options."""
+def get_input_size(input_path: str) -> int:
+    """Get the size of a local input file or folder, or 0 for remote inputs."""
+    if input_path.startswith("/vsizip/") and not input_path.startswith(
+        "/vsizip//vsicurl/",
+    ):
+        path = Path(input_path.removeprefix("/vsizip/"))
+        zip_file = next((p for p in (path, *path.parents) if p.is_file()), None)
+        return zip_file.stat().st_size if zip_file else 0
+    path = Path(input_path)
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size if path.is_file() else 0
+
+
+def get_options(params: BaseModel, fields: set[str] | None = None) -> list[str]:
+    """Format the options, or only those in fields."""
     options = []
     for opt_name in params.model_fields_set:
+        if fields is not None and opt_name not in fields:
+            continue
         cli_name = opt_name.replace("_", "-")
         value = getattr(params, opt_name)
         if isinstance(value, list):
@@ -96,45 +318,158 @@ def get_options(params: BaseModel) -> list[str]:
     return options
 
 
-async def get_output_path(output_path: Path) -> Path:
-    """Get the output path."""
-    if output_path.stat().st_size == 0:
+def get_result_key(resource: Resource, command: str, params: BaseModel) -> str:
+    """Get a hash identifying the output of a command for a resource version."""
+    fields = params.model_fields_set - {"input"}
+    key = {
+        "uuid": resource.uuid,
+        "version": resource.version,
+        "command": command,
+        "params": params.model_dump(mode="json", include=fields),
+    }
+    return sha256(dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+async def get_output_path(output_path: Path, *, archive: bool = True) -> Path:
+    """Get the output path, zipping the output if it has several files.
+
+    Without archive, the folder of the files to zip is returned instead.
+    """
+    size, is_dir, outputs = await run_io(inspect_output, output_path)
+    if size == 0:
         error = "Output file does not exist."
         logger.error(error)
         raise RuntimeError(error)
-    if output_path.is_dir():
-        output_path = await create_sozip(output_path, output_path)
-    elif len(list(output_path.parent.glob("*"))) > 1:
-        output_path = await create_sozip(output_path.parent, output_path)
-    return output_path
+    if is_dir:
+        input_path = output_path
+    elif outputs > 1:
+        input_path = output_path.parent
+    else:
+        return output_path
+    if not archive:
+        return input_path
+    return await create_sozip(input_path, output_path)
 
 
-async def get_temp_dir() -> AsyncGenerator[Path]:
-    """Get a temporary directory."""
-    temp_dir = TemporaryDirectory()
-    yield Path(temp_dir.name)
+def inspect_output(output_path: Path) -> tuple[int, bool, int]:
+    """Get the size of an output, if it is a folder and the files next to it."""
+    return (
+        output_path.stat().st_size,
+        output_path.is_dir(),
+        len(list(output_path.parent.glob("*"))),
+    )
 
 
-async def run_command_and_check(cmd: list[str]) -> str:
-    """Execute a command, captures stdout, and raises a detailed Exception."""
-    segmentation_fault = -11
-    proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
-    stdout_data, stderr_data = await proc.communicate()
-    stdout_str = stdout_data.decode().strip()
-    stderr_str = stderr_data.decode().strip()
-    if proc.returncode != 0:
-        if proc.returncode == segmentation_fault and not stderr_str:
-            stderr_str = "segmentation fault"
-        error = (
-            f"Command failed with exit code: {proc.returncode}. "
-            f"Command: {' '.join(cmd)}. "
-            f"Stderr: {stderr_str}"
-        )
+def record_exit(returncode: int, labels: dict[str, str] | None = None) -> None:
+    """Count the exit code of a GDAL subprocess."""
+    subprocess_exits.inc(code=str(returncode), **(labels or get_labels()))
+
+
+def get_command_error(cmd: list[str], returncode: int, stderr_str: str) -> str:
+    """Format the error of a failed command."""
+    if returncode == SEGMENTATION_FAULT and not stderr_str:
+        stderr_str = "segmentation fault"
+    return (
+        f"Command failed with exit code: {returncode}. "
+        f"Command: {' '.join(cmd)}. "
+        f"Stderr: {stderr_str}"
+    )
+
+
+async def read_progress(stream: StreamReader, progress: Progress) -> bytes:
+    """Read the stdout of a command, reporting its GDAL --progress percentages."""
+    data = b""
+    while chunk := await stream.read(1024):
+        data += chunk
+        percentages = findall(rb"(\d+)(?:\.\.\.| - done)", data[-64:])
+        if percentages:
+            progress(float(percentages[-1]))
+    return data
+
+
+@traced("run_command_and_check")
+async def run_command_and_check(
+    cmd: list[str],
+    progress: Progress | None = None,
+) -> str:
+    """Execute a command, captures stdout, and raises a detailed Exception.
+
+    GDAL vector commands run in the process engine when it is enabled, unless their
+    progress is reported.
+    """
+    with timed("gdal"):
+        if engine.enabled and cmd[:2] == ["gdal", "vector"] and progress is None:
+            returncode, stdout_str, stderr_str = await engine.run(cmd)
+            stdout_str, stderr_str = stdout_str.strip(), stderr_str.strip()
+        else:
+            proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
+            if progress:
+                stdout_data, stderr_data = await gather(
+                    read_progress(proc.stdout, progress),
+                    proc.stderr.read(),
+                )
+                await proc.wait()
+            else:
+                stdout_data, stderr_data = await proc.communicate()
+            returncode = proc.returncode
+            stdout_str = stdout_data.decode().strip()
+            stderr_str = stderr_data.decode().strip()
+    record_exit(returncode)
+    set_attributes({"gdal.command": " ".join(cmd[:3]), "process.exit_code": returncode})
+    if returncode != 0:
+        error = get_command_error(cmd, returncode, stderr_str)
         logger.error(error)
         raise RuntimeError(error)
     return stdout_str
 
 
+async def stream_command_and_check(cmd: list[str]) -> AsyncGenerator[bytes]:
+    """Execute a command and stream its stdout.
+
+    Waits for the first chunk, so a command failing or writing nothing raises a
+    detailed Exception like run_command_and_check. A failure after that is raised at
+    the end of the stream, which aborts the response. The stream is already started,
+    so closing it kills the command even if it was never read.
+    """
+    start = perf_counter()
+    labels = get_labels()
+    proc = await create_subprocess_exec(*cmd, stdout=PIPE, stderr=PIPE)
+    stderr_task = create_task(proc.stderr.read())
+
+    async def check() -> None:
+        returncode = await proc.wait()
+        stderr_str = (await stderr_task).decode().strip()
+        stage_seconds.observe(perf_counter() - start, stage="gdal", **labels)
+        record_exit(returncode, labels)
+        if returncode != 0:
+            error = get_command_error(cmd, returncode, stderr_str)
+            logger.error(error)
+            raise RuntimeError(error)
+
+    async def chunks() -> AsyncGenerator[bytes]:
+        try:
+            first_chunk = await proc.stdout.read(STREAM_CHUNK_SIZE)
+            if not first_chunk:
+                await check()
+                error = f"Command produced no output. Command: {' '.join(cmd)}."
+                logger.error(error)
+                raise RuntimeError(error)
+            yield b""
+            yield first_chunk
+            while chunk := await proc.stdout.read(STREAM_CHUNK_SIZE):
+                yield chunk
+            await check()
+        finally:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            stderr_task.cancel()
+
+    stream = chunks()
+    await anext(stream)
+    return stream
+
+
 def unzip_flat(input_file: Path, output_dir: Path) -> None:
     """Unzip a file to a flat directory."""
     with ZipFile(input_file) as z:
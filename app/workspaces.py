@@ -0,0 +1,149 @@
+import logging
+from asyncio import Future, get_running_loop, wait_for
+from collections.abc import AsyncGenerator
+from pathlib import Path
+from shutil import disk_usage, rmtree
+from time import monotonic
+from uuid import uuid4
+
+from pydantic import BaseModel
+
+from .config import (
+    CACHE_DIR,
+    WORKSPACE_MIN_FREE_BYTES,
+    WORKSPACE_SIZE_FACTOR,
+    WORKSPACE_WAIT,
+)
+from .threads import run_io
+
+logger = logging.getLogger(__name__)
+
+
+class WorkspaceFullError(RuntimeError):
+    pass
+
+
+class WorkspaceStats(BaseModel):
+    created: int = 0
+    removed: int = 0
+    swept: int = 0
+    queued: int = 0
+    rejected: int = 0
+
+
+class Workspaces:
+    """Working directories of the requests, with the disk space they may use.
+
+    Each request reserves an estimate of its space from the size of its resource
+    before downloading it. Once the volume would be left with less than
+    WORKSPACE_MIN_FREE_BYTES, requests wait up to WORKSPACE_WAIT seconds for other
+    workspaces to be removed, and are rejected after that.
+    """
+
+    def __init__(
+        self,
+        root: Path,
+        min_free_bytes: int,
+        size_factor: float,
+        wait: int,
+    ) -> None:
+        """Initialize the workspaces without touching the disk."""
+        self.root = root
+        self.min_free_bytes = min_free_bytes
+        self.size_factor = size_factor
+        self.wait = wait
+        self.stats = WorkspaceStats()
+        self._reserved: dict[Path, int] = {}
+        self._waiters: list[Future[None]] = []
+
+    @property
+    def reserved(self) -> int:
+        """Total space reserved by the workspaces."""
+        return sum(self._reserved.values())
+
+    def sweep(self) -> None:
+        """Remove the workspaces left by a previous run."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        for path in self.root.iterdir():
+            rmtree(path, ignore_errors=True)
+            self.stats.swept += 1
+        if self.stats.swept:
+            logger.info("Removed %s orphaned workspaces", self.stats.swept)
+
+    def create(self) -> Path:
+        """Create an empty workspace."""
+        path = self.root / uuid4().hex
+        path.mkdir(parents=True)
+        self._reserved[path] = 0
+        self.stats.created += 1
+        return path
+
+    async def reserve(self, path: Path, input_bytes: int) -> None:
+        """Reserve the space a workspace needs to process an input, waiting for it.
+
+        Raises WorkspaceFullError if the space is still missing after the wait, or
+        right away if no other workspace could free it.
+        """
+        nbytes = int(input_bytes * self.size_factor)
+        deadline = monotonic() + self.wait
+        queued = False
+        while not self._fits(nbytes):
+            remaining = deadline - monotonic()
+            if remaining <= 0 or not any(self._reserved.values()):
+                self.stats.rejected += 1
+                error = "Not enough disk space to process the request, try again later."
+                raise WorkspaceFullError(error)
+            if not queued:
+                self.stats.queued += 1
+                queued = True
+            future = get_running_loop().create_future()
+            self._waiters.append(future)
+            try:
+                await wait_for(future, remaining)
+            except TimeoutError:
+                pass
+            finally:
+                if future in self._waiters:
+                    self._waiters.remove(future)
+        self._reserved[path] = self._reserved.get(path, 0) + nbytes
+
+    async def remove(self, path: Path) -> None:
+        """Delete a workspace and release its space."""
+        await run_io(rmtree, path, ignore_errors=True)
+        self._reserved.pop(path, None)
+        self.stats.removed += 1
+        for future in self._waiters:
+            if not future.done():
+                future.set_result(None)
+        self._waiters.clear()
+
+    def get_stats(self) -> dict:
+        """Get the workspace counters and disk usage for monitoring."""
+        stats = self.stats.model_dump()
+        stats["active"] = len(self._reserved)
+        stats["waiting"] = len(self._waiters)
+        stats["reserved_bytes"] = self.reserved
+        stats["free_bytes"] = disk_usage(self.root).free if self.root.exists() else 0
+        stats["min_free_bytes"] = self.min_free_bytes
+        return stats
+
+    def _fits(self, nbytes: int) -> bool:
+        free = disk_usage(self.root).free - self.reserved
+        return free - nbytes >= self.min_free_bytes
+
+
+workspaces = Workspaces(
+    CACHE_DIR / "workspaces",
+    WORKSPACE_MIN_FREE_BYTES,
+    WORKSPACE_SIZE_FACTOR,
+    WORKSPACE_WAIT,
+)
+
+
+async def get_workspace() -> AsyncGenerator[Path]:
+    """Get a workspace for a request, removed once the response is sent."""
+    path = workspaces.create()
+    try:
+        yield path
+    finally:
+        await workspaces.remove(path)
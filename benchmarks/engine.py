@@ -0,0 +1,74 @@
+"""Compare the per-request latency of the GDAL CLI and the process engine.
+
+Usage: uv run python -m benchmarks.engine example.gpkg --runs 20
+"""
+
+import asyncio
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import mean, median, quantiles
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from app.engine import engine
+from app.utils import run_command_and_check
+
+
+def get_commands(input_path: str, output_dir: Path) -> dict[str, list[str]]:
+    """Get the commands to time, as built by the vector endpoints."""
+    return {
+        "info": [
+            *["gdal", "vector", "info", "--output-format=json"],
+            f"--input={input_path}",
+        ],
+        "convert": [
+            *["gdal", "vector", "convert", "--overwrite"],
+            f"--input={input_path}",
+            f"--output={output_dir / 'output.fgb'}",
+        ],
+    }
+
+
+async def time_command(cmd: list[str], runs: int) -> list[float]:
+    """Time a command over several runs."""
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        await run_command_and_check(cmd)
+        timings.append(perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    """Print the latency statistics of a command."""
+    p95 = quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+    print(  # noqa: T201
+        f"{name:<20} mean {mean(timings) * 1000:8.1f} ms  "
+        f"median {median(timings) * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms",
+    )
+
+
+async def main(input_path: str, runs: int) -> None:
+    """Run the benchmark."""
+    with TemporaryDirectory() as tmp:
+        commands = get_commands(input_path, Path(tmp))
+        for name, cmd in commands.items():
+            report(f"cli {name}", await time_command(cmd, runs))
+        engine.start()
+        if not engine.enabled:
+            return
+        try:
+            for cmd in commands.values():
+                await run_command_and_check(cmd)  # warm up the workers
+            for name, cmd in commands.items():
+                report(f"process {name}", await time_command(cmd, runs))
+        finally:
+            engine.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="Vector dataset to read")
+    parser.add_argument("--runs", type=int, default=10, help="Runs per command")
+    args = parser.parse_args()
+    asyncio.run(main(args.input, args.runs))
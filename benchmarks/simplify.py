@@ -0,0 +1,110 @@
+"""Compare simplifying a layer in one run with simplifying partitions in parallel.
+
+Usage: uv run python -m benchmarks.simplify buildings.gpkg 0.0001 --partitions 4 8
+"""
+
+import asyncio
+from argparse import ArgumentParser
+from json import loads
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from app.engine import engine
+from app.models import Simplify
+from app.routers.vector_utils import (
+    get_partition_plan,
+    get_vector_command,
+    run_partitions,
+)
+from app.utils import run_command_and_check
+
+
+async def count_features(output_path: Path) -> int:
+    """Count the features of an output."""
+    cmd = ["gdal", "vector", "info", "--output-format=json", f"--input={output_path}"]
+    info = loads(await run_command_and_check(cmd))
+    return sum(layer.get("featureCount") or 0 for layer in info["layers"])
+
+
+async def time_single(params: Simplify, output_dir: Path) -> float:
+    """Time the simplification of the layer in one GDAL run."""
+    output_dir.mkdir(parents=True)
+    run_params = params.model_copy(update={"output": str(output_dir / params.output)})
+    start = perf_counter()
+    await run_command_and_check(get_vector_command(run_params, "simplify"))
+    return perf_counter() - start
+
+
+async def time_partitioned(
+    params: Simplify,
+    output_dir: Path,
+    partitions: int,
+) -> float:
+    """Time the simplification of the layer over partitions, with the merge."""
+    output_dir.mkdir(parents=True)
+    output_path = output_dir / "output" / params.output
+    output_path.parent.mkdir()
+    run_params = params.model_copy(update={"output": str(output_path)})
+    start = perf_counter()
+    plan = await get_partition_plan(run_params, partitions)
+    if plan is None:
+        error = "The input has several layers or too few features to partition."
+        raise SystemExit(error)
+    await run_partitions(output_path, run_params, *plan)
+    return perf_counter() - start
+
+
+async def main(params: Simplify, partitions: list[int], runs: int) -> None:
+    """Run the benchmark."""
+    engine.start()
+    try:
+        with TemporaryDirectory() as tmp:
+            single = [
+                await time_single(params, Path(tmp) / f"single-{run}")
+                for run in range(runs)
+            ]
+            expected = await count_features(Path(tmp) / "single-0" / params.output)
+            print(  # noqa: T201
+                f"{'single run':<16} median {median(single):8.2f} s  "
+                f"{expected} features",
+            )
+            for count in partitions:
+                timings = [
+                    await time_partitioned(
+                        params,
+                        Path(tmp) / f"partitioned-{count}-{run}",
+                        count,
+                    )
+                    for run in range(runs)
+                ]
+                output_path = (
+                    Path(tmp) / f"partitioned-{count}-0/output/{params.output}"
+                )
+                features = await count_features(output_path)
+                print(  # noqa: T201
+                    f"{f'{count} partitions':<16} median {median(timings):8.2f} s  "
+                    f"speedup {median(single) / median(timings):5.2f}x  "
+                    f"{features} features",
+                )
+    finally:
+        engine.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="Vector dataset with a single layer")
+    parser.add_argument("tolerance", type=float, help="Simplification tolerance")
+    parser.add_argument("--output", default="output.gpkg", help="Output file name")
+    parser.add_argument(
+        "--partitions",
+        type=int,
+        nargs="+",
+        default=[2, 4, 8],
+        help="Partition counts to compare",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Runs per mode")
+    args = parser.parse_args()
+    simplify = Simplify(input=args.input, output=args.output, tolerance=args.tolerance)
+    asyncio.run(main(simplify, args.partitions, args.runs))
@@ -0,0 +1,77 @@
+"""Compare reading a zipped dataset through /vsizip/ with extracting it first.
+
+Usage: uv run python -m benchmarks.vsizip example.shp.zip --runs 5
+"""
+
+import asyncio
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from app.utils import (
+    get_input_size,
+    get_zip_input,
+    run_command_and_check,
+    unzip_flat,
+)
+
+
+def get_command(input_path: str) -> list[str]:
+    """Get a command reading every feature of a dataset."""
+    return [
+        *["gdal", "vector", "convert", f"--input={input_path}"],
+        *["--output=/vsistdout/", "--output-format=GeoJSONSeq"],
+    ]
+
+
+async def time_extract(input_file: Path, runs: int) -> tuple[float, int]:
+    """Time extracting a zip and reading it, returning the bytes written to disk."""
+    timings = []
+    size = 0
+    for _ in range(runs):
+        with TemporaryDirectory() as tmp:
+            start = perf_counter()
+            unzip_flat(input_file, Path(tmp))
+            await run_command_and_check(get_command(tmp))
+            timings.append(perf_counter() - start)
+            size = get_input_size(tmp)
+    return median(timings), size
+
+
+async def time_in_place(zip_input: str, runs: int) -> float:
+    """Time reading a zip in place."""
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        await run_command_and_check(get_command(zip_input))
+        timings.append(perf_counter() - start)
+    return median(timings)
+
+
+async def main(input_path: str, runs: int) -> None:
+    """Run the benchmark."""
+    input_file = Path(input_path).resolve()
+    zip_input = get_zip_input(input_file)
+    extract_seconds, extract_bytes = await time_extract(input_file, runs)
+    extract_mib = extract_bytes / 1024**2
+    print(  # noqa: T201
+        f"extract  median {extract_seconds:8.2f} s  disk {extract_mib:10.1f} MiB",
+    )
+    if not zip_input:
+        print("zip is extracted by the API, no in place read to compare")  # noqa: T201
+        return
+    in_place_seconds = await time_in_place(zip_input, runs)
+    print(  # noqa: T201
+        f"vsizip   median {in_place_seconds:8.2f} s  disk {0:10.1f} MiB  "
+        f"saved {extract_seconds - in_place_seconds:8.2f} s",
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description=__doc__)
+    parser.add_argument("input", help="Zipped vector dataset to read")
+    parser.add_argument("--runs", type=int, default=5, help="Runs per method")
+    args = parser.parse_args()
+    asyncio.run(main(args.input, args.runs))
@@ -0,0 +1,119 @@
+from asyncio import gather, run
+from collections.abc import Callable
+
+import pytest
+from httpx import AsyncClient, HTTPStatusError, MockTransport, Request, Response
+
+from app import auth
+from app.auth import Token, TokenCache
+from app.clients import http_clients
+
+TTL = 60
+NEGATIVE_TTL = 10
+RESULT = {"token_name": "app", "email_hash": "hash"}
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Control the time seen by the token cache."""
+    now = [1000.0]
+    monkeypatch.setattr(auth, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def hdx(monkeypatch: pytest.MonkeyPatch) -> Callable[[list[int]], list[Request]]:
+    """Answer token checks with a sequence of statuses, returning the requests."""
+
+    def mock(statuses: list[int]) -> list[Request]:
+        requests = []
+
+        def handler(request: Request) -> Response:
+            requests.append(request)
+            status = statuses[min(len(requests), len(statuses)) - 1]
+            return Response(status, json={"result": RESULT})
+
+        client = AsyncClient(transport=MockTransport(handler))
+        monkeypatch.setattr(http_clients, "_hdx", client)
+        return requests
+
+    return mock
+
+
+def get(token_cache: TokenCache, api_key: str = "key") -> Token:
+    """Validate a token through the cache."""
+    return run(token_cache.get(api_key))
+
+
+def test_valid_token_is_cached_for_ttl(
+    clock: list[float],
+    hdx: Callable[[list[int]], list[Request]],
+) -> None:
+    requests = hdx([200])
+    token_cache = TokenCache(10, TTL, NEGATIVE_TTL)
+    token = get(token_cache)
+    assert token.valid
+    assert token.app_name == RESULT["token_name"]
+    clock[0] += TTL - 1
+    assert get(token_cache).valid
+    assert len(requests) == 1
+    clock[0] += 1
+    assert get(token_cache).valid
+    assert [request.method for request in requests] == ["GET", "GET"]
+
+
+def test_rejected_token_is_cached_for_negative_ttl(
+    clock: list[float],
+    hdx: Callable[[list[int]], list[Request]],
+) -> None:
+    requests = hdx([403, 200])
+    token_cache = TokenCache(10, TTL, NEGATIVE_TTL)
+    assert not get(token_cache).valid
+    clock[0] += NEGATIVE_TTL - 1
+    assert not get(token_cache).valid
+    assert len(requests) == 1
+    clock[0] += 1
+    assert get(token_cache).valid
+
+
+@pytest.mark.usefixtures("clock")
+@pytest.mark.parametrize("status", [408, 429, 503])
+def test_other_errors_are_not_cached(
+    status: int,
+    hdx: Callable[[list[int]], list[Request]],
+) -> None:
+    requests = hdx([status, 200])
+    token_cache = TokenCache(10, TTL, NEGATIVE_TTL)
+    with pytest.raises(HTTPStatusError):
+        get(token_cache)
+    assert get(token_cache).valid
+    assert [request.method for request in requests] == ["GET", "GET"]
+
+
+@pytest.mark.usefixtures("clock")
+def test_concurrent_checks_are_coalesced(
+    hdx: Callable[[list[int]], list[Request]],
+) -> None:
+    requests = hdx([200])
+    token_cache = TokenCache(10, TTL, NEGATIVE_TTL)
+
+    api_keys = ["key"] * 3
+
+    async def main() -> list[Token]:
+        return await gather(*map(token_cache.get, api_keys))
+
+    assert all(token.valid for token in run(main()))
+    assert len(requests) == 1
+    assert token_cache.stats.coalesced == len(api_keys) - 1
+
+
+@pytest.mark.usefixtures("clock")
+def test_oldest_tokens_are_evicted(
+    hdx: Callable[[list[int]], list[Request]],
+) -> None:
+    hdx([200])
+    token_cache = TokenCache(1, TTL, NEGATIVE_TTL)
+    get(token_cache, "a")
+    get(token_cache, "b")
+    assert token_cache.get_stats()["entries"] == 1
+    assert token_cache.stats.evictions == 1
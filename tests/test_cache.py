@@ -0,0 +1,78 @@
+from asyncio import run
+from pathlib import Path
+
+import pytest
+
+from app import cache
+from app.cache import ResultCache
+
+MAX_AGE = 60
+SIZE = 10
+
+
+def put(result_cache: ResultCache, tmp_path: Path, key: str) -> None:
+    """Store an output in the cache."""
+    output_path = tmp_path / "outputs" / key / "output.geojson"
+    output_path.parent.mkdir(parents=True)
+    output_path.write_bytes(b"x" * SIZE)
+    result_cache.put(key, output_path, "application/geo+json")
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> list[float]:
+    """Control the time seen by the caches."""
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", lambda: now[0])
+    return now
+
+
+def test_expired_entries_are_evicted(tmp_path: Path, clock: list[float]) -> None:
+    result_cache = ResultCache(tmp_path, 1024, MAX_AGE)
+    put(result_cache, tmp_path, "a")
+    assert result_cache.get("a")
+    clock[0] += MAX_AGE
+    assert result_cache.get("a") is None
+    assert result_cache.stats.evictions == 1
+    assert not (tmp_path / "results" / "a").exists()
+
+
+def test_least_recently_used_entries_are_evicted(
+    tmp_path: Path,
+    clock: list[float],
+) -> None:
+    result_cache = ResultCache(tmp_path, 2 * SIZE + SIZE // 2, MAX_AGE)
+    put(result_cache, tmp_path, "a")
+    clock[0] += 1
+    put(result_cache, tmp_path, "b")
+    clock[0] += 1
+    assert result_cache.get("a")
+    put(result_cache, tmp_path, "c")
+    assert result_cache.get("b") is None
+    assert result_cache.get("a")
+    assert result_cache.get("c")
+    assert result_cache.get_stats()["bytes"] == 2 * SIZE
+
+
+def test_load_indexes_entries_on_disk(tmp_path: Path, clock: list[float]) -> None:
+    put(ResultCache(tmp_path, 1024, MAX_AGE), tmp_path, "a")
+    clock[0] += 1
+    result_cache = ResultCache(tmp_path, 1024, MAX_AGE)
+    result_cache.load()
+    entry = result_cache.get("a")
+    assert entry
+    assert entry.size == SIZE
+
+
+def test_checkout_outlives_eviction(tmp_path: Path, clock: list[float]) -> None:
+    result_cache = ResultCache(tmp_path, 1024, MAX_AGE)
+    put(result_cache, tmp_path, "a")
+    entry = result_cache.get("a")
+    assert entry
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    output_path = run(result_cache.checkout(entry, workspace))
+    clock[0] += MAX_AGE
+    result_cache.get("a")
+    assert output_path
+    assert output_path.read_bytes() == b"x" * SIZE
+    assert run(result_cache.checkout(entry, workspace)) is None
@@ -0,0 +1,111 @@
+from asyncio import run
+from collections.abc import AsyncIterator, Callable
+from pathlib import Path
+
+import pytest
+from httpx import (
+    AsyncByteStream,
+    AsyncClient,
+    MockTransport,
+    ReadError,
+    Request,
+    Response,
+)
+
+from app import download
+from app.download import Downloader
+
+CHUNK_SIZE = 1024
+DATA = bytes(range(256)) * 16  # 4 chunks
+URL = "https://data.humdata.local/dataset/resource.geojson"
+
+
+class FailingStream(AsyncByteStream):
+    """Response body raising a transport error after some bytes."""
+
+    def __init__(self, content: bytes, fail_after: int) -> None:
+        """Initialize the stream."""
+        self.content = content
+        self.fail_after = fail_after
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Yield the first bytes of the content, then fail."""
+        yield self.content[: self.fail_after]
+        error = "Connection reset"
+        raise ReadError(error)
+
+
+def get_span(request: Request) -> tuple[int, int]:
+    """Get the first and last byte of a range request."""
+    start, end = request.headers["Range"].removeprefix("bytes=").split("-")
+    return int(start), int(end) if end else len(DATA) - 1
+
+
+def range_handler(failures: int) -> Callable[[Request], Response]:
+    """Serve ranges of the data, failing halfway through the second chunk."""
+    calls = {"failed": 0}
+
+    def handler(request: Request) -> Response:
+        start, end = get_span(request)
+        content = DATA[start : end + 1]
+        headers = {"Content-Range": f"bytes {start}-{end}/{len(DATA)}"}
+        if CHUNK_SIZE <= start < 2 * CHUNK_SIZE and calls["failed"] < failures:
+            calls["failed"] += 1
+            stream = FailingStream(content, len(content) // 2)
+            return Response(206, headers=headers, stream=stream)
+        return Response(206, headers=headers, content=content)
+
+    return handler
+
+
+def run_download(
+    handler: Callable[[Request], Response],
+    output_file: Path,
+    retries: int,
+) -> Downloader:
+    """Download the data with a mocked server in parallel chunks."""
+    downloader = Downloader(CHUNK_SIZE, 2, CHUNK_SIZE, retries)
+    head = Response(
+        200,
+        headers={"Accept-Ranges": "bytes", "Content-Length": str(len(DATA))},
+    )
+
+    async def main() -> None:
+        async with AsyncClient(transport=MockTransport(handler)) as client:
+            await downloader.download(client, URL, output_file, {}, head)
+
+    run(main())
+    return downloader
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Retry without waiting."""
+
+    async def sleep(_: float) -> None:
+        pass
+
+    monkeypatch.setattr(download, "sleep", sleep)
+
+
+def test_chunk_resumes_after_failure(tmp_path: Path) -> None:
+    output_file = tmp_path / "resource.geojson"
+    downloader = run_download(range_handler(1), output_file, 1)
+    assert output_file.read_bytes() == DATA
+    assert downloader.stats.parallel == 1
+    assert downloader.stats.retries == 1
+    assert downloader.stats.resumed_bytes == CHUNK_SIZE // 2
+
+
+def test_chunk_failure_raises_transport_error(tmp_path: Path) -> None:
+    output_file = tmp_path / "resource.geojson"
+    with pytest.raises(ReadError):
+        run_download(range_handler(2), output_file, 1)
+
+
+def test_ignored_ranges_fall_back_to_stream(tmp_path: Path) -> None:
+    output_file = tmp_path / "resource.geojson"
+    downloader = run_download(lambda _: Response(200, content=DATA), output_file, 1)
+    assert output_file.read_bytes() == DATA
+    assert downloader.stats.parallel == 0
+    assert downloader.stats.downloads == 1
@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.engine import init_worker, run_algorithm, split_config
+
+gdal = pytest.importorskip("osgeo.gdal")
+
+FEATURES = {
+    "type": "FeatureCollection",
+    "features": [
+        {
+            "type": "Feature",
+            "properties": {"values": [1, 2]},
+            "geometry": {"type": "Point", "coordinates": [0, 0]},
+        },
+    ],
+}
+
+
+def get_field_type(input_path: Path, config: list[str]) -> str:
+    """Get the type of the field of a GeoJSON file read with a configuration."""
+    returncode, stdout, stderr = run_algorithm(
+        [
+            *["gdal", "vector", "info", "--output-format=json"],
+            f"--input={input_path}",
+            *config,
+        ],
+    )
+    assert returncode == 0, stderr
+    return json.loads(stdout)["layers"][0]["fields"][0]["type"]
+
+
+def test_split_config() -> None:
+    args, config = split_config(
+        ["--config=A=1", "--input=in.fgb", "--config", "B=2=3", "read"],
+    )
+    assert args == ["--input=in.fgb", "read"]
+    assert config == {"A": "1", "B": "2=3"}
+
+
+def test_config_takes_effect(tmp_path: Path) -> None:
+    init_worker()
+    input_path = tmp_path / "input.geojson"
+    input_path.write_text(json.dumps(FEATURES))
+    assert get_field_type(input_path, []) == "IntegerList"
+    config = ["--config=OGR_GEOJSON_ARRAY_AS_STRING=YES"]
+    assert get_field_type(input_path, config) == "String"
+    assert gdal.GetConfigOption("OGR_GEOJSON_ARRAY_AS_STRING") is None
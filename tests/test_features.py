@@ -0,0 +1,103 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from app.features import close_readers, init_thread, open_reader, read_page
+from app.models import FeatureQuery
+
+ogr = pytest.importorskip("osgeo.ogr")
+osr = pytest.importorskip("osgeo.osr")
+
+COUNT = 5
+LIMIT = 2
+
+
+@pytest.fixture(autouse=True)
+def exceptions() -> None:
+    """Make GDAL raise exceptions, as in the reader thread."""
+    init_thread()
+
+
+def write_points(path: Path, driver: str) -> None:
+    """Write a layer of points along the diagonal, named after their order."""
+    dataset = ogr.GetDriverByName(driver).CreateDataSource(str(path))
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(4326)
+    layer = dataset.CreateLayer("points", srs, ogr.wkbPoint)
+    layer.CreateField(ogr.FieldDefn("name", ogr.OFTString))
+    for i in range(COUNT):
+        feature = ogr.Feature(layer.GetLayerDefn())
+        feature.SetField("name", f"p{i}")
+        feature.SetGeometry(ogr.CreateGeometryFromWkt(f"POINT ({i} {i})"))
+        layer.CreateFeature(feature)
+    dataset.Close()
+
+
+def read_names(params: FeatureQuery) -> tuple[list[str], str | None]:
+    """Open a layer at the cursor of a query and read the names of a page."""
+    reader = open_reader(params, None)
+    try:
+        content, cursor, _ = read_page(reader, params)
+    finally:
+        close_readers([reader])
+    page = json.loads(content)
+    assert page["next_cursor"] == cursor
+    return [feature["properties"]["name"] for feature in page["features"]], cursor
+
+
+def test_cursor_pages_through_features(tmp_path: Path) -> None:
+    input_path = tmp_path / "points.geojson"
+    write_points(input_path, "GeoJSON")
+    params = FeatureQuery(input=str(input_path), limit=LIMIT)
+    pages = []
+    while True:
+        names, cursor = read_names(params)
+        pages.append(names)
+        if cursor is None:
+            break
+        params = params.model_copy(update={"cursor": cursor})
+    assert pages == [["p0", "p1"], ["p2", "p3"], ["p4"]]
+
+
+def test_open_reader_continues_after_its_page(tmp_path: Path) -> None:
+    input_path = tmp_path / "points.geojson"
+    write_points(input_path, "GeoJSON")
+    params = FeatureQuery(input=str(input_path), limit=LIMIT, where="name <> 'p1'")
+    reader = open_reader(params, None)
+    try:
+        first, cursor, _ = read_page(reader, params)
+        second, _, _ = read_page(reader, params)
+    finally:
+        close_readers([reader])
+    assert [f["properties"]["name"] for f in json.loads(first)["features"]] == [
+        "p0",
+        "p2",
+    ]
+    reopened, _ = read_names(params.model_copy(update={"cursor": cursor}))
+    assert json.loads(second)["features"][0]["properties"]["name"] == reopened[0]
+
+
+def test_bbox_cursor_is_rejected_on_indexed_layers(tmp_path: Path) -> None:
+    input_path = tmp_path / "points.gpkg"
+    write_points(input_path, "GPKG")
+    params = FeatureQuery(input=str(input_path), limit=LIMIT, bbox="0.5,0.5,5,5")
+    names, cursor = read_names(params)
+    assert len(names) == LIMIT
+    with pytest.raises(ValueError, match="cursor"):
+        read_names(params.model_copy(update={"cursor": cursor}))
+
+
+@pytest.mark.parametrize(
+    ("input_name", "where"),
+    [("missing.geojson", None), ("points.geojson", "name ==")],
+)
+def test_invalid_queries_raise_value_error(
+    tmp_path: Path,
+    input_name: str,
+    where: str | None,
+) -> None:
+    write_points(tmp_path / "points.geojson", "GeoJSON")
+    params = FeatureQuery(input=str(tmp_path / input_name), where=where)
+    with pytest.raises(ValueError):  # noqa: PT011
+        open_reader(params, None)
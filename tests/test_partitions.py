@@ -0,0 +1,70 @@
+from asyncio import run
+
+import pytest
+
+from app.models import Simplify
+from app.routers import vector_utils
+from app.routers.vector_utils import PARTITION_MIN_FEATURES, get_partition_plan
+
+PARAMS = Simplify(input="input.gpkg", output="output.gpkg", tolerance=0.01)
+
+
+def plan(
+    monkeypatch: pytest.MonkeyPatch,
+    layers: list[dict],
+    partitions: int,
+) -> tuple[str, list[str]] | None:
+    """Plan the partitions of an input with the info of its layers."""
+
+    async def get_layers(_: Simplify) -> list[dict]:
+        return layers
+
+    monkeypatch.setattr(vector_utils, "get_layers", get_layers)
+    return run(get_partition_plan(PARAMS, partitions))
+
+
+def test_ranges_cover_every_feature_id(monkeypatch: pytest.MonkeyPatch) -> None:
+    count = 4 * PARTITION_MIN_FEATURES
+    layer = {"name": "roads", "featureCount": count, "fidColumnName": "fid"}
+    result = plan(monkeypatch, [layer], 4)
+    assert result
+    name, filters = result
+    assert name == "roads"
+    bounds = [count // 4, count // 2, 3 * count // 4]
+    assert filters == [
+        f'"fid" < {bounds[0]}',
+        f'"fid" >= {bounds[0]} AND "fid" < {bounds[1]}',
+        f'"fid" >= {bounds[1]} AND "fid" < {bounds[2]}',
+        f'"fid" >= {bounds[2]}',
+    ]
+
+
+def test_partitions_keep_a_minimum_of_features(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    layer = {"name": "roads", "featureCount": 3 * PARTITION_MIN_FEATURES - 1}
+    result = plan(monkeypatch, [layer], 8)
+    assert result
+    _, filters = result
+    assert filters == [
+        f"FID < {layer['featureCount'] // 2}",
+        f"FID >= {layer['featureCount'] // 2}",
+    ]
+
+
+@pytest.mark.parametrize(
+    "layers",
+    [
+        [],
+        [{"name": "roads", "featureCount": 2 * PARTITION_MIN_FEATURES - 1}],
+        [
+            {"name": "roads", "featureCount": 4 * PARTITION_MIN_FEATURES},
+            {"name": "rivers", "featureCount": 4 * PARTITION_MIN_FEATURES},
+        ],
+    ],
+)
+def test_small_or_multilayer_inputs_are_not_split(
+    monkeypatch: pytest.MonkeyPatch,
+    layers: list[dict],
+) -> None:
+    assert plan(monkeypatch, layers, 4) is None
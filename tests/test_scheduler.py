@@ -0,0 +1,77 @@
+from asyncio import create_task, gather, run, sleep
+
+import pytest
+
+from app.scheduler import FairSemaphore, QueueFullError, Scheduler
+
+
+def test_slots_go_to_applications_in_turn() -> None:
+    async def main() -> list[str]:
+        semaphore = FairSemaphore(1)
+        order = []
+
+        async def wait(name: str) -> None:
+            await semaphore.acquire(name[0])
+            order.append(name)
+
+        await semaphore.acquire("a")
+        tasks = [create_task(wait(name)) for name in ["a1", "a2", "a3", "b1", "c1"]]
+        await sleep(0)
+        assert semaphore.depth == len(tasks)
+        for _ in tasks:
+            semaphore.release()
+            await sleep(0)
+        await gather(*tasks)
+        return order
+
+    assert run(main()) == ["a1", "b1", "c1", "a2", "a3"]
+
+
+def test_cancelled_waiter_leaves_the_queue() -> None:
+    async def main() -> None:
+        semaphore = FairSemaphore(1)
+        await semaphore.acquire("a")
+        task = create_task(semaphore.acquire("b"))
+        await sleep(0)
+        task.cancel()
+        await sleep(0)
+        assert semaphore.depth == 0
+        semaphore.release()
+        assert semaphore.active == 0
+
+    run(main())
+
+
+def test_full_queue_rejects_requests_but_not_jobs() -> None:
+    async def main() -> None:
+        scheduler = Scheduler({}, 1, 1024, 1, 1)
+        semaphores = await scheduler.acquire("convert", "a", 0)
+        waiting = create_task(scheduler.acquire("convert", "b", 0))
+        await sleep(0)
+        with pytest.raises(QueueFullError):
+            await scheduler.acquire("convert", "c", 0)
+        job = create_task(scheduler.acquire("convert", "c", 0, bounded=False))
+        await sleep(0)
+        assert scheduler.depth == scheduler.max_queue + 1
+        assert scheduler.stats.rejected == 1
+        scheduler.release(semaphores)
+        scheduler.release(await waiting)
+        scheduler.release(await job)
+        assert scheduler.get_stats()["commands"]["convert"]["active"] == 0
+
+    run(main())
+
+
+def test_large_inputs_share_slots_across_commands() -> None:
+    async def main() -> None:
+        scheduler = Scheduler({}, 2, 1024, 1, 10)
+        semaphores = await scheduler.acquire("convert", "a", 1024)
+        assert scheduler.large in semaphores
+        waiting = create_task(scheduler.acquire("filter", "a", 2048))
+        await sleep(0)
+        assert scheduler.large.depth == 1
+        scheduler.release(semaphores)
+        scheduler.release(await waiting)
+        assert scheduler.large.active == 0
+
+    run(main())
@@ -0,0 +1,64 @@
+import zlib
+from asyncio import run
+from pathlib import Path
+from struct import calcsize, unpack
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+from app.sozip import Archiver
+
+CHUNK_SIZE = 1024
+HEADER_FORMAT = "<IIIIQQ"
+LOCAL_HEADER_SIZE = 30
+DATA = b"".join(f"{i},place {i}\n".encode() for i in range(1000))
+
+
+def write_archive(tmp_path: Path, files: dict[str, bytes]) -> ZipFile:
+    """Write files in a SOZip archive and open it."""
+    members = []
+    for name, content in files.items():
+        path = tmp_path / "files" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+        members.append((path, name))
+    output_zip = tmp_path / "output.zip"
+    run(Archiver(CHUNK_SIZE, 4 * CHUNK_SIZE).write(members, output_zip))
+    return ZipFile(output_zip)
+
+
+def test_archive_is_valid(tmp_path: Path) -> None:
+    files = {"data/large.csv": DATA, "small.csv": DATA[:100], "input.zip": DATA}
+    with write_archive(tmp_path, files) as z:
+        assert z.testzip() is None
+        for name, content in files.items():
+            assert z.read(name) == content
+        assert z.getinfo("data/large.csv").compress_type == ZIP_DEFLATED
+        assert z.getinfo("input.zip").compress_type == ZIP_STORED
+        assert z.namelist() == [
+            "data/large.csv",
+            "data/.large.csv.sozip.idx",
+            "small.csv",
+            "input.zip",
+        ]
+
+
+def test_index_points_at_independent_chunks(tmp_path: Path) -> None:
+    with write_archive(tmp_path, {"large.csv": DATA}) as z:
+        index = z.read(".large.csv.sozip.idx")
+        info = z.getinfo("large.csv")
+        with Path(z.filename).open("rb") as f:
+            f.seek(info.header_offset + LOCAL_HEADER_SIZE + len(info.filename))
+            compressed = f.read(info.compress_size)
+    header_size = calcsize(HEADER_FORMAT)
+    version, _, chunk_size, offset_size, size, compressed_size = unpack(
+        HEADER_FORMAT,
+        index[:header_size],
+    )
+    assert (version, chunk_size, offset_size) == (1, CHUNK_SIZE, 8)
+    assert (size, compressed_size) == (len(DATA), info.compress_size)
+    offsets = [0] + [
+        unpack("<Q", index[i : i + 8])[0] for i in range(header_size, len(index), 8)
+    ]
+    assert len(offsets) == -(-len(DATA) // CHUNK_SIZE)
+    for i, offset in enumerate(offsets):
+        chunk = zlib.decompressobj(-zlib.MAX_WBITS).decompress(compressed[offset:])
+        assert chunk.startswith(DATA[i * CHUNK_SIZE : (i + 1) * CHUNK_SIZE])
@@ -0,0 +1,53 @@
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import pytest
+
+from app.utils import get_zip_input
+
+
+def write_zip(input_file: Path, members: list[str], compression: int) -> None:
+    """Write a zip with empty members."""
+    with ZipFile(input_file, "w", compression) as z:
+        for name in members:
+            z.writestr(name, b"")
+
+
+@pytest.mark.parametrize(
+    ("members", "compression", "dataset"),
+    [
+        (["a.geojson"], ZIP_DEFLATED, "/a.geojson"),
+        (["data/a.shp", "data/a.dbf", "data/a.shx"], ZIP_DEFLATED, "/data/a.shp"),
+        (["a.shp", "b.shp"], ZIP_DEFLATED, ""),
+        (["a.gdb/a0000001.gdbtable", "a.gdb/gdb"], ZIP_DEFLATED, "/a.gdb"),
+        (["a.geojson", "readme.csv"], ZIP_DEFLATED, "/a.geojson"),
+        (["__MACOSX/._a.gpkg", "a.gpkg"], ZIP_STORED, "/a.gpkg"),
+    ],
+)
+def test_zip_is_read_in_place(
+    tmp_path: Path,
+    members: list[str],
+    compression: int,
+    dataset: str,
+) -> None:
+    input_file = tmp_path / "input.zip"
+    write_zip(input_file, members, compression)
+    assert get_zip_input(input_file) == f"/vsizip/{input_file}{dataset}"
+
+
+@pytest.mark.parametrize(
+    ("members", "compression"),
+    [
+        (["a.gpkg"], ZIP_DEFLATED),
+        (["a.mdb"], ZIP_STORED),
+        (["a/a.shp", "b/b.shp"], ZIP_DEFLATED),
+    ],
+)
+def test_zip_is_extracted(
+    tmp_path: Path,
+    members: list[str],
+    compression: int,
+) -> None:
+    input_file = tmp_path / "input.zip"
+    write_zip(input_file, members, compression)
+    assert get_zip_input(input_file) is None